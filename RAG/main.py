@@ -1,9 +1,11 @@
 import os
+import time
+from contextlib import contextmanager
 from uuid import uuid4
 
 import uvicorn
 from fastapi import FastAPI, File, Form, UploadFile, HTTPException
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 from pipeline import (COLLECTION_NAME, CLIPEmbedder,
@@ -18,6 +20,7 @@ from io import BytesIO
 import re
 from pydantic import BaseModel
 from pathlib import Path
+from prometheus_client import CONTENT_TYPE_LATEST, Histogram, generate_latest
 
 app = FastAPI()
 # 允许所有来源的CORS（跨域请求）
@@ -33,6 +36,25 @@ text_embedder = BgeEmbedder()
 
 image_embedder = CLIPEmbedder()
 
+# 与后端 analyze_stage_seconds 对应的检索耗时指标
+_SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+EMBED_SECONDS = Histogram(
+    "rag_embed_seconds", "Time to embed a search input", ["modality"], buckets=_SECONDS_BUCKETS
+)
+QDRANT_QUERY_SECONDS = Histogram(
+    "rag_qdrant_query_seconds", "Time of a Qdrant query", ["vector"], buckets=_SECONDS_BUCKETS
+)
+
+
+@contextmanager
+def observe(histogram: Histogram, label: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.labels(label).observe(time.perf_counter() - started)
+
+
 UPLOAD_DIR = "./uploaded_images"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
@@ -85,17 +107,19 @@ async def unified_multimodal_search(data: SearchRequest):
 
         # 文本查询
         if text:
-            text_vector = text_embedder.embed(text)
-            resp = client.query_points(
-                collection_name=COLLECTION_NAME,
-                query=text_vector,
-                limit=top_k,
-                with_payload=True,
-                with_vectors=False,  # set to True if you want vectors back
-                score_threshold=score_threshold,
-                search_params=SearchParams(hnsw_ef=128),
-                using="text"  # specify which named vector field to search
-            )
+            with observe(EMBED_SECONDS, "text"):
+                text_vector = text_embedder.embed(text)
+            with observe(QDRANT_QUERY_SECONDS, "text"):
+                resp = client.query_points(
+                    collection_name=COLLECTION_NAME,
+                    query=text_vector,
+                    limit=top_k,
+                    with_payload=True,
+                    with_vectors=False,  # set to True if you want vectors back
+                    score_threshold=score_threshold,
+                    search_params=SearchParams(hnsw_ef=128),
+                    using="text"  # specify which named vector field to search
+                )
             points = extract_scored_points(resp)
             results.extend(points)
 
@@ -105,17 +129,19 @@ async def unified_multimodal_search(data: SearchRequest):
                 image_bytes = base64.b64decode(format_base64(image_base64))
                 image = Image.open(BytesIO(image_bytes)).convert("RGB")
 
-                image_vector = image_embedder.embed_from_pil(image)
-                resp = client.query_points(
-                    collection_name=COLLECTION_NAME,
-                    query=image_vector,
-                    limit=1,
-                    with_payload=True,
-                    with_vectors=False,  # set to True if you want vectors back
-                    score_threshold=score_threshold,
-                    search_params=SearchParams(hnsw_ef=128),
-                    using="image"  # specify which named vector field to search
-                )
+                with observe(EMBED_SECONDS, "image"):
+                    image_vector = image_embedder.embed_from_pil(image)
+                with observe(QDRANT_QUERY_SECONDS, "image"):
+                    resp = client.query_points(
+                        collection_name=COLLECTION_NAME,
+                        query=image_vector,
+                        limit=1,
+                        with_payload=True,
+                        with_vectors=False,  # set to True if you want vectors back
+                        score_threshold=score_threshold,
+                        search_params=SearchParams(hnsw_ef=128),
+                        using="image"  # specify which named vector field to search
+                    )
                 points = extract_scored_points(resp)
                 results.extend(points)
 
@@ -123,17 +149,19 @@ async def unified_multimodal_search(data: SearchRequest):
                     payload = item.payload  # now you can access payload
                     if "text" in payload:
                         follow_up_query = payload["text"] + "的防治方法"
-                        text_vector = text_embedder.embed(follow_up_query)
-                        resp = client.query_points(
-                            collection_name=COLLECTION_NAME,
-                            query=text_vector,
-                            limit=top_k,
-                            with_payload=True,
-                            with_vectors=False,  # set to True if you want vectors back
-                            score_threshold=score_threshold,
-                            search_params=SearchParams(hnsw_ef=128),
-                            using="text"  # specify which named vector field to search
-                        )
+                        with observe(EMBED_SECONDS, "text"):
+                            text_vector = text_embedder.embed(follow_up_query)
+                        with observe(QDRANT_QUERY_SECONDS, "text"):
+                            resp = client.query_points(
+                                collection_name=COLLECTION_NAME,
+                                query=text_vector,
+                                limit=top_k,
+                                with_payload=True,
+                                with_vectors=False,  # set to True if you want vectors back
+                                score_threshold=score_threshold,
+                                search_params=SearchParams(hnsw_ef=128),
+                                using="text"  # specify which named vector field to search
+                            )
                         print("image text resp------------------", resp)
                         points = extract_scored_points(resp)
                         results.extend(points)
@@ -150,7 +178,8 @@ async def unified_multimodal_search(data: SearchRequest):
             payload = r.payload  # now you can access payload
             uid = payload.get("text") or payload.get("page_content")
             if uid and uid not in seen:
-                unique_results.append(payload)
+                # 附带文档 id, 供后端语义缓存区分检索结果
+                unique_results.append({**payload, "id": str(r.id)})
                 seen.add(uid)
 
         # format keys
@@ -203,6 +232,11 @@ def is_safe_path(base_path: Path, target_path: Path) -> bool:
     except ValueError:
         return False
 
+@app.get("/metrics")
+async def metrics():
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 @app.get("/image/{image_name}")
 async def get_image(image_name: str, width: Optional[int] = None, height: Optional[int] = None):
     """
@@ -0,0 +1,105 @@
+"""
+/api/generate 单一 prompt (旧) vs /api/chat 固定 system 前缀 (新)
+
+1. 检查 /api/chat 模式下所有请求的 system 消息逐字节相同
+2. 使用模拟前缀 KV 缓存的本地替身服务器 (benchmarks/fake_ollama.py), 统计多轮对话中
+   可复用的前缀比例与预填充耗时
+在 backend 目录下运行:
+    python -m benchmarks.bench_chat_prefix
+"""
+import asyncio
+import json
+import os
+import time
+
+from utils.load_config import load_config
+
+load_config()
+
+import utils.models as models
+from benchmarks.fake_ollama import FakeOllama
+from utils.memory import WindowedSummaryMemory
+from utils.models import (OllamaClient, generate_with_ollama_chat_stream,
+                          generate_with_ollama_stream)
+from utils.prompt_budget import PromptBudget
+from utils.promptsArchive import (AGRICULTURE_SYSTEM_PROMPT,
+                                  get_agriculture_prompt_without_image,
+                                  get_agriculture_user_message)
+
+MODEL = "qwen3:32b"
+CHATS = 4
+TURNS = 6
+QUESTIONS = ["河北玉米种植密度多少", "用什么肥", "每亩用量多少", "什么时候追肥", "下雨后要补吗", "有没有有机肥替代"]
+RAG_RESULT = [{"id": "1", "text": "河北春玉米适宜密度每亩 4500-5500 株, 施肥以氮肥为主. " * 5}]
+
+
+async def run_chat(mode: str, chat_id: str, budget: PromptBudget, totals: dict):
+    memory = WindowedSummaryMemory(max_window=10)
+    for turn in range(TURNS):
+        question = f"{QUESTIONS[turn % len(QUESTIONS)]} ({chat_id})"
+        if mode == "chat":
+            messages = budget.assemble_messages(
+                AGRICULTURE_SYSTEM_PROMPT, get_agriculture_user_message, question, memory, RAG_RESULT
+            )
+            stream = generate_with_ollama_chat_stream(messages, model=MODEL, chat_id=chat_id)
+        else:
+            prompt = budget.assemble(get_agriculture_prompt_without_image, question, memory, RAG_RESULT)
+            stream = generate_with_ollama_stream(prompt, model=MODEL, chat_id=chat_id)
+
+        answer = ""
+        async for chunk in stream:
+            if chunk.get("done"):
+                totals["prefill_seconds"] += chunk["prompt_eval_duration"] / 1e9
+                totals["turns"] += 1
+                message = messages[-1]["content"] if mode == "chat" else None
+                memory.save_context({"input": question, "message": message}, {"response": answer})
+            else:
+                answer += chunk["response"]
+
+
+def rendered(request: dict) -> str:
+    if request["path"] == "/api/chat":
+        return "".join(
+            f"<|im_start|>{m['role']}\n{m.get('content') or ''}<|im_end|>\n" for m in request["messages"]
+        )
+    return request["prompt"]
+
+
+async def bench(mode: str) -> dict:
+    # 4 个缓存槽, 约 0.1ms / 字符的预填充
+    server = FakeOllama("ollama", tokens=100, token_delay=0.001, prefill_per_char=0.0001, prefix_slots=4).start()
+    models.OLLAMA_CLIENT = OllamaClient([server.endpoint], router={"health_interval": 0})
+    budget = PromptBudget(num_ctx=32768, reserve_output=2048)
+    totals = {"turns": 0, "prefill_seconds": 0.0}
+    started = time.perf_counter()
+    async with models.OLLAMA_CLIENT:
+        await asyncio.gather(*(run_chat(mode, f"chat-{i}", budget, totals) for i in range(CHATS)))
+    totals["wall"] = time.perf_counter() - started
+    server.stop()
+
+    requests = [r for r in server.requests if r["path"] in ("/api/chat", "/api/generate")]
+    texts = [rendered(r) for r in requests]
+    totals["chars"] = sum(len(t) for t in texts)
+    if mode == "chat":
+        systems = {json.dumps(r["messages"][0], ensure_ascii=False).encode("utf-8") for r in requests}
+        totals["distinct_system_prefixes"] = len(systems)
+    # 所有请求共有的前缀 (跨会话可复用的部分)
+    totals["common_prefix"] = len(os.path.commonprefix(texts))
+    return totals
+
+
+async def main():
+    results = {mode: await bench(mode) for mode in ("generate", "chat")}
+
+    print(f"{CHATS} 个会话 x {TURNS} 轮, 服务端 4 个前缀缓存槽\n")
+    print("chat 模式下不同的 system 消息 (字节级):", results["chat"]["distinct_system_prefixes"])
+    print(f"\n{'模式':<10}{'prompt 字符':>12}{'全部请求公共前缀':>18}{'预填充(s)':>12}{'每轮预填充(ms)':>16}{'总耗时(s)':>12}")
+    for mode, r in results.items():
+        print(
+            f"{mode:<10}{r['chars']:>12}{r['common_prefix']:>18}{r['prefill_seconds']:>12.2f}"
+            f"{r['prefill_seconds'] / r['turns'] * 1000:>16.1f}{r['wall']:>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
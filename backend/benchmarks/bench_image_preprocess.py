@@ -0,0 +1,143 @@
+"""
+/analyze 图片: 原图转发三次 (旧) vs 一次解码、按用途缩小并按内容哈希缓存 (新)
+
+本地替身: FakeOllama 充当 RAG 相关性判断与最终回答的 qwen2.5vl:7b, 替身 RAG /search 与 RAG 服务一样
+用 PIL 解码图片并把短边缩放到 224 (CLIP 预处理). 每张图片连续 3 轮对话都带同一张图片,
+统计每轮转发的字节数、后端预处理耗时与三次转发 (相关性判断、/search、最终回答) 的总耗时,
+以及 qwen2.5vl 的图片 token 估算 (每 28x28 像素一个).
+在 backend 目录下运行:
+    python -m benchmarks.bench_image_preprocess
+"""
+import asyncio
+import base64
+import io
+import threading
+import time
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from PIL import Image
+
+from utils.load_config import load_config
+
+load_config()
+
+import utils.models as models
+from benchmarks.fake_ollama import FakeOllama, free_port
+from rag.rag import retrieveRAGResult
+from utils.image_preprocess import ImageError, ImagePreprocessor
+from utils.load_config import global_config
+
+TURNS = 3
+
+
+def photo(width: int, height: int, fmt: str, seed: int) -> str:
+    """平滑的色块加噪点, 压缩率接近手机照片"""
+    rng = np.random.default_rng(seed)
+    base = Image.fromarray(rng.integers(0, 255, (height // 32, width // 32, 3), dtype=np.uint8))
+    pixels = np.asarray(base.resize((width, height), Image.BICUBIC), dtype=np.int16)
+    pixels = np.clip(pixels + rng.integers(-12, 12, pixels.shape), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format=fmt, **({"quality": 92} if fmt == "JPEG" else {}))
+    return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+IMAGES = [
+    ("手机照片 4032x3024 JPEG", lambda: photo(4032, 3024, "JPEG", 1)),
+    ("截图 1920x1080 PNG", lambda: photo(1920, 1080, "PNG", 2)),
+    ("小图 640x480 JPEG", lambda: photo(640, 480, "JPEG", 3)),
+]
+
+
+class FakeRagThread:
+    """与 RAG 服务的 /search 一样解码图片并缩放到 CLIP 的输入尺寸"""
+
+    def __init__(self):
+        self.port = free_port()
+        self.decode_seconds = 0.0
+        app = FastAPI()
+
+        @app.post("/search")
+        async def search(request: Request):
+            data = await request.json()
+            started = time.perf_counter()
+            image = Image.open(io.BytesIO(base64.b64decode(data["image_base64"]))).convert("RGB")
+            scale = 224 / min(image.size)
+            image.resize((round(image.width * scale), round(image.height * scale)), Image.BICUBIC)
+            self.decode_seconds += time.perf_counter() - started
+            return []
+
+        self._server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    def start(self) -> "FakeRagThread":
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        self._server.should_exit = True
+        self._thread.join()
+
+
+def image_tokens(b64: str) -> int:
+    width, height = Image.open(io.BytesIO(base64.b64decode(b64))).size
+    return width * height // (28 * 28)
+
+
+async def turn(preprocessor: ImagePreprocessor, image: str, rag: FakeRagThread) -> dict:
+    started = time.perf_counter()
+    variants = await preprocessor.prepare([image])
+    preprocess = time.perf_counter() - started
+    await models.generate_with_ollama("这张图片与农业有关吗", model="qwen2.5vl:7b", image=variants["rag_gate"])
+    rag_before = rag.decode_seconds
+    await retrieveRAGResult(image=variants["rag_search"][0])
+    async for _ in models.generate_with_ollama_stream(
+        "这株玉米的叶片怎么了", model="qwen2.5vl:7b", image=variants["generate"]
+    ):
+        pass
+    return {
+        "preprocess": preprocess,
+        "total": time.perf_counter() - started,
+        "rag_decode": rag.decode_seconds - rag_before,
+        "bytes": sum(len(v[0]) for v in variants.values()),
+        "tokens": image_tokens(variants["generate"][0]),
+    }
+
+
+async def main():
+    server = FakeOllama("ollama", models=["qwen2.5vl:7b"], token_delay=0.001).start()
+    models.OLLAMA_CLIENT = models.OllamaClient([server.endpoint], router={"health_interval": 0})
+    rag = FakeRagThread().start()
+    global_config.rag_url = f"http://127.0.0.1:{rag.port}"
+    images = [(name, build()) for name, build in IMAGES]
+
+    print(f"{'图片':<24}{'模式':<8}{'轮次':>4}{'转发字节':>12}{'预处理(ms)':>12}{'RAG解码(ms)':>12}{'总计(ms)':>10}{'图片token':>10}")
+    async with models.OLLAMA_CLIENT:
+        for mode, enabled in [("原图", False), ("预处理", True)]:
+            preprocessor = ImagePreprocessor(**{**global_config.image_preprocess, "enabled": enabled})
+            for name, image in images:
+                for i in range(TURNS):
+                    result = await turn(preprocessor, image, rag)
+                    print(
+                        f"{name:<24}{mode:<8}{i + 1:>4}{result['bytes']:>12}{result['preprocess'] * 1000:>12.1f}"
+                        f"{result['rag_decode'] * 1000:>12.1f}{result['total'] * 1000:>10.1f}{result['tokens']:>10}"
+                    )
+            if enabled:
+                print("预处理统计:", preprocessor.preprocess_stats())
+
+        # 超出限制的图片在解码前拒绝
+        limited = ImagePreprocessor(max_bytes=1024 * 1024, max_pixels=4_000_000)
+        for name, image in [("超过 1MB 的照片", images[0][1]), ("损坏的数据", base64.b64encode(b"not an image").decode())]:
+            try:
+                await limited.prepare([image])
+            except ImageError as e:
+                print(f"{name}: 拒绝 ({e})")
+    rag.stop()
+    server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
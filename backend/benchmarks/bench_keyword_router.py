@@ -0,0 +1,96 @@
+"""
+请求分类: 逐个关键词做子串查找 (旧) vs 编译好的 Aho-Corasick 关键词路由 (新)
+
+旧实现每个请求分别判断 MCP 关键词、取数据库配置、查 keyword_maps 与增强 prompt 触发词,
+每一步都重新小写输入并遍历对应的关键词列表. 先在 config.jsonc 的关键词上比较两者的结果与耗时,
+再加入合成关键词, 观察关键词数量增长时的耗时变化.
+在 backend 目录下运行:
+    python -m benchmarks.bench_keyword_router
+"""
+import copy
+import random
+import time
+
+from utils.load_config import load_config
+
+load_config()
+
+from utils.keyword_router import KeywordRouter
+from utils.load_config import global_config
+
+QUESTIONS = [
+    "伏羲 种子库里京科968还有多少",
+    "伏羲 地块总面积是多少",
+    "重庆粮油 仓库的稻谷库存",
+    "河北的玉米种植密度一般是多少",
+    "小麦蚜虫怎么防治",
+    "今天天气怎么样",
+    "请详细介绍一下水稻从播种到收获的完整田间管理流程, 包括施肥、灌溉、病虫害防治以及收获后的储藏注意事项",
+]
+
+
+def old_route(text: str, mcp_db_dict: dict, triggers: list):
+    # 原实现: should_use_mcp_plugin + get_mcp_config_by_keyword + 第一个命中的 keyword_maps + should_apply_enhanced_prompt
+    use_mcp = any(value.get("keyword").lower() in text.lower() for value in mcp_db_dict.values())
+    tables = ()
+    if use_mcp:
+        config = {k: v for k, v in mcp_db_dict.items() if v.get("keyword").lower() in text.lower()}
+        db_config = config[list(config.keys())[0]]
+        lower_input = text.lower()
+        for item in db_config.get("keyword_maps") or []:
+            if item["key"] in lower_input:
+                tables = tuple(table.get("name") for table in item["tables"])
+                break
+    enhanced = any(keyword.lower() in text.lower() for keyword in triggers)
+    return use_mcp, tables, enhanced
+
+
+def synthetic(mcp_db_dict: dict, triggers: list, extra: int):
+    """在各库 keyword_maps 与触发词中加入 extra 个随机的两到四字关键词"""
+    rng = random.Random(extra)
+    alphabet = "玉米小麦水稻大豆棉花油菜果树蔬菜茶叶土壤肥料灌溉病虫草害农机仓储气象价格产量品种"
+    words = {"".join(rng.choice(alphabet) for _ in range(rng.randint(2, 4))) for _ in range(extra)}
+    mcp_db_dict = copy.deepcopy(mcp_db_dict)
+    per_db = len(words) // (len(mcp_db_dict) + 1)
+    words = sorted(words)
+    for i, db_config in enumerate(mcp_db_dict.values()):
+        db_config["keyword_maps"] = list(db_config.get("keyword_maps") or []) + [
+            {"key": word, "tables": []} for word in words[i * per_db : (i + 1) * per_db]
+        ]
+    return mcp_db_dict, triggers + words[len(mcp_db_dict) * per_db :]
+
+
+def per_query_us(fn, rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for question in QUESTIONS:
+            fn(question)
+    return (time.perf_counter() - started) / (rounds * len(QUESTIONS)) * 1e6
+
+
+def main():
+    mcp_db_dict, triggers = global_config.mcp_db_dict, list(global_config.PROMPT_TRIGGER_KEYWORDS)
+    router = KeywordRouter(mcp_db_dict, triggers)
+    print(f"{'问题':<30}{'MCP':>5}{'增强':>5}  旧: keyword_maps 表 / 新: 命中分组")
+    for question in QUESTIONS:
+        use_mcp, tables, enhanced = old_route(question, mcp_db_dict, triggers)
+        route = router.route(question)
+        assert (use_mcp, enhanced) == (route.use_mcp, route.enhanced), question
+        groups = {k: list(v) for k, v in route.table_groups.items()}
+        print(f"{question[:28]:<30}{str(route.use_mcp):>5}{str(route.enhanced):>5}  {len(tables)} 张 / {groups}")
+
+    print(f"\n{'关键词数':>8}{'编译(ms)':>10}{'旧(us/问题)':>14}{'新(us/问题)':>14}")
+    for extra in (0, 100, 1000, 5000):
+        dbs, words = synthetic(mcp_db_dict, triggers, extra) if extra else (mcp_db_dict, triggers)
+        started = time.perf_counter()
+        router = KeywordRouter(dbs, words)
+        compile_ms = (time.perf_counter() - started) * 1000
+        count = len(words) + sum(1 + len(v.get("keyword_maps") or []) for v in dbs.values())
+        rounds = 2000 if extra < 1000 else 200
+        old = per_query_us(lambda q: old_route(q, dbs, words), rounds)
+        new = per_query_us(router.route, rounds)
+        print(f"{count:>8}{compile_ms:>10.2f}{old:>14.1f}{new:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
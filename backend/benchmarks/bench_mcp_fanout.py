@@ -0,0 +1,116 @@
+"""
+命中两个数据库的 MCP 问题: 逐库依次规划与执行 (旧) vs 各库并发、共用截止时间 (新)
+
+本地替身: 两个 SSE 传输的 FastMCP 服务器 (execute_sql 固定耗时), FakeOllama 充当规划模型
+(一轮 execute_sql 后结束) 与总结模型; 重庆粮油 的 execute_sql 较慢.
+统计总耗时、总结调用次数与各库的进度事件; 最后以较短的截止时间验证未完成的库注明超时后与已完成的库一起总结.
+在 backend 目录下运行:
+    python -m benchmarks.bench_mcp_fanout
+"""
+import asyncio
+import dataclasses
+import logging
+import time
+
+from utils.load_config import load_config
+
+load_config()
+
+import mcp_plugins.mcp_sessions as mcp_sessions
+import mcp_plugins.result_cache as result_cache
+import mcp_plugins.table_renderer as table_renderer
+import utils.models as models
+import utils.sql_plan_cache as sql_plan_cache
+from benchmarks.bench_mcp_sessions import McpServerThread
+from benchmarks.fake_ollama import FakeOllama, free_port
+from mcp_plugins.postgres_mcp import run_postgres_mcp_tool
+from mcp_plugins.sql_result import TableFrame
+from utils.keyword_router import get_keyword_router
+from utils.load_config import global_config
+from utils.promptsArchive import END_KEYWORD
+
+QUESTION = "伏羲 和 重庆粮油 的稻谷库存分别是多少"
+SQL_SECONDS = {"fuxi_farm": 0.3, "chongqing_grain": 1.0}
+
+
+def reply(data: dict) -> str:
+    prompt = data["prompt"]
+    if "MCP 工具智能助手" not in prompt:
+        return "两个库的稻谷库存如下. "
+    if "TOOL(execute_sql" in prompt:
+        return END_KEYWORD
+    return '```json\n{"tool": "execute_sql", "args": {"sql": "SELECT SUM(stock) FROM grain_stock"}}\n```'
+
+
+async def run(question: str, route) -> dict:
+    started = time.perf_counter()
+    events, tables, text = [], 0, ""
+    async for item in run_postgres_mcp_tool(question, [], [], route):
+        if isinstance(item, TableFrame):
+            tables += 1
+        elif item.startswith("loading:"):
+            events.append(item.strip()[len("loading: "):])
+        else:
+            text += item
+    return {"seconds": time.perf_counter() - started, "events": events, "tables": tables, "text": text}
+
+
+def summary_calls(server: FakeOllama) -> list:
+    return [r["prompt"] for r in server.requests if "融合农业知识" in r.get("prompt", "")]
+
+
+async def main():
+    logging.getLogger("mcp").setLevel(logging.CRITICAL)
+    ports = {db_key: free_port() for db_key in SQL_SECONDS}
+    servers = [McpServerThread(ports[db_key], seconds).start() for db_key, seconds in SQL_SECONDS.items()]
+    mcp_sessions.MCP_SESSIONS = mcp_sessions.McpSessions(
+        {db_key: f"http://127.0.0.1:{port}/sse" for db_key, port in ports.items()}
+    )
+    sql_plan_cache.SQL_PLAN_CACHE = sql_plan_cache.SqlPlanCache({}, enabled=False)
+    # 每个问题都走总结模型, 不直接渲染表格
+    table_renderer.TABLE_RENDERER = table_renderer.TableRenderer(enabled=False)
+    # 每次都访问数据库, 不使用 MCP 结果缓存
+    result_cache.MCP_RESULT_CACHE = result_cache.McpResultCache(enabled=False)
+    server = FakeOllama(
+        "ollama", models=["qwen3:32b", "qwen3:4b"], token_delay=0.01, model_speed={"qwen3:4b": 0.25}, reply=reply
+    ).start()
+    models.OLLAMA_CLIENT = models.OllamaClient([server.endpoint], router={"health_interval": 0})
+
+    route = get_keyword_router().route(QUESTION)
+    print("命中的数据库:", route.databases)
+    async with models.OLLAMA_CLIENT:
+        await mcp_sessions.MCP_SESSIONS.start()
+
+        # 旧: 一次只处理一个库, 两个库需依次提问, 各自总结
+        before = len(summary_calls(server))
+        started = time.perf_counter()
+        for db_key in route.databases:
+            await run(QUESTION, dataclasses.replace(route, databases=(db_key,)))
+        sequential = {"seconds": time.perf_counter() - started, "summaries": len(summary_calls(server)) - before}
+
+        before = len(summary_calls(server))
+        fanout = await run(QUESTION, route)
+        fanout["summaries"] = len(summary_calls(server)) - before
+        merged = summary_calls(server)[-1]
+
+        # 截止时间短于 重庆粮油 所需的时间: 伏羲 完成, 重庆粮油 注明超时后一起总结
+        global_config.mcp_fanout["deadline"] = (SQL_SECONDS["fuxi_farm"] + SQL_SECONDS["chongqing_grain"]) / 2
+        partial = await run(QUESTION, route)
+        partial_prompt = summary_calls(server)[-1]
+        await mcp_sessions.MCP_SESSIONS.stop()
+    server.stop()
+    for mcp_server in servers:
+        mcp_server.stop()
+
+    print(f"\n{'模式':<12}{'总耗时(s)':>10}{'总结调用':>10}")
+    print(f"{'sequential':<12}{sequential['seconds']:>10.2f}{sequential['summaries']:>10}")
+    print(f"{'fanout':<12}{fanout['seconds']:>10.2f}{fanout['summaries']:>10}")
+    print("\n并发时的进度事件:", fanout["events"])
+    print("table 帧:", fanout["tables"], " 总结 prompt 含两个库:", "【伏羲】" in merged and "【重庆粮油】" in merged)
+    print(f"\n截止时间 {global_config.mcp_fanout['deadline']:.2f}s: 耗时 {partial['seconds']:.2f}s")
+    print("进度事件:", partial["events"])
+    print("总结 prompt 注明超时:", "查询超时" in partial_prompt)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,127 @@
+"""
+MCP 工具调用: 每次都经 MCP 服务器访问数据库 (旧) vs 按 (数据库, 工具名, 规范化参数) 的 TTL 结果缓存 (新)
+
+本地替身: SSE 传输的 FastMCP 服务器 (list_objects / get_object_details / execute_sql 各耗时 SQL_SECONDS),
+FakeOllama 充当规划模型: 先查表与表结构, 再执行 SQL, 下一轮以不同的空白与分号再次执行同一 SQL 核对结果.
+两个品种的问题各问 3 次, 统计到达 MCP 服务器的调用次数与每个问题的耗时; 最后验证手动失效与 TTL 过期.
+在 backend 目录下运行:
+    python -m benchmarks.bench_mcp_result_cache
+"""
+import asyncio
+import json
+import logging
+import re
+import time
+
+from utils.load_config import load_config
+
+load_config()
+
+import mcp_plugins.mcp_sessions as mcp_sessions
+import mcp_plugins.result_cache as result_cache
+import mcp_plugins.table_renderer as table_renderer
+import utils.models as models
+import utils.sql_plan_cache as sql_plan_cache
+from benchmarks.bench_mcp_sessions import McpServerThread
+from benchmarks.fake_ollama import FakeOllama, free_port
+from mcp_plugins.postgres_mcp import run_postgres_mcp_tool
+from utils.load_config import global_config
+from utils.promptsArchive import END_KEYWORD
+
+SQL_SECONDS = 0.05
+QUESTIONS = [f"伏羲 {variety} 的种子库存有多少" for variety in ["京科968", "郑单958"] * 3]
+
+
+def reply(data: dict) -> str:
+    prompt = data["prompt"]
+    if "MCP 工具智能助手" not in prompt:
+        return "该品种当前库存充足. "
+    variety = re.search(r"伏羲 (\S+) 的种子库存", prompt).group(1)
+    plans = [
+        ("list_objects", {"schema_name": "public"}),
+        ("get_object_details", {"schema_name": "public", "object_name": "seed_stock"}),
+        ("execute_sql", {"sql": f"SELECT SUM(stock) FROM seed_stock WHERE variety = '{variety}'"}),
+        ("execute_sql", {"sql": f"select SUM(stock)\n  FROM seed_stock\n  WHERE variety = '{variety}';"}),
+    ]
+    rounds = prompt.count("TOOL(")
+    if rounds >= len(plans):
+        return END_KEYWORD
+    tool, args = plans[rounds]
+    return "```json\n" + json.dumps({"tool": tool, "args": args}, ensure_ascii=False) + "\n```"
+
+
+def round_trips() -> int:
+    return mcp_sessions.MCP_SESSIONS.session_stats()["fuxi_farm"]["calls"]
+
+
+async def bench(enabled: bool) -> dict:
+    result_cache.MCP_RESULT_CACHE = result_cache.McpResultCache(**{**global_config.mcp_result_cache, "enabled": enabled})
+    before = round_trips()
+    latencies = []
+    for question in QUESTIONS:
+        started = time.perf_counter()
+        async for _ in run_postgres_mcp_tool(question, [], []):
+            pass
+        latencies.append(time.perf_counter() - started)
+    return {
+        "round_trips": round_trips() - before,
+        "first": latencies[0],
+        "repeat": sum(latencies[2:]) / len(latencies[2:]),
+        "total": sum(latencies),
+        "stats": result_cache.MCP_RESULT_CACHE.cache_stats(),
+    }
+
+
+async def main():
+    logging.getLogger("mcp").setLevel(logging.CRITICAL)
+    mcp_port = free_port()
+    mcp_server = McpServerThread(mcp_port, SQL_SECONDS).start()
+    mcp_sessions.MCP_SESSIONS = mcp_sessions.McpSessions({"fuxi_farm": f"http://127.0.0.1:{mcp_port}/sse"})
+    # 只比较数据库访问: 不使用 SQL 计划缓存, 每个问题都走规划与总结
+    sql_plan_cache.SQL_PLAN_CACHE = sql_plan_cache.SqlPlanCache({}, enabled=False)
+    table_renderer.TABLE_RENDERER = table_renderer.TableRenderer(enabled=False)
+    server = FakeOllama(
+        "ollama", models=["qwen3:32b", "qwen3:4b"], token_delay=0.002, model_speed={"qwen3:4b": 0.25}, reply=reply
+    ).start()
+    models.OLLAMA_CLIENT = models.OllamaClient([server.endpoint], router={"health_interval": 0})
+
+    async with models.OLLAMA_CLIENT:
+        await mcp_sessions.MCP_SESSIONS.start()
+        old = await bench(False)
+        new = await bench(True)
+
+        cache = result_cache.MCP_RESULT_CACHE
+        # 手动失效: execute_sql 的结果重新查询, 表结构仍命中
+        invalidated = cache.invalidate("fuxi_farm", "execute_sql")
+        before = round_trips()
+        async for _ in run_postgres_mcp_tool(QUESTIONS[0], [], []):
+            pass
+        after_invalidate = round_trips() - before
+        # TTL 过期: sql_ttl 很短时重复问题再次访问数据库
+        cache.sql_ttl = 0.1
+        cache.invalidate()
+        async for _ in run_postgres_mcp_tool(QUESTIONS[0], [], []):
+            pass
+        await asyncio.sleep(0.2)
+        before = round_trips()
+        async for _ in run_postgres_mcp_tool(QUESTIONS[0], [], []):
+            pass
+        after_expire = round_trips() - before
+        await mcp_sessions.MCP_SESSIONS.stop()
+    server.stop()
+    mcp_server.stop()
+
+    print(f"{len(QUESTIONS)} 个问题, 每个 4 次工具调用 (其中一次为重复的 SQL)")
+    print(f"{'模式':<10}{'数据库调用':>10}{'首个(s)':>10}{'重复(s)':>10}{'总计(s)':>10}")
+    for name, result in [("no cache", old), ("cache", new)]:
+        print(
+            f"{name:<10}{result['round_trips']:>10}{result['first']:>10.3f}"
+            f"{result['repeat']:>10.3f}{result['total']:>10.3f}"
+        )
+    print("缓存统计:", new["stats"])
+    print(f"手动失效 {invalidated} 条 execute_sql 结果后, 重复问题的数据库调用: {after_invalidate}")
+    print(f"sql_ttl 过期后, 重复问题的数据库调用: {after_expire}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
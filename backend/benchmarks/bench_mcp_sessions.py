@@ -0,0 +1,146 @@
+"""
+MCP 工具调用: 每次获取目录并进入客户端上下文 (旧) vs 常驻会话 + 目录缓存 (新)
+
+在本地启动一个 SSE 传输的 FastMCP 替身服务器, execute_sql 固定耗时 SQL_SECONDS,
+统计单次调用延迟中超出 SQL 执行时间的开销、并发调用的总耗时, 并验证服务器重启后自动重连.
+在 backend 目录下运行:
+    python -m benchmarks.bench_mcp_sessions
+"""
+import asyncio
+import logging
+import statistics
+import threading
+import time
+
+import uvicorn
+from fastmcp import Client, FastMCP
+
+from benchmarks.fake_ollama import free_port
+from mcp_plugins.mcp_sessions import McpSessions
+
+SQL_SECONDS = 0.02
+CALLS = 30
+CONCURRENT = 8
+
+
+def create_server(sql_seconds: float = SQL_SECONDS) -> FastMCP:
+    mcp = FastMCP("fake-postgres")
+
+    @mcp.tool
+    async def list_schemas() -> str:
+        return "public"
+
+    @mcp.tool
+    async def list_objects(schema_name: str) -> str:
+        await asyncio.sleep(sql_seconds)
+        return f"[{{'schema': {schema_name!r}, 'name': 'seed_stock', 'type': 'table'}}]"
+
+    @mcp.tool
+    async def get_object_details(schema_name: str, object_name: str) -> str:
+        await asyncio.sleep(sql_seconds)
+        return f"{{'basic': {{'schema': {schema_name!r}, 'name': {object_name!r}}}, 'columns': ['variety', 'stock']}}"
+
+    @mcp.tool
+    async def execute_sql(sql: str) -> str:
+        await asyncio.sleep(sql_seconds)
+        return f"[{{'rows': 1, 'sql': {sql!r}}}]"
+
+    return mcp
+
+
+class McpServerThread:
+    def __init__(self, port: int, sql_seconds: float = SQL_SECONDS):
+        self.port = port
+        self.sql_seconds = sql_seconds
+        self._server = None
+        self._thread = None
+
+    def start(self) -> "McpServerThread":
+        app = create_server(self.sql_seconds).http_app(transport="sse")
+        config = uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="critical")
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        self._server.should_exit = True
+        self._server.force_exit = True
+        self._thread.join()
+
+
+async def old_call(client: Client, args: dict):
+    # 原 call_tool_with_stream: 每次 list_tools 并重新进入 async with, 工具名带服务器前缀
+    await client.list_tools()
+    async with client as c:
+        return await c.call_tool("db_execute_sql", args)
+
+
+async def measure(call) -> dict:
+    latencies = []
+    for i in range(CALLS):
+        started = time.perf_counter()
+        await call({"sql": f"SELECT {i}"})
+        latencies.append(time.perf_counter() - started)
+    started = time.perf_counter()
+    await asyncio.gather(*(call({"sql": f"SELECT {i}"}) for i in range(CONCURRENT)))
+    return {
+        "p50": statistics.median(latencies),
+        "overhead": statistics.median(latencies) - SQL_SECONDS,
+        "concurrent": time.perf_counter() - started,
+    }
+
+
+async def main():
+    port, other_port = free_port(), free_port()
+    url = f"http://127.0.0.1:{port}/sse"
+    server = McpServerThread(port).start()
+    other = McpServerThread(other_port).start()
+
+    # 旧: lifespan 中保持打开的多服务器组合客户端 (与 config.jsonc 一样配置两台)
+    old_client = Client(
+        {
+            "mcpServers": {
+                "db": {"transport": "sse", "url": url},
+                "other": {"transport": "sse", "url": f"http://127.0.0.1:{other_port}/sse"},
+            }
+        }
+    )
+    async with old_client:
+        old = await measure(lambda args: old_call(old_client, args))
+
+    sessions = McpSessions({"db": url}, health_interval=0.5)
+    await sessions.start()
+    new = await measure(lambda args: sessions.get("db").call_tool("execute_sql", args))
+
+    print(f"SQL 执行 {SQL_SECONDS * 1000:.0f}ms, 顺序 {CALLS} 次, 并发 {CONCURRENT} 个\n")
+    print(f"{'模式':<10}{'p50(ms)':>10}{'额外开销(ms)':>14}{'并发总耗时(ms)':>16}")
+    for mode, r in (("old", old), ("session", new)):
+        print(f"{mode:<10}{r['p50'] * 1000:>10.1f}{r['overhead'] * 1000:>14.1f}{r['concurrent'] * 1000:>16.1f}")
+
+    # 服务器重启后, 下一次调用自动重连 (断开时 SSE 读取任务的报错不输出)
+    logging.getLogger("mcp").setLevel(logging.CRITICAL)
+    server.stop()
+    server = McpServerThread(port).start()
+    result = await sessions.get("db").call_tool("execute_sql", {"sql": "SELECT 1"})
+    print("\n重启后调用:", result.content[0].text)
+
+    # 写语句不自动重试 (断开前可能已经执行), 会话已重连, 由调用方决定是否再次执行
+    server.stop()
+    server = McpServerThread(port).start()
+    try:
+        await sessions.get("db").call_tool("execute_sql", {"sql": "UPDATE t SET v = 1"})
+        print("重启后写语句: 已重试")
+    except Exception as e:
+        print("重启后写语句: 未重试,", type(e).__name__)
+    print("会话统计:", sessions.session_stats()["db"])
+
+    await sessions.stop()
+    server.stop()
+    other.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,106 @@
+"""
+辅助 LLM 调用全部使用 qwen3:32b (旧) vs 按调用点分层路由 (新)
+
+使用本地替身服务器 (benchmarks/fake_ollama.py), qwen3:4b 的预填充与生成耗时按 0.25 倍模拟,
+每 4 次规划中有 1 次输出无法解析的内容以触发大模型重试. 按调用点统计延迟与 GPU 时间 (total_duration).
+在 backend 目录下运行:
+    python -m benchmarks.bench_model_routes
+"""
+import asyncio
+import itertools
+
+from utils.load_config import load_config
+
+load_config()
+
+import utils.models as models
+from benchmarks.fake_ollama import FakeOllama
+from mcp_plugins.postgres_mcp import is_valid_plan
+from utils.load_config import global_config
+from utils.model_routes import ModelRoutes
+from utils.promptsArchive import (NO_RELATION, get_history_summary_prompt,
+                                  get_mcp_prompt, get_rag_analysis_prompt)
+
+CALLS = 20
+QUESTIONS = ["玉米螟怎么防治", "今天股票行情", "河北小麦什么时候播种", "讲个笑话", "水稻稻曲病用什么药"]
+TIERED = {
+    "rag_gate": {"model": "qwen3:4b", "fallback": "qwen3:32b"},
+    "mcp_planner": {"model": "qwen3:4b", "fallback": "qwen3:32b"},
+    "history_summary": {"model": "qwen3:4b", "fallback": "qwen3:32b"},
+}
+
+_small_plans = itertools.count()
+
+
+def reply(data: dict) -> str:
+    prompt = data["prompt"]
+    if "MCP 工具智能助手" in prompt:
+        if data["model"] == "qwen3:4b" and next(_small_plans) % 4 == 3:
+            return "我需要先查看一下有哪些表, 然后再决定调用哪个工具."
+        return '```json\n{"tool": "execute_sql", "args": {"sql": "SELECT name FROM crops LIMIT 10"}}\n```'
+    if "对话摘要助手" in prompt:
+        return "用户询问了玉米螟防治, 小羲建议心叶末期撒施颗粒剂, 并说明了用量与时间. " * 3
+    return NO_RELATION if ("股票" in prompt or "笑话" in prompt) else "yes"
+
+
+def prompts(site: str):
+    if site == "rag_gate":
+        return [get_rag_analysis_prompt(QUESTIONS[i % len(QUESTIONS)]) for i in range(CALLS)]
+    if site == "mcp_planner":
+        db_config = next(iter(global_config.mcp_db_dict.values()))
+        dbs = list(db_config.get("schemas", {}).values())
+        return [get_mcp_prompt(f"查询种植面积最大的作物 {i}", "", dbs) for i in range(CALLS)]
+    turns = "用户: 玉米螟怎么防治\n小羲: 心叶末期撒施颗粒剂 ... " * 10
+    return [get_history_summary_prompt("", turns, 300) for _ in range(CALLS // 4)]
+
+
+async def bench(routes: dict) -> dict:
+    router = ModelRoutes(routes)
+    semaphore = asyncio.Semaphore(4)
+
+    async def call(site: str, prompt: str):
+        async with semaphore:
+            accept = is_valid_plan if site == "mcp_planner" else None
+            await router.generate(site, prompt, accept=accept)
+
+    for site in ("rag_gate", "mcp_planner", "history_summary"):
+        await asyncio.gather(*(call(site, prompt) for prompt in prompts(site)))
+    return router.route_stats()
+
+
+def totals(stats: dict) -> tuple:
+    calls = sum(m["calls"] for m in stats["models"].values())
+    seconds = sum(m["calls"] * m["avg_ms"] for m in stats["models"].values()) / 1000
+    gpu = sum(m["gpu_seconds"] for m in stats["models"].values())
+    return calls, seconds, gpu
+
+
+async def main():
+    # 大模型约 0.05ms / 字符预填充、20ms / token
+    server = FakeOllama(
+        "ollama",
+        models=["qwen3:32b", "qwen3:4b", "qwen2.5vl:7b"],
+        token_delay=0.02,
+        prefill_per_char=0.00005,
+        model_speed={"qwen3:4b": 0.25},
+        reply=reply,
+    ).start()
+    models.OLLAMA_CLIENT = models.OllamaClient([server.endpoint], router={"health_interval": 0})
+    async with models.OLLAMA_CLIENT:
+        results = {"all-32b": await bench({}), "tiered": await bench(TIERED)}
+    server.stop()
+
+    print(f"{'调用点':<16}{'模式':<10}{'请求数':>8}{'平均延迟(ms)':>14}{'GPU 时间(s)':>13}{'重试':>6}")
+    for site in ("rag_gate", "mcp_planner", "history_summary"):
+        for mode, result in results.items():
+            calls, seconds, gpu = totals(result[site])
+            per_call = seconds / CALLS if site != "history_summary" else seconds / (CALLS // 4)
+            print(
+                f"{site:<16}{mode:<10}{calls:>8}{per_call * 1000:>14.1f}{gpu:>13.2f}"
+                f"{result[site]['retries']:>6}"
+            )
+        print(f"{'':<16}{'按模型':<10}{results['tiered'][site]['models']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
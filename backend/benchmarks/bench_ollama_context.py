@@ -0,0 +1,90 @@
+"""
+多轮对话: 完整 prompt (旧) vs 续接 Ollama context (新)
+
+使用记录请求内容的本地替身服务器 (benchmarks/fake_ollama.py), 其预填充耗时与收到的 prompt 长度成正比,
+传入 context 时只预填充新的 prompt. 统计每种模式下发送的 prompt 字符数、请求体大小与预填充耗时.
+在 backend 目录下运行:
+    python -m benchmarks.bench_ollama_context
+"""
+import asyncio
+import json
+import time
+
+from utils.load_config import load_config
+
+load_config()
+
+import utils.models as models
+from benchmarks.fake_ollama import FakeOllama
+from utils.context_store import OllamaContextStore
+from utils.memory import WindowedSummaryMemory
+from utils.models import OllamaClient, generate_with_ollama_stream
+from utils.prompt_budget import PromptBudget
+from utils.promptsArchive import (get_agriculture_followup_prompt,
+                                  get_agriculture_prompt_without_image)
+
+MODEL = "qwen3:32b"
+CHATS = 4
+TURNS = 6
+QUESTIONS = ["玉米螟怎么防治", "用什么药效果好", "每亩用量多少", "什么时候打药", "下雨后要补喷吗", "有没有生物防治办法"]
+RAG_RESULT = [{"id": "1", "text": "玉米螟防治: 心叶末期撒施颗粒剂, 或喷施氯虫苯甲酰胺. " * 6}]
+
+
+async def run_chat(mode: str, chat_id: str, budget: PromptBudget, store: OllamaContextStore, totals: dict):
+    memory = WindowedSummaryMemory(max_window=10)
+    for turn in range(TURNS):
+        question = QUESTIONS[turn % len(QUESTIONS)]
+        context = store.get(chat_id, MODEL, memory) if mode == "context" else None
+        if context is not None:
+            prompt = budget.assemble_followup(get_agriculture_followup_prompt, question, RAG_RESULT)
+        else:
+            prompt = budget.assemble(get_agriculture_prompt_without_image, question, memory, RAG_RESULT)
+        payload = {"model": MODEL, "prompt": prompt, "context": context}
+        totals["prompt_chars"] += len(prompt)
+        totals["request_bytes"] += len(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+
+        answer = ""
+        async for chunk in generate_with_ollama_stream(prompt, model=MODEL, chat_id=chat_id, context=context):
+            if chunk.get("done"):
+                totals["prefill_seconds"] += chunk["prompt_eval_duration"] / 1e9
+                totals["turns"] += 1
+                memory.save_context({"input": question}, {"response": answer})
+                if mode == "context":
+                    store.put(chat_id, MODEL, chunk["context"], {"input": question, "output": answer})
+            else:
+                answer += chunk["response"]
+
+
+async def bench(mode: str) -> dict:
+    budget = PromptBudget(num_ctx=32768, reserve_output=2048)
+    store = OllamaContextStore(enabled=True, max_context_tokens=32768)
+    totals = {"turns": 0, "prompt_chars": 0, "request_bytes": 0, "prefill_seconds": 0.0}
+    started = time.perf_counter()
+    await asyncio.gather(*(run_chat(mode, f"chat-{i}", budget, store, totals) for i in range(CHATS)))
+    totals["wall"] = time.perf_counter() - started
+    totals["store"] = store.context_stats()
+    return totals
+
+
+async def main():
+    # 约 0.1ms / 字符的预填充, 回答约 100 个 token
+    server = FakeOllama("ollama", tokens=100, token_delay=0.001, prefill_per_char=0.0001).start()
+    models.OLLAMA_CLIENT = OllamaClient([server.endpoint], router={"health_interval": 0})
+    results = {}
+    async with models.OLLAMA_CLIENT:
+        for mode in ("full", "context"):
+            results[mode] = await bench(mode)
+    server.stop()
+
+    print(f"{CHATS} 个会话 x {TURNS} 轮\n")
+    print(f"{'模式':<10}{'prompt 字符':>12}{'请求体字节':>12}{'预填充(s)':>12}{'每轮预填充(ms)':>16}{'总耗时(s)':>12}")
+    for mode, r in results.items():
+        print(
+            f"{mode:<10}{r['prompt_chars']:>12}{r['request_bytes']:>12}{r['prefill_seconds']:>12.2f}"
+            f"{r['prefill_seconds'] / r['turns'] * 1000:>16.1f}{r['wall']:>12.2f}"
+        )
+    print("\ncontext store:", results["context"]["store"])
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,107 @@
+"""
+多台 Ollama 路由检查: 负载均衡、chat 亲和、故障摘除与恢复
+
+使用本地替身服务器 (benchmarks/fake_ollama.py), 无需外部服务. 在 backend 目录下运行:
+    python -m benchmarks.bench_ollama_router
+"""
+import asyncio
+import time
+from collections import Counter
+
+from utils.load_config import load_config
+
+load_config()
+
+import httpx
+
+from benchmarks.fake_ollama import FakeOllama
+from utils.models import OllamaClient
+
+ROUTER = {"health_interval": 0.5, "failure_threshold": 2, "eject_seconds": 2, "affinity_slack": 2}
+
+
+def served(servers) -> Counter:
+    return Counter({s.name: len(s.requests) for s in servers})
+
+
+def reset(servers) -> None:
+    for s in servers:
+        s.requests.clear()
+
+
+async def ask(client: OllamaClient, model: str, chat_id=None) -> str:
+    owner = ""
+    async for chunk in client.stream(
+        "/api/generate", {"model": model, "prompt": "玉米螟怎么防治", "stream": True}, chat_id=chat_id
+    ):
+        owner = owner or chunk.get("response", "").split("-")[0]
+    return owner
+
+
+async def main():
+    # a 较慢, b 较快, 二者提供 qwen3:32b; c 仅提供视觉模型
+    a = FakeOllama("a", models=["qwen3:32b"], token_delay=0.02).start()
+    b = FakeOllama("b", models=["qwen3:32b"], token_delay=0.005).start()
+    c = FakeOllama("c", models=["qwen2.5vl:7b"]).start()
+    servers = [a, b, c]
+
+    async with OllamaClient([s.endpoint for s in servers], router=ROUTER) as client:
+        await asyncio.sleep(0.1)
+        reset(servers)
+
+        # 1. 负载均衡: 200 个无 chat_id 的请求, 最多 20 个并发
+        semaphore = asyncio.Semaphore(20)
+
+        async def limited(model):
+            async with semaphore:
+                return await ask(client, model)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(limited("qwen3:32b") for _ in range(200)), *(limited("qwen2.5vl:7b") for _ in range(20)))
+        print(f"[均衡] 220 个请求用时 {time.perf_counter() - started:.2f}s, 分布 {dict(served(servers))}")
+        print("       (b 更快、未完成请求更少, 应承接更多; qwen2.5vl:7b 只会发往 c)")
+
+        # 2. 亲和: 20 个会话, 每个 5 轮, 与另外 10 个并发背景请求交错
+        reset(servers)
+        sticky = total = 0
+
+        async def conversation(chat_id):
+            nonlocal sticky, total
+            last = None
+            for _ in range(5):
+                owner = await ask(client, "qwen3:32b", chat_id=chat_id)
+                if last is not None:
+                    total += 1
+                    sticky += owner == last
+                last = owner
+
+        await asyncio.gather(*(conversation(f"chat-{i}") for i in range(20)), *(limited("qwen3:32b") for _ in range(10)))
+        print(f"[亲和] 同一会话连续两轮落在同一台: {sticky}/{total}")
+
+        # 3. 故障: 停掉 b, 连接错误与健康检查都会将其摘除, 请求全部转到 a
+        b.stop()
+        reset(servers)
+        errors = 0
+        for i in range(20):
+            try:
+                await ask(client, "qwen3:32b", chat_id=f"chat-{i}")
+            except httpx.TransportError:
+                errors += 1
+        ejected = next(e for e in client.router.endpoints if e.base_url.endswith(str(b.port)))
+        print(f"[摘除] b 停止后 20 个请求: 失败 {errors}, 分布 {dict(served(servers))}, b healthy={ejected.healthy}")
+
+        # 4. 恢复: 重新启动 b, 等待健康检查将其加回
+        b.start()
+        await asyncio.sleep(ROUTER["health_interval"] * 2)
+        reset(servers)
+        await asyncio.gather(*(limited("qwen3:32b") for _ in range(40)))
+        print(f"[恢复] b 重启后 40 个请求分布 {dict(served(servers))}, b healthy={ejected.healthy}")
+
+        print("\n", client.pool_stats()["endpoints"])
+
+    for s in servers:
+        s.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""
+对比本地向量相关性判断与 LLM 判断的结果和耗时
+
+用法 (在 backend 目录下, 需要可访问的 Ollama):
+    python -m benchmarks.bench_rag_gate
+"""
+import asyncio
+import time
+
+from utils.load_config import load_config
+
+load_config()
+
+from rag.rag import llm_relevance_check
+from rag.relevance_gate import get_relevance_gate
+from utils.embedding import embed_query
+from utils.models import get_ollama_client
+
+SAMPLE_QUERIES = [
+    "水稻稻曲病怎么防治",
+    "玉米叶子上有黄褐色的大斑是什么病",
+    "稻纵卷叶螟用什么药",
+    "玉米田里的杂草怎么除",
+    "地老虎咬断玉米苗怎么办",
+    "水稻纹枯病的症状",
+    "玉米螟什么时候防治最好",
+    "小麦赤霉病如何防治",
+    "番茄叶片发黄卷曲",
+    "今年河北的玉米种植面积有多少",
+    "猪瘟的早期症状有哪些",
+    "奶牛产后瘫痪怎么处理",
+    "怎么给果树修剪",
+    "今天天气怎么样",
+    "帮我写一首关于春天的诗",
+    "伏羲农场现在有多少可用地块",
+    "你是谁",
+    "Python 怎么读取文件",
+]
+
+
+async def main():
+    async with get_ollama_client():
+        gate = get_relevance_gate()
+        started = time.perf_counter()
+        await gate.build()
+        print(f"向量中心构建耗时: {time.perf_counter() - started:.2f}s, 就绪: {gate.ready}\n")
+
+        rows = []
+        for query in SAMPLE_QUERIES:
+            started = time.perf_counter()
+            relevant = await gate.classify(query)
+            local_ms = (time.perf_counter() - started) * 1000
+            # 查询向量已缓存, 不额外计时
+            score = gate.score(await embed_query(query)) if gate.ready else float("nan")
+
+            started = time.perf_counter()
+            llm_relevant = await llm_relevance_check(query)
+            llm_ms = (time.perf_counter() - started) * 1000
+            rows.append((query, score, relevant, local_ms, llm_relevant, llm_ms))
+
+    print(f"{'问题':<24}{'相似度':>8}{'本地':>8}{'耗时ms':>10}{'LLM':>8}{'耗时ms':>10}")
+    for query, score, relevant, local_ms, llm_relevant, llm_ms in rows:
+        local = "?" if relevant is None else ("yes" if relevant else "no")
+        print(f"{query:<24}{score:>8.3f}{local:>8}{local_ms:>10.1f}{'yes' if llm_relevant else 'no':>8}{llm_ms:>10.1f}")
+
+    decided = [r for r in rows if r[2] is not None]
+    agree = sum(1 for r in decided if r[2] == r[4])
+    print(f"\n判定统计: {gate.stats}")
+    print(f"本地直接判定: {len(decided)}/{len(rows)}, 与 LLM 一致: {agree}/{len(decided)}")
+    print(f"本地平均耗时: {sum(r[3] for r in rows) / len(rows):.1f}ms (首次向量化, 未命中缓存)")
+    print(f"LLM 平均耗时: {sum(r[5] for r in rows) / len(rows):.1f}ms")
+    # 实际请求中不确定区间仍会调用 LLM
+    mixed = sum(r[3] + (r[5] if r[2] is None else 0) for r in rows) / len(rows)
+    print(f"本地 + 不确定回退 LLM 平均耗时: {mixed:.1f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
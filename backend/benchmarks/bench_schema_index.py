@@ -0,0 +1,68 @@
+"""
+MCP 规划 prompt 中的表信息: keyword_maps 命中表的 Python repr (旧) vs 检索选表 + 紧凑格式 (新)
+
+不调用任何服务; 未构建向量时按字符重合度选表, 向量检索的效果需在真实 bge-m3 上检查.
+统计每个问题的表信息字符数与近似 token 数, 以及选中的表.
+在 backend 目录下运行:
+    python -m benchmarks.bench_schema_index
+"""
+import asyncio
+import json
+
+from utils.load_config import load_config
+
+load_config()
+
+from mcp_plugins.schema_index import SchemaIndex, render_table
+from utils.load_config import global_config
+from utils.prompt_budget import estimate_tokens
+from utils.keyword_router import get_keyword_router
+
+QUESTIONS = [
+    "伏羲 种子库里京科968还有多少",
+    "伏羲 地块总面积是多少",
+    "伏羲 最近一周的气象数据",
+    "伏羲 农机作业了多少亩",
+    "伏羲 今年的病虫害预警有哪些",
+    "重庆粮油 仓库的稻谷库存",
+]
+
+
+def old_dbs(db_config: dict, question: str):
+    # 原实现: 第一个命中的 keyword_maps 条目的表结构复制后以 repr 放入 prompt; 未命中时为 None (错误的字典层级)
+    names = next(
+        ([t.get("name") for t in item["tables"]] for item in db_config.get("keyword_maps") or [] if item["key"] in question),
+        None,
+    )
+    if not names:
+        return None
+    tables = []
+    for name in names:
+        schema = json.loads(json.dumps(db_config["schemas"].get(name)))
+        schema["name"] = name
+        tables.append(schema)
+    return tables
+
+
+async def main():
+    index = SchemaIndex(**global_config.schema_index)
+    all_tables = {
+        db_key: "\n".join(render_table(name, schema) for name, schema in db_config["schemas"].items())
+        for db_key, db_config in global_config.mcp_db_dict.items()
+    }
+    print("全部表 (紧凑格式) 的 token:", {db_key: estimate_tokens(text) for db_key, text in all_tables.items()})
+    print(f"\n{'问题':<24}{'旧 字符':>10}{'旧 token':>10}{'新 字符':>10}{'新 token':>10}  选中的表")
+    for question in QUESTIONS:
+        route = get_keyword_router().route(question)
+        db_key = route.databases[0]
+        old = str(old_dbs(global_config.mcp_db_dict[db_key], question))
+        new = await index.select(db_key, question, route.tables.get(db_key, ()))
+        names = [line.split("(", 1)[0] for line in new.splitlines()]
+        print(
+            f"{question:<24}{len(old):>10}{estimate_tokens(old):>10}{len(new):>10}{estimate_tokens(new):>10}  {names}"
+        )
+    print("\n选表统计:", index.index_stats())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,111 @@
+"""
+MCP 数据库问答: 每次走规划循环 (旧) vs 已验证 SQL 计划缓存 (新)
+
+本地替身: FakeOllama 充当规划模型 (第一轮给出 execute_sql, 有结果后结束) 与总结模型,
+SSE 传输的 FastMCP 服务器执行 SQL. 同一问题模板换不同品种提问, 统计规划调用次数与每个问题的耗时,
+最后修改 schema 哈希验证计划失效.
+在 backend 目录下运行:
+    python -m benchmarks.bench_sql_plan_cache
+"""
+import asyncio
+import logging
+import os
+import re
+import tempfile
+import time
+
+from utils.load_config import load_config
+
+load_config()
+
+import mcp_plugins.mcp_sessions as mcp_sessions
+import mcp_plugins.result_cache as result_cache
+import mcp_plugins.table_renderer as table_renderer
+import utils.models as models
+import utils.sql_plan_cache as sql_plan_cache
+from benchmarks.bench_mcp_sessions import McpServerThread
+from benchmarks.fake_ollama import FakeOllama, free_port
+from mcp_plugins.postgres_mcp import run_postgres_mcp_tool
+from utils.load_config import global_config
+from utils.promptsArchive import END_KEYWORD
+
+VARIETIES = ["京科968", "郑单958", "先玉335", "登海605"]
+QUESTIONS = [f"伏羲 {VARIETIES[i % len(VARIETIES)]} 的种子库存有多少" for i in range(12)]
+
+
+def reply(data: dict) -> str:
+    prompt = data["prompt"]
+    if "MCP 工具智能助手" in prompt:
+        if "TOOL(execute_sql" in prompt:
+            return END_KEYWORD
+        variety = re.search(r"伏羲 (\S+) 的种子库存", prompt).group(1)
+        sql = f"SELECT SUM(stock) FROM seed_stock WHERE variety = '{variety}'"
+        return f'```json\n{{"tool": "execute_sql", "args": {{"sql": "{sql}"}}}}\n```'
+    return "该品种当前库存充足. "
+
+
+async def bench(enabled: bool, path: str, server: FakeOllama) -> dict:
+    hashes = {key: sql_plan_cache.schema_hash(value) for key, value in global_config.mcp_db_dict.items()}
+    sql_plan_cache.SQL_PLAN_CACHE = sql_plan_cache.SqlPlanCache(hashes, enabled=enabled, path=path)
+    planner_calls = len([r for r in server.requests if "MCP 工具智能助手" in r.get("prompt", "")])
+    latencies = []
+    for question in QUESTIONS:
+        started = time.perf_counter()
+        async for _ in run_postgres_mcp_tool(question, [], []):
+            pass
+        latencies.append(time.perf_counter() - started)
+    return {
+        "planner_calls": len([r for r in server.requests if "MCP 工具智能助手" in r.get("prompt", "")])
+        - planner_calls,
+        "first": latencies[0],
+        "repeat": sum(latencies[len(VARIETIES):]) / (len(latencies) - len(VARIETIES)),
+        "total": sum(latencies),
+        "stats": sql_plan_cache.SQL_PLAN_CACHE.plan_stats(),
+    }
+
+
+async def main():
+    logging.getLogger("mcp").setLevel(logging.CRITICAL)
+    mcp_port = free_port()
+    mcp_server = McpServerThread(mcp_port).start()
+    mcp_sessions.MCP_SESSIONS = mcp_sessions.McpSessions({"fuxi_farm": f"http://127.0.0.1:{mcp_port}/sse"})
+    # 每个问题都走总结模型, 不直接渲染表格
+    table_renderer.TABLE_RENDERER = table_renderer.TableRenderer(enabled=False)
+    # 每次都访问数据库, 不使用 MCP 结果缓存
+    result_cache.MCP_RESULT_CACHE = result_cache.McpResultCache(enabled=False)
+    # 规划 prompt 包含表结构, 约 0.02ms / 字符预填充
+    server = FakeOllama(
+        "ollama",
+        models=["qwen3:32b", "qwen3:4b"],
+        token_delay=0.01,
+        prefill_per_char=0.00002,
+        model_speed={"qwen3:4b": 0.25},
+        reply=reply,
+    ).start()
+    models.OLLAMA_CLIENT = models.OllamaClient([server.endpoint], router={"health_interval": 0})
+
+    path = os.path.join(tempfile.mkdtemp(), "sql_plans.db")
+    async with models.OLLAMA_CLIENT:
+        await mcp_sessions.MCP_SESSIONS.start()
+        results = {"planning": await bench(False, path, server), "plan_cache": await bench(True, path, server)}
+        await mcp_sessions.MCP_SESSIONS.stop()
+    server.stop()
+    mcp_server.stop()
+
+    print(f"{len(QUESTIONS)} 个问题, {len(VARIETIES)} 个品种, 同一问题模板\n")
+    print(f"{'模式':<12}{'规划调用':>10}{'首次(ms)':>12}{'重复模板(ms)':>14}{'总耗时(s)':>12}")
+    for mode, r in results.items():
+        print(
+            f"{mode:<12}{r['planner_calls']:>10}{r['first'] * 1000:>12.1f}"
+            f"{r['repeat'] * 1000:>14.1f}{r['total']:>12.2f}"
+        )
+    print("\n计划缓存:", results["plan_cache"]["stats"])
+
+    # schema 变化: 以不同的哈希重新加载, 已保存的计划全部删除
+    changed = {key: "changed" for key in global_config.mcp_db_dict}
+    reloaded = sql_plan_cache.SqlPlanCache(changed, path=path)
+    print("schema 变化后:", {"plans": len(reloaded._plans), "invalidated": reloaded.stats["invalidated"]})
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,62 @@
+"""
+MCP execute_sql 结果: 原样拼入 prompt (旧) vs 限制行数/字节并换成摘要 (新)
+
+不调用任何服务; 构造 postgres-mcp 格式 (str(list[dict]), 含 Decimal / datetime) 的查询结果,
+统计不同行数下规划 prompt 的大小、近似 token 数与处理耗时, 以及发给前端的 table 帧数.
+在 backend 目录下运行:
+    python -m benchmarks.bench_sql_result
+"""
+import datetime
+import decimal
+import time
+
+from utils.load_config import load_config
+
+load_config()
+
+from mcp_plugins.sql_result import SqlResultFormatter
+from utils.load_config import global_config
+from utils.prompt_budget import estimate_tokens
+from utils.promptsArchive import get_mcp_prompt
+
+QUESTION = "伏羲 所有地块的种植情况"
+SQL = "SELECT * FROM farm_plant_plot_info"
+ROWS = [1, 10, 50, 200, 1000, 10000]
+
+
+def tool_output(rows: int) -> str:
+    return str(
+        [
+            {
+                "id": i,
+                "plot_name": f"{i % 40}号地块",
+                "crop": ["玉米", "小麦", "大豆"][i % 3],
+                "area": decimal.Decimal("12.50") + i % 17,
+                "plant_date": datetime.date(2024, 4, i % 28 + 1),
+                "updated_at": datetime.datetime(2024, 5, 1, 10, 30, 0),
+                "remark": None if i % 5 else "长势良好",
+            }
+            for i in range(rows)
+        ]
+    )
+
+
+def main():
+    formatter = SqlResultFormatter(**global_config.sql_result)
+    print(f"{'行数':>6}{'旧 prompt 字符':>16}{'旧 token':>10}{'新 prompt 字符':>16}{'新 token':>10}{'处理(ms)':>10}{'table 帧':>10}")
+    for rows in ROWS:
+        output = tool_output(rows)
+        old = get_mcp_prompt(QUESTION, f"TOOL(execute_sql, {{'sql': '{SQL}'}}) => {output}\n", "")
+        started = time.perf_counter()
+        text, frames = formatter.handle("execute_sql", {"sql": SQL}, output)
+        elapsed = (time.perf_counter() - started) * 1000
+        new = get_mcp_prompt(QUESTION, f"TOOL(execute_sql, {{'sql': '{SQL}'}}) => {text}\n", "")
+        print(
+            f"{rows:>6}{len(old):>16}{estimate_tokens(old):>10}{len(new):>16}{estimate_tokens(new):>10}"
+            f"{elapsed:>10.1f}{len(frames):>10}"
+        )
+    print("\n结果统计:", formatter.result_stats())
+
+
+if __name__ == "__main__":
+    main()
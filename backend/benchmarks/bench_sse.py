@@ -0,0 +1,78 @@
+"""
+SSE 输出微基准: 逐 token 发送 (旧) vs 合并成帧 (新)
+
+模拟 N 路并发流, 每路按固定速率产生 token, 统计帧数/秒、字节数与每路 CPU 时间.
+无需外部服务, 在 backend 目录下运行:
+    python -m benchmarks.bench_sse
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+
+from utils.load_config import load_config
+
+load_config()
+
+from utils.utils import SSEFrameCoalescer
+
+STREAMS = 200
+TOKENS_PER_STREAM = 300
+TOKENS_PER_SECOND = 40
+TOKENS = ["玉米", "螟", "的", "防治", "方法", "：", "\n", "| 药剂 |", " 用量 ", "|", "每亩", "50ml"]
+
+
+def legacy_frame(token: str) -> str:
+    # 旧实现: 每个 token 打印一次并单独 json.dumps
+    print("token-------------", token)
+    return f"data: {json.dumps({'type': 'delta', 'token': token}, ensure_ascii=False)}\n\n"
+
+
+async def run_stream(mode: str, counters: dict):
+    coalescer = SSEFrameCoalescer(coalesce=True, flush_interval=0.1, max_bytes=1024)
+    for i in range(TOKENS_PER_STREAM):
+        await asyncio.sleep(1 / TOKENS_PER_SECOND)
+        token = TOKENS[i % len(TOKENS)]
+        frames = [legacy_frame(token)] if mode == "legacy" else coalescer.add(token)
+        for frame in frames:
+            counters["frames"] += 1
+            counters["bytes"] += len(frame.encode("utf-8"))
+    if mode != "legacy" and (frame := coalescer.flush()):
+        counters["frames"] += 1
+        counters["bytes"] += len(frame.encode("utf-8"))
+
+
+async def bench(mode: str):
+    counters = {"frames": 0, "bytes": 0}
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    await asyncio.gather(*(run_stream(mode, counters) for _ in range(STREAMS)))
+    cpu = time.process_time() - cpu
+    wall = time.perf_counter() - wall
+    return counters, wall, cpu
+
+
+async def main():
+    # 旧实现的 print 输出到 /dev/null, 只计算其 CPU 开销
+    stdout = sys.stdout
+    results = {}
+    for mode in ("legacy", "coalesced"):
+        sys.stdout = open(os.devnull, "w")
+        try:
+            results[mode] = await bench(mode)
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+
+    print(f"{STREAMS} 路并发, 每路 {TOKENS_PER_STREAM} tokens @ {TOKENS_PER_SECOND} tok/s\n")
+    print(f"{'模式':<12}{'帧数':>10}{'帧/秒':>12}{'字节':>12}{'CPU(s)':>10}{'每路CPU(ms)':>14}")
+    for mode, (counters, wall, cpu) in results.items():
+        print(
+            f"{mode:<12}{counters['frames']:>10}{counters['frames'] / wall:>12.0f}"
+            f"{counters['bytes']:>12}{cpu:>10.2f}{cpu / STREAMS * 1000:>14.2f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
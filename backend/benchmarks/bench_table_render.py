@@ -0,0 +1,89 @@
+"""
+MCP 查询结果的最终回答: 总是调用总结模型 (旧) vs 简单结果直接渲染 markdown 表格 (新)
+
+不连接数据库; 以 postgres-mcp 格式的 execute_sql 输出构造几类问题, FakeOllama 充当总结模型
+(约 0.03s / token 输出, 0.1ms / 字符预填充, 接近 qwen3:32b 在单卡上的速度).
+统计每个问题回答的耗时、是否直接渲染, 并打印渲染结果.
+在 backend 目录下运行:
+    python -m benchmarks.bench_table_render
+"""
+import asyncio
+import time
+
+from utils.load_config import load_config
+
+load_config()
+
+import utils.models as models
+from benchmarks.fake_ollama import FakeOllama
+from mcp_plugins.postgres_mcp import summarize
+from mcp_plugins.table_renderer import TableRenderer
+from utils.load_config import global_config
+
+SEEDS = [
+    {"variety": v, "crop_name": "玉米", "seeding_rate": r, "breeding_institute": i}
+    for v, r, i in [
+        ("京科968", 2.5, "北京市农林科学院"),
+        ("郑单958", 2.0, "河南省农业科学院"),
+        ("先玉335", 2.2, "铁岭先锋种子研究有限公司"),
+        ("登海605", 2.0, "山东登海种业股份有限公司"),
+    ]
+]
+CASES = [
+    ("伏羲 有多少个种植地块", "SELECT COUNT(*) FROM farm_plant_plot_info", str([{"count": 42}])),
+    (
+        "伏羲 种子库里有哪些玉米品种",
+        "SELECT variety, crop_name, seeding_rate, breeding_institute FROM seed_bank_info WHERE crop_name = '玉米' LIMIT 10",
+        str(SEEDS),
+    ),
+    (
+        "伏羲 每个地块种了什么品种",
+        "SELECT p.plot_name, s.variety FROM farm_plant_plot_info p JOIN seed_bank_info s ON p.id = s.id",
+        str([{"plot_name": f"{i}号地块", "variety": "京科968"} for i in range(5)]),
+    ),
+    (
+        "伏羲 所有地块的名称",
+        "SELECT plot_name FROM farm_plant_plot_info",
+        str([{"plot_name": f"{i}号地块"} for i in range(200)]),
+    ),
+]
+
+
+def reply(data: dict) -> str:
+    # 总结模型把结果改写成中文说明与表格, 长度与直接渲染的结果相当再加上说明
+    return "根据数据库的查询结果, 整理如下: " + "| 品种 | 亩播量 |\n" * 12 + "以上数据来自伏羲农场数据库. "
+
+
+async def main():
+    server = FakeOllama(
+        "ollama", models=["qwen3:32b"], token_delay=0.03, prefill_per_char=0.0001, reply=reply
+    ).start()
+    models.OLLAMA_CLIENT = models.OllamaClient([server.endpoint], router={"health_interval": 0})
+    renderer = TableRenderer(**global_config.table_render)
+
+    print(f"{'问题':<22}{'总结(ms)':>10}{'渲染(ms)':>10}  直接渲染")
+    rendered_outputs = []
+    async with models.OLLAMA_CLIENT:
+        for question, sql, output in CASES:
+            context = f"TOOL(execute_sql, {{'sql': {sql!r}}}) => {output}\n"
+            started = time.perf_counter()
+            async for _ in summarize(question, context, [], []):
+                pass
+            summary_ms = (time.perf_counter() - started) * 1000
+
+            started = time.perf_counter()
+            rendered = renderer.render([("fuxi_farm", "伏羲", [(sql, [output])])], [])
+            render_ms = (time.perf_counter() - started) * 1000
+            answer_ms = render_ms if rendered is not None else summary_ms
+            print(f"{question:<22}{summary_ms:>10.0f}{answer_ms:>10.1f}  {rendered is not None}")
+            if rendered is not None:
+                rendered_outputs.append((question, rendered))
+    server.stop()
+
+    for question, rendered in rendered_outputs:
+        print(f"\n{question}:\n{rendered}")
+    print("渲染统计:", renderer.render_stats())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,180 @@
+"""
+本地 Ollama 替身服务器, 供 benchmarks 下的脚本使用 (无需 GPU)
+
+实现 /api/tags、/api/generate 与 /api/chat (流式/非流式)、/api/embed 的最小子集,
+并记录收到的请求, 便于脚本检查路由与请求内容.
+"""
+import asyncio
+import hashlib
+import json
+import socket
+import threading
+import os
+import time
+from typing import Callable, Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class FakeOllama:
+    """
+    在后台线程中运行的替身服务器
+
+    token_delay: 每个 token 的生成耗时 (秒)
+    prefill_per_char: 每个 prompt 字符的预填充耗时 (秒), 用于模拟长 prompt 的开销;
+        与 Ollama 一样, 传入 context 时只预填充新的 prompt
+    model_speed: 按模型缩放预填充与生成耗时, 如 {"qwen3:4b": 0.2} 模拟小模型
+    reply: 根据请求内容返回回答文本 (按约 4 个字符切分为 token), 默认输出 "<name>-<i>" 序列
+    prefix_slots: 大于 0 时模拟服务端的前缀 KV 缓存: 保留最近 prefix_slots 个请求的 prompt 及其生成内容 (LRU),
+        新请求只需预填充与其中最长公共前缀之后的部分
+    """
+
+    def __init__(
+        self,
+        name: str,
+        models: Optional[List[str]] = None,
+        tokens: int = 20,
+        token_delay: float = 0.01,
+        prefill_per_char: float = 0.0,
+        prefix_slots: int = 0,
+        model_speed: Optional[Dict[str, float]] = None,
+        reply: Optional[Callable[[dict], str]] = None,
+    ):
+        self.name = name
+        self.models = models or ["qwen3:32b", "qwen2.5vl:7b", "bge-m3"]
+        self.tokens = tokens
+        self.token_delay = token_delay
+        self.prefill_per_char = prefill_per_char
+        self.prefix_slots = prefix_slots
+        self.model_speed = model_speed or {}
+        self.reply = reply
+        self._slots: List[str] = []
+        self.port = free_port()
+        self.requests: List[dict] = []
+        self._server: Optional[uvicorn.Server] = None
+        self._thread: Optional[threading.Thread] = None
+        self.app = self._create_app()
+
+    @property
+    def endpoint(self) -> dict:
+        return {"host": "127.0.0.1", "port": self.port, "models": self.models}
+
+    def _create_app(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.get("/api/tags")
+        async def tags():
+            return {"models": [{"name": m} for m in self.models]}
+
+        @app.post("/api/embed")
+        async def embed(request: Request):
+            data = await request.json()
+            self.requests.append({"path": "/api/embed", **data})
+            inputs = data["input"] if isinstance(data["input"], list) else [data["input"]]
+            vectors = [
+                [b / 255 for b in hashlib.sha256(text.encode("utf-8")).digest()] for text in inputs
+            ]
+            return {"model": data["model"], "embeddings": vectors}
+
+        @app.post("/api/generate")
+        async def generate(request: Request):
+            data = await request.json()
+            data["_received_at"] = time.perf_counter()
+            self.requests.append({"path": "/api/generate", **data})
+            prompt = data.get("prompt") or ""
+            if data.get("model") not in self.models:
+                return JSONResponse({"error": "model not found"}, status_code=404)
+            return await self._respond(data, prompt)
+
+        @app.post("/api/chat")
+        async def chat(request: Request):
+            data = await request.json()
+            data["_received_at"] = time.perf_counter()
+            self.requests.append({"path": "/api/chat", **data})
+            # 按 ChatML 模板渲染, 与模型实际看到的 token 顺序一致
+            text = "".join(
+                f"<|im_start|>{m['role']}\n{m.get('content') or ''}<|im_end|>\n"
+                for m in data.get("messages", [])
+            )
+            return await self._respond(data, text, chat=True)
+
+        return app
+
+    def _uncached_chars(self, text: str, reply: str) -> int:
+        if not self.prefix_slots:
+            return len(text)
+        best = max(
+            ((len(os.path.commonprefix([slot, text])), i) for i, slot in enumerate(self._slots)),
+            default=(0, None),
+        )
+        if best[1] is not None and best[0] == len(self._slots[best[1]]):
+            # 新 prompt 是该槽内容的延续, 原地扩展; 否则占用新槽, 淘汰最久未用的
+            self._slots.pop(best[1])
+        self._slots.append(text + reply)
+        del self._slots[: -self.prefix_slots]
+        return len(text) - best[0]
+
+    async def _respond(self, data: dict, text: str, chat: bool = False):
+        prompt_chars = len(text)
+        if self.reply:
+            answer = self.reply(data)
+            reply = [answer[i : i + 4] for i in range(0, len(answer), 4)]
+        else:
+            reply = [f"{self.name}-{i} " for i in range(self.tokens)]
+        generated = "".join(reply)
+        if chat:
+            generated = f"<|im_start|>assistant\n{generated}<|im_end|>\n"
+        speed = self.model_speed.get(data.get("model"), 1.0)
+        prefill = self._uncached_chars(text, generated) * self.prefill_per_char * speed
+        token_delay = self.token_delay * speed
+
+        def piece(text: str, done: bool) -> dict:
+            if chat:
+                return {"model": data["model"], "message": {"role": "assistant", "content": text}, "done": done}
+            return {"model": data["model"], "response": text, "done": done}
+
+        final = {
+            "prompt_eval_count": prompt_chars,
+            "prompt_eval_duration": int(prefill * 1e9),
+            "eval_count": len(reply),
+            "eval_duration": int(len(reply) * token_delay * 1e9),
+            "total_duration": int((prefill + len(reply) * token_delay) * 1e9),
+            # 续接时 context 为上一轮 context + 本轮 prompt 与输出
+            "context": (data.get("context") or []) + list(range(prompt_chars + len(reply))),
+        }
+
+        if not data.get("stream", True):
+            await asyncio.sleep(prefill + len(reply) * token_delay)
+            return {**piece("".join(reply), True), **final}
+
+        async def body():
+            await asyncio.sleep(prefill)
+            for token in reply:
+                await asyncio.sleep(token_delay)
+                yield json.dumps(piece(token, False)) + "\n"
+            yield json.dumps({**piece("", True), **final}) + "\n"
+
+        return StreamingResponse(body(), media_type="application/x-ndjson")
+
+    def start(self) -> "FakeOllama":
+        config = uvicorn.Config(self.app, host="127.0.0.1", port=self.port, log_level="warning")
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.should_exit = True
+            self._thread.join()
+            self._server = None
@@ -13,13 +13,17 @@ load_dotenv(dotenv_path)
 # DB_URL_LIST_STR = os.getenv("DB_URL_LIST")
 # DB_URL_LIST = []
 
+# 单台: {"host": "...", "port": 11434}
+# 多台: [{"host": "...", "port": 11434, "models": ["qwen3:32b"]}, ...], 不写 models 表示提供全部模型
 SERVER_INFO_STR = os.getenv("SERVER_INFO", "")
 SERVER_INFO = {}
+OLLAMA_ENDPOINTS = []
 try:
     # Now you can access variables:
     # DB_URL_LIST = json.loads(DB_URL_LIST_STR if DB_URL_LIST_STR else "")
     # print("DB_URL_LIST:", DB_URL_LIST)
     SERVER_INFO = json.loads(SERVER_INFO_STR)
     print("SERVER_INFO:", SERVER_INFO)
+    OLLAMA_ENDPOINTS = SERVER_INFO if isinstance(SERVER_INFO, list) else [SERVER_INFO]
 except Exception as e:
     print(e)
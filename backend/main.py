@@ -1,36 +1,78 @@
-import asyncio
+import logging
 import os
 from contextlib import asynccontextmanager
+from typing import Optional
 
 from utils.load_config import load_config
 
 # Load all global configs
 load_config()
 
-import httpx
 import uvicorn
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-from mcp_plugins.mcp_stream import get_mcp_client
+from fastapi.responses import JSONResponse, Response
+from mcp_plugins.mcp_sessions import get_mcp_sessions
 from mcp_plugins.postgres_mcp import run_postgres_mcp_tool
+from mcp_plugins.result_cache import get_mcp_result_cache
+from mcp_plugins.schema_index import get_schema_index
+from mcp_plugins.sql_result import TableFrame, get_sql_result_formatter
+from mcp_plugins.table_renderer import get_table_renderer
+from utils.admission import AdmissionError, get_admission_controller
+from utils.answer_cache import get_answer_cache
+from utils.cancellation import (ABORT_STATS, ClosingStreamingResponse,
+                                stream_until_disconnect, upstream_stage)
+from utils.context_store import get_context_store
+from utils.image_preprocess import ImageError, get_image_preprocessor
+from utils.keyword_router import get_keyword_router
+from utils.load_config import global_config
+from utils.log_shipper import (get_log_shipper, log_async,
+                               setup_logging)
 from utils.memory import WindowedSummaryMemory
-from utils.models import generate_with_ollama_stream
-from utils.promptsArchive import (get_agriculture_prompt_with_image,
-                                  get_agriculture_prompt_without_image)
+from utils.memory_store import create_memory_backend
+from utils.metrics import RequestMetrics, render_metrics
+from utils.model_routes import get_model_routes
+from utils.models import (generate_with_ollama_chat_stream,
+                          generate_with_ollama_stream, get_ollama_client)
+from utils.prompt_budget import get_prompt_budget
+from utils.promptsArchive import (AGRICULTURE_IMAGE_SYSTEM_PROMPT,
+                                  AGRICULTURE_SYSTEM_PROMPT,
+                                  get_agriculture_followup_prompt,
+                                  get_agriculture_image_user_message,
+                                  get_agriculture_prompt_with_image,
+                                  get_agriculture_prompt_without_image,
+                                  get_agriculture_user_message)
+from utils.single_flight import Flight, StatusFrame, flight_key, get_single_flight
+from utils.sql_plan_cache import get_sql_plan_cache
 from utils.user_memory import UserMemoryManager
-from utils.utils import (generate_sse_data, should_apply_enhanced_prompt,
-                         should_use_mcp_plugin)
+from utils.utils import SSEFrame, create_sse_coalescer, generate_sse_data
 from rag.rag import run_rag_analyzing, retrieveRAGResult
+from rag.relevance_gate import get_relevance_gate
+
+setup_logging()
+logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(_app: FastAPI):
-    client = get_mcp_client()
-    # 异步上下文管理客户端连接
-    async with client:
-        # 初始化连接
-        await client.ping()
-        yield
+    mcp_sessions = get_mcp_sessions()
+    log_shipper = get_log_shipper()
+    await log_shipper.start()
+    await user_memory_manager.backend.start()
+    # 共享的 Ollama 连接池随 app 启动/关闭; 各 MCP 服务器的常驻会话同样由 lifespan 管理
+    # 关键词路由自动机在启动时编译, 请求中只做一次扫描
+    get_keyword_router()
+    try:
+        async with get_ollama_client():
+            await mcp_sessions.start()
+            # 预计算 RAG 相关性判断的向量中心
+            await get_relevance_gate().build()
+            # 预计算各数据库表结构的向量, 供 MCP 规划时选表
+            await get_schema_index().build()
+            yield
+    finally:
+        await mcp_sessions.stop()
+        await user_memory_manager.backend.stop()
+        await log_shipper.stop()
 
 
 # Initialize FastAPI app
@@ -48,37 +90,17 @@ app.add_middleware(
 os.environ["CUDA_VISIBLE_DEVICES"] = "0"
 
 # Initialize memory manager
-user_memory_manager = UserMemoryManager()
-
-# 日志工具函数
-async def log_to_management(level: str, message: str, **kwargs):
-    """异步发送日志到管理后台，不阻塞主流程"""
-    try:
-        async with httpx.AsyncClient(timeout=2.0) as client:
-            await client.post(
-                "http://localhost:8200/api/v1/log",
-                json={
-                    "level": level,
-                    "module": "ollama_service",
-                    "message": message,
-                    **kwargs,
-                },
-            )
-    except Exception:
-        # 日志发送失败不影响主业务，静默处理
-        pass
-
-
-def log_async(level: str, message: str, **kwargs):
-    """非阻塞日志记录"""
-    asyncio.create_task(log_to_management(level, message, **kwargs))
-
+# 会话记忆可持久化到共享后端 (memory_store), 多个 worker 共享对话
+user_memory_manager = UserMemoryManager(
+    backend=create_memory_backend(**global_config.memory_store),
+    **global_config.sessions,
+)
 
 def generate_qwenvl_prompt(query: str, memory, rag_result: list[str] = []):
-    history = memory.load_memory_variables({}).get("history", "")
-
-    # 构造文本内容
-    prompt_text = get_agriculture_prompt_with_image(query, history, rag_result)
+    # 构造文本内容, 历史 / RAG 结果 / 问题按 num_ctx 预算截取
+    prompt_text = get_prompt_budget().assemble(
+        get_agriculture_prompt_with_image, query, memory, rag_result
+    )
 
     # 返回标准 message 列表（用于模型调用）
     return prompt_text
@@ -89,142 +111,405 @@ def generate_qwen3_prompt(
     memory: WindowedSummaryMemory,
     rag_result: list[str],
 ) -> str:
-    history = memory.load_memory_variables({}).get("history", "")
-    generated_prompt = get_agriculture_prompt_without_image(
-        history, prompt, rag_result
+    generated_prompt = get_prompt_budget().assemble(
+        get_agriculture_prompt_without_image, prompt, memory, rag_result
     )
     return generated_prompt
 
+
+def generate_qwenvl_messages(query: str, memory, rag_result: list[str], images: list[str]) -> list[dict]:
+    return get_prompt_budget().assemble_messages(
+        AGRICULTURE_IMAGE_SYSTEM_PROMPT,
+        get_agriculture_image_user_message,
+        query,
+        memory,
+        rag_result,
+        images,
+    )
+
+
+def generate_qwen3_messages(query: str, memory, rag_result: list[str]) -> list[dict]:
+    return get_prompt_budget().assemble_messages(
+        AGRICULTURE_SYSTEM_PROMPT, get_agriculture_user_message, query, memory, rag_result
+    )
+
+
+def generate_qwen3_followup_prompt(prompt: str, rag_result: list[str]) -> str:
+    return get_prompt_budget().assemble_followup(
+        get_agriculture_followup_prompt, prompt, rag_result
+    )
+
 @app.get("/clean_context/{chat_id}")
 async def clean_context(chat_id: str):
     user_memory_manager.clean_memory(chat_id, "qwen3:32b")
     user_memory_manager.clean_memory(chat_id, "qwen2.5vl:7b")
+    get_context_store().drop(chat_id)
+    # 确保清空已写入共享存储, 其他 worker 随后读取时即为空
+    await user_memory_manager.backend.flush()
     return
 
+@app.get("/session_stats")
+async def session_stats():
+    return {**user_memory_manager.session_stats(), "summaries": get_prompt_budget().stats}
+
+@app.get("/ollama_context_stats")
+async def ollama_context_stats():
+    return get_context_store().context_stats()
+
+@app.get("/mcp_session_stats")
+async def mcp_session_stats():
+    return get_mcp_sessions().session_stats()
+
+@app.get("/schema_index_stats")
+async def schema_index_stats():
+    return get_schema_index().index_stats()
+
+@app.get("/sql_plan_stats")
+async def sql_plan_stats():
+    return get_sql_plan_cache().plan_stats()
+
+@app.get("/sql_result_stats")
+async def sql_result_stats():
+    return get_sql_result_formatter().result_stats()
+
+@app.get("/table_render_stats")
+async def table_render_stats():
+    return get_table_renderer().render_stats()
+
+@app.get("/mcp_result_cache_stats")
+async def mcp_result_cache_stats():
+    return get_mcp_result_cache().cache_stats()
+
+@app.post("/mcp_result_cache/invalidate")
+async def mcp_result_cache_invalidate(db_key: Optional[str] = None, tool: Optional[str] = None):
+    """数据在 MCP 之外更新后手动清除结果缓存; db_key / tool 为空表示不限. 只作用于处理该请求的 worker 进程"""
+    return {"invalidated": get_mcp_result_cache().invalidate(db_key, tool)}
+
+@app.get("/image_preprocess_stats")
+async def image_preprocess_stats():
+    return get_image_preprocessor().preprocess_stats()
+
+@app.get("/model_route_stats")
+async def model_route_stats():
+    return get_model_routes().route_stats()
+
+@app.get("/ollama_pool_stats")
+async def ollama_pool_stats():
+    return get_ollama_client().pool_stats()
+
+@app.get("/abort_stats")
+async def abort_stats():
+    return ABORT_STATS
+
+@app.get("/admission_stats")
+async def admission_stats():
+    return get_admission_controller().controller_stats()
+
+@app.get("/single_flight_stats")
+async def single_flight_stats():
+    return get_single_flight().flight_stats()
+
+@app.get("/log_shipper_stats")
+async def log_shipper_stats():
+    return get_log_shipper().shipper_stats()
+
+@app.get("/metrics")
+async def metrics():
+    content, media_type = render_metrics()
+    return Response(content=content, media_type=media_type)
+
 @app.post("/analyze")
 async def analyze(request: Request):
     data = await request.json()
     try:
         user_prompt = data.get("prompt", "")
         images = data.get("images", [])
+        # 图片只解码一次: 检查大小限制并按各用途缩小, 结果按内容哈希缓存
+        try:
+            image_variants = await get_image_preprocessor().prepare(images)
+        except ImageError as e:
+            return JSONResponse(status_code=400, content={"error": str(e)})
+        images = image_variants["generate"]
         chat_id = data.get("chat_id", "default")
 
-        # Async generator function
-        async def generate_stream():
-            # print("into generate stream------------------------------")
-            full_response = ""
-            # Select model based on input
-            # Keep the qwen instance temporarily
-            # llm = qwen_model if images else qwen3_model
-            llm = "qwen3:32b"
-            memory = user_memory_manager.get_memory(chat_id, llm)
-
-            rag_result = []
-            async for chunk in run_rag_analyzing(
-                text=user_prompt,
-                images=images,
-            ):
-                yield generate_sse_data(chunk)
-                if chunk == "loading: rag_searching \n\n":
-                    print("使用 RAG 搜索")
-                    # Retrieve RAG first
-                    if images:
-                        rag_result = await retrieveRAGResult(image=images[0])
-                    else:
-                        rag_result = await retrieveRAGResult(text=user_prompt)
-
-            rag_imgs = []
-            print("rag res: -----------", rag_result)
-            if len(rag_result) > 0:
-                for res in rag_result:
-                    print("rag result----------------", res)
-                    if res.get("image"):
-                        rag_imgs.append(res)
-            if len(rag_imgs) > 0:
-                yield generate_sse_data("**小羲从知识库检索到下列相关图片:** \n\n")
-                for img in rag_imgs:
-                    yield generate_sse_data(f"RAG image: {img['image']}, title: {img['title']} \n\n")
-
-            filtered_rag_result = [res for res in rag_result if not res.get("image")]
-            print("filtered rag res: ---------", filtered_rag_result)
+        model = "qwen2.5vl:7b" if images else "qwen3:32b"
+        # 一次扫描得到命中的数据库、表分组与增强 prompt 触发词
+        route = get_keyword_router().route(user_prompt)
+        use_mcp = not images and route.use_mcp
+        if images:
+            path = "image"
+        elif use_mcp:
+            path = "mcp"
+        elif route.enhanced:
+            path = "enhanced"
+        else:
+            path = "plain"
+        request_metrics = RequestMetrics(model, path)
+
+        # Select model based on input
+        # Keep the qwen instance temporarily
+        # llm = qwen_model if images else qwen3_model
+        llm = "qwen3:32b"
+        memory = await user_memory_manager.get_memory(chat_id, llm)
 
+        # 相同问题的在途请求合并为一次执行; prompt 中带历史的路径按历史区分
+        single_flight = get_single_flight()
+        key = flight_key(
+            user_prompt,
+            images,
+            path,
+            memory.history if path in ("enhanced", "image") else None,
+        )
+
+        # 返回响应前同步预留该模型的并发名额或排队位置, 都已占满时直接拒绝, 让客户端稍后重试
+        # (加入已在执行的相同请求不占用名额)
+        admission = get_admission_controller()
+        limiter = admission.limiter(model)
+        reservation = None
+        if not single_flight.in_flight(key):
+            reservation = limiter.try_reserve()
+            if reservation is None:
+                return JSONResponse(
+                    status_code=503,
+                    content={"error": "当前请求过多, 请稍后重试"},
+                    headers={"Retry-After": str(admission.retry_after)},
+                )
+
+        # Async generator function, 由 single flight 在独立任务中执行, 答案写入 flight.answer
+        async def generate_stream(flight: Flight):
+            request_metrics.start()
+            # 接管本请求预留的名额; 预留已被归还或原本要加入的执行已结束时重新预留
+            held = reservation if reservation is not None and reservation.claim() else None
+            if held is None:
+                held = limiter.try_reserve()
+                if held is None:
+                    yield generate_sse_data("当前请求过多, 请稍后重试", "error")
+                    request_metrics.finish()
+                    return
+                held.claim()
             try:
-                prompt = user_prompt
-                # Create the prompt based on model
-                if images:
-                    prompt = generate_qwenvl_prompt(user_prompt, memory, filtered_rag_result)
-                else:
-                    postgres_mcp_context: list[str] = []
-                    if should_use_mcp_plugin(user_prompt):
-                        print("should use mcp----------")
-                        async for item in run_postgres_mcp_tool(
-                            user_prompt, postgres_mcp_context, filtered_rag_result
-                        ):
-                            full_response += item
-                            yield generate_sse_data(item)
-                        memory.save_context(
-                            {"input": user_prompt}, {"response": full_response}
-                        )
-                        yield 'data: {"type": "done"}\n\n'
-                        return
-                    elif should_apply_enhanced_prompt(user_prompt):
-                        print("should use enhanced prompt----------")
-                        prompt = generate_qwen3_prompt(
-                            prompt=user_prompt,
-                            memory=memory,
-                            rag_result=filtered_rag_result
-                        )
-                print("prompt------------------", prompt)
-                inside_think = False
-                async for chunk in generate_with_ollama_stream(
-                    model="qwen2.5vl:7b" if images else "qwen3:32b",
-                    prompt=prompt,
-                    image=images,
+                # 排队期间推送排队位置
+                try:
+                    async for position in limiter.wait(held):
+                        yield StatusFrame(f'data: {{"type": "queued", "position": {position}}}\n\n')
+                except AdmissionError as e:
+                    yield generate_sse_data(str(e), "error")
+                    return
+
+                full_response = ""
+                # 将连续 token 合并为较少的 SSE 帧
+                coalescer = create_sse_coalescer()
+
+                rag_result = []
+                async for chunk in run_rag_analyzing(
+                    text=user_prompt,
+                    images=image_variants["rag_gate"],
                 ):
-                    done = (
-                        bool(chunk.get("done"))
-                        if isinstance(chunk, dict) and "done" in chunk
-                        else False
+                    yield generate_sse_data(chunk)
+                    if chunk == "loading: rag_searching \n\n":
+                        logger.debug("使用 RAG 搜索")
+                        # Retrieve RAG first
+                        if images:
+                            rag_result = await retrieveRAGResult(image=image_variants["rag_search"][0])
+                        else:
+                            rag_result = await retrieveRAGResult(text=user_prompt)
+
+                rag_imgs = []
+                logger.debug("rag res: %s", rag_result)
+                if len(rag_result) > 0:
+                    for res in rag_result:
+                        if res.get("image"):
+                            rag_imgs.append(res)
+                if len(rag_imgs) > 0:
+                    yield generate_sse_data("**小羲从知识库检索到下列相关图片:** \n\n")
+                    for img in rag_imgs:
+                        yield generate_sse_data(f"RAG image: {img['image']}, title: {img['title']} \n\n")
+
+                filtered_rag_result = [res for res in rag_result if not res.get("image")]
+
+                try:
+                    # 语义答案缓存: 图片问题不缓存, MCP/数据库问题的答案会变化, 可配置绕过
+                    answer_cache = get_answer_cache()
+                    use_cache = (
+                        answer_cache.enabled
+                        and not images
+                        and not (use_mcp and answer_cache.bypass_mcp)
                     )
-                    if done:
-                        memory.save_context(
-                            {"input": user_prompt}, {"response": full_response}
-                        )
-                        yield 'data: {"type": "done"}\n\n'
-                        return
-                    token = (
-                        str(chunk.get("response"))
-                        if isinstance(chunk, dict) and "response" in chunk
-                        else str(chunk)
+                    # 带历史的路径按历史区分, 一个会话的回答不会回放到历史不同的会话
+                    cache_scope = answer_cache.scope(
+                        path, memory.history if path in ("enhanced", "image") else None
                     )
-                    idx = -1
-                    if not inside_think:
-                        idx = token.find("<think>")
-                        if idx != -1:
-                            inside_think = True
+                    answer_tokens: list[str] = []
+                    if use_cache:
+                        cached_tokens = await answer_cache.get(user_prompt, rag_result, cache_scope)
+                        if cached_tokens is not None:
+                            for token in cached_tokens:
+                                request_metrics.token()
+                                for frame in coalescer.add(token):
+                                    yield frame
+                            if frame := coalescer.flush():
+                                yield frame
+                            flight.answer = "".join(cached_tokens)
+                            yield 'data: {"type": "done"}\n\n'
+                            return
+
+                    prompt = user_prompt
+                    # /api/chat 模式: 固定 system 消息 + 动态消息
+                    use_chat_api = get_prompt_budget().use_chat_api
+                    messages = None
+                    # 续接 Ollama context: 只用于带历史的 enhanced 路径, /api/chat 模式下不使用
+                    context_store = get_context_store()
+                    use_context = (
+                        context_store.enabled and path == "enhanced" and not use_chat_api
+                    )
+                    context = (
+                        context_store.get(chat_id, model, memory) if use_context else None
+                    )
+                    # Create the prompt based on model
+                    if images and use_chat_api:
+                        messages = generate_qwenvl_messages(
+                            user_prompt, memory, filtered_rag_result, images
+                        )
+                    elif images:
+                        prompt = generate_qwenvl_prompt(user_prompt, memory, filtered_rag_result)
                     else:
-                        idx = token.find("</think>")
-                        if idx != -1:
-                            inside_think = False
-                    if idx == -1 and not inside_think:
-                        print("token-------------", token)
-                        full_response += token
-                        yield generate_sse_data(token)
-
-            except Exception as e:
-                # 🆕 记录错误日志到管理后台
-                log_async(
-                    "ERROR",
-                    f"Ollama API调用失败: {str(e)}",
-                    model_name=llm,
-                    chat_id=chat_id,
-                    error_code="OLLAMA_API_ERROR",
-                )
-                yield generate_sse_data(f"generate_stream error: {str(e)}", "error")
+                        postgres_mcp_context: list[str] = []
+                        if use_mcp:
+                            logger.debug("should use mcp")
+                            async for item in coalescer.timed(run_postgres_mcp_tool(
+                                user_prompt, postgres_mcp_context, filtered_rag_result, route
+                            )):
+                                if isinstance(item, SSEFrame):
+                                    yield item
+                                    continue
+                                if isinstance(item, TableFrame):
+                                    # 查询结果表格直接发给前端, 不计入回答文本
+                                    if frame := coalescer.flush():
+                                        yield frame
+                                    yield item
+                                    continue
+                                full_response += item
+                                answer_tokens.append(item)
+                                if not item.startswith("loading:"):
+                                    request_metrics.token()
+                                for frame in coalescer.add(item):
+                                    yield frame
+                            if frame := coalescer.flush():
+                                yield frame
+                            request_metrics.generation_done({})
+                            flight.answer = full_response
+                            if use_cache:
+                                await answer_cache.put(user_prompt, rag_result, answer_tokens, cache_scope)
+                            yield 'data: {"type": "done"}\n\n'
+                            return
+                        elif path == "enhanced" and use_chat_api:
+                            logger.debug("should use enhanced messages")
+                            messages = generate_qwen3_messages(
+                                user_prompt, memory, filtered_rag_result
+                            )
+                        elif path == "enhanced" and context is not None:
+                            logger.debug("continue ollama context")
+                            prompt = generate_qwen3_followup_prompt(user_prompt, filtered_rag_result)
+                        elif path == "enhanced":
+                            logger.debug("should use enhanced prompt")
+                            prompt = generate_qwen3_prompt(
+                                prompt=user_prompt,
+                                memory=memory,
+                                rag_result=filtered_rag_result
+                            )
+                    logger.debug("prompt: %s", messages or prompt)
+                    inside_think = False
+                    if messages is not None:
+                        flight.message = messages[-1]["content"]
+                        stream = generate_with_ollama_chat_stream(
+                            messages, model=model, chat_id=chat_id
+                        )
+                    else:
+                        stream = generate_with_ollama_stream(
+                            model=model,
+                            prompt=prompt,
+                            image=images,
+                            chat_id=chat_id,
+                            context=context,
+                        )
+                    with upstream_stage("ollama_stream"):
+                        # 模型停顿时, 已缓冲的 token 在 flush_interval 后由定时器发送
+                        async for chunk in coalescer.timed(stream):
+                            if isinstance(chunk, SSEFrame):
+                                yield chunk
+                                continue
+                            done = (
+                                bool(chunk.get("done"))
+                                if isinstance(chunk, dict) and "done" in chunk
+                                else False
+                            )
+                            if done:
+                                if frame := coalescer.flush():
+                                    yield frame
+                                request_metrics.generation_done(chunk)
+                                flight.answer = full_response
+                                if use_context and chunk.get("context"):
+                                    context_store.put(
+                                        chat_id,
+                                        model,
+                                        chunk["context"],
+                                        {"input": user_prompt, "output": full_response},
+                                    )
+                                if use_cache:
+                                    await answer_cache.put(user_prompt, rag_result, answer_tokens, cache_scope)
+                                yield 'data: {"type": "done"}\n\n'
+                                return
+                            token = (
+                                str(chunk.get("response"))
+                                if isinstance(chunk, dict) and "response" in chunk
+                                else str(chunk)
+                            )
+                            idx = -1
+                            if not inside_think:
+                                idx = token.find("<think>")
+                                if idx != -1:
+                                    inside_think = True
+                            else:
+                                idx = token.find("</think>")
+                                if idx != -1:
+                                    inside_think = False
+                            if idx == -1 and not inside_think:
+                                full_response += token
+                                answer_tokens.append(token)
+                                request_metrics.token()
+                                for frame in coalescer.add(token):
+                                    yield frame
+
+                except Exception as e:
+                    if frame := coalescer.flush():
+                        yield frame
+                    # 🆕 记录错误日志到管理后台
+                    log_async(
+                        "ERROR",
+                        f"Ollama API调用失败: {str(e)}",
+                        model_name=llm,
+                        chat_id=chat_id,
+                        error_code="OLLAMA_API_ERROR",
+                    )
+                    yield generate_sse_data(f"generate_stream error: {str(e)}", "error")
+            finally:
+                held.release()
+                request_metrics.finish()
+
+        def save_answer(flight: Flight) -> None:
+            # 每个订阅者写入自己会话的记忆, 超出预算的旧轮次在后台并入摘要
+            memory.save_context(
+                {"input": user_prompt, "message": flight.message}, {"response": flight.answer}
+            )
+            get_prompt_budget().schedule_summary(memory)
 
-        # Return streaming response
-        return StreamingResponse(
-            generate_stream(),
+        # Return streaming response, 所有相同请求的客户端都断开时取消全部上游调用;
+        # 执行没有启动 (加入了相同请求、客户端提前断开) 时, 响应结束后归还预留的名额
+        return ClosingStreamingResponse(
+            stream_until_disconnect(
+                request, lambda: single_flight.subscribe(key, generate_stream, save_answer)
+            ),
+            on_close=reservation.release_unclaimed if reservation is not None else lambda: None,
             media_type="text/event-stream",
             headers={
                 "Cache-Control": "no-cache",
@@ -242,4 +527,5 @@ async def analyze(request: Request):
         pass
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8080)
+    # 多个 worker 需以导入字符串启动
+    uvicorn.run("main:app", host="0.0.0.0", port=8080, workers=global_config.workers)
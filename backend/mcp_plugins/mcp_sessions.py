@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from fastmcp import Client
+from fastmcp.client.transports import SSETransport
+from fastmcp.exceptions import ToolError
+from mcp.types import Tool
+
+from utils.load_config import global_config
+
+from .result_cache import is_read_only
+
+logger = logging.getLogger(__name__)
+
+# 不修改数据的 postgres-mcp 工具, 重复执行无副作用
+_READ_ONLY_TOOLS = {
+    "list_schemas",
+    "list_objects",
+    "get_object_details",
+    "explain_query",
+    "analyze_workload_indexes",
+    "analyze_query_indexes",
+    "analyze_db_health",
+    "get_top_queries",
+}
+
+
+def is_retryable(tool: str, args: dict) -> bool:
+    """只读工具与只读 SQL 可以重试; 写语句在读取超时等情况下可能已经执行, 重试会执行两次"""
+    if tool == "execute_sql":
+        return is_read_only(str(args.get("sql", "")))
+    return tool in _READ_ONLY_TOOLS
+
+
+class McpServer:
+    """单个 MCP 服务器的常驻会话与工具目录缓存"""
+
+    def __init__(self, name: str, url: str, call_timeout: float, max_concurrent_calls: int):
+        self.name = name
+        self.url = url
+        self.client = Client(SSETransport(url), timeout=call_timeout)
+        self.tools: List[Tool] = []
+        self.tools_at = 0.0
+        self._connect_lock = asyncio.Lock()
+        # 每次建立会话加一, 并发调用同时失败时只重连一次
+        self.generation = 0
+        # 同一会话上的请求按 id 复用, 允许多个工具调用并行
+        self._calls = asyncio.Semaphore(max_concurrent_calls)
+        self.stats: Dict[str, float] = {
+            "connects": 0,
+            "reconnects": 0,
+            "calls": 0,
+            "errors": 0,
+            "call_seconds": 0.0,
+            "catalog_refreshes": 0,
+        }
+
+    @property
+    def connected(self) -> bool:
+        return self.client.is_connected()
+
+    async def connect(self, stale: Optional[int] = None) -> None:
+        """建立会话; stale 为调用失败时所用会话的 generation, 该会话仍在时强制重连"""
+        async with self._connect_lock:
+            if self.connected and self.generation != stale:
+                return
+            if self.stats["connects"]:
+                self.stats["reconnects"] += 1
+                # 旧会话已断开, 重置引用计数后重新建立
+                await self.client.close()
+            await self.client.__aenter__()
+            self.generation += 1
+            self.stats["connects"] += 1
+            logger.info("MCP 会话已建立: %s (%s)", self.name, self.url)
+
+    async def disconnect(self) -> None:
+        await self.client.close()
+
+    async def refresh_tools(self) -> None:
+        await self.connect()
+        self.tools = await self.client.list_tools()
+        self.tools_at = time.monotonic()
+        self.stats["catalog_refreshes"] += 1
+
+    def has_tool(self, tool: str) -> bool:
+        # 目录尚未获取时不做判断
+        return not self.tools or any(t.name == tool for t in self.tools)
+
+    async def call_tool(self, tool: str, args: dict) -> Any:
+        async with self._calls:
+            started = time.perf_counter()
+            try:
+                await self.connect()
+                generation = self.generation
+                try:
+                    return await self.client.call_tool(tool, args)
+                except ToolError:
+                    raise
+                except Exception as e:
+                    # 会话中断 (服务器重启、连接被关闭): 重连, 只读调用再重试一次
+                    await self.connect(stale=generation)
+                    if not is_retryable(tool, args):
+                        logger.warning("MCP 调用失败, 已重连 %s, 非只读调用不重试: %s", self.name, e)
+                        raise
+                    logger.warning("MCP 调用失败, 重连 %s 后重试: %s", self.name, e)
+                    return await self.client.call_tool(tool, args)
+            except Exception:
+                self.stats["errors"] += 1
+                raise
+            finally:
+                self.stats["calls"] += 1
+                self.stats["call_seconds"] += time.perf_counter() - started
+
+
+class McpSessions:
+    """
+    各 MCP 服务器的常驻会话, 由 FastAPI lifespan 启动与关闭
+
+    每次工具调用直接复用已建立的会话, 不再重复握手和获取工具目录.
+    后台任务每 health_interval 秒重连断开的服务器, 并在目录超过 catalog_ttl 秒后刷新.
+    """
+
+    def __init__(
+        self,
+        servers: Dict[str, str],
+        catalog_ttl: float = 300,
+        health_interval: float = 10,
+        call_timeout: float = 60,
+        max_concurrent_calls: int = 4,
+    ):
+        self.catalog_ttl = catalog_ttl
+        self.health_interval = health_interval
+        self.servers: Dict[str, McpServer] = {
+            name: McpServer(name, url, call_timeout, max_concurrent_calls)
+            for name, url in servers.items()
+        }
+        self._task: Optional[asyncio.Task] = None
+
+    async def _maintain(self, server: McpServer) -> None:
+        try:
+            if not server.connected or time.monotonic() - server.tools_at > self.catalog_ttl:
+                await server.refresh_tools()
+        except Exception as e:
+            logger.warning("MCP 服务器 %s 不可用: %s", server.name, e)
+
+    async def _maintain_all(self) -> None:
+        await asyncio.gather(*(self._maintain(server) for server in self.servers.values()))
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await self._maintain_all()
+
+    async def start(self) -> None:
+        # 启动时某个服务器不可用不影响服务启动, 由后台任务继续重连
+        await self._maintain_all()
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.gather(
+            *(server.disconnect() for server in self.servers.values()), return_exceptions=True
+        )
+
+    def get(self, name: str) -> McpServer:
+        return self.servers[name]
+
+    def session_stats(self) -> Dict[str, dict]:
+        now = time.monotonic()
+        return {
+            name: {
+                **{key: int(value) for key, value in server.stats.items() if key != "call_seconds"},
+                "connected": server.connected,
+                "avg_call_ms": round(server.stats["call_seconds"] / server.stats["calls"] * 1000, 1)
+                if server.stats["calls"]
+                else 0,
+                "tools": len(server.tools),
+                "catalog_age": round(now - server.tools_at, 1) if server.tools_at else None,
+            }
+            for name, server in self.servers.items()
+        }
+
+
+MCP_SESSIONS: Optional[McpSessions] = None
+
+
+def get_mcp_sessions() -> McpSessions:
+    global MCP_SESSIONS
+    if not MCP_SESSIONS:
+        MCP_SESSIONS = McpSessions(
+            {key: value.get("url") for key, value in global_config.mcp_db_dict.items()},
+            **global_config.mcp,
+        )
+    return MCP_SESSIONS
@@ -1,45 +1,59 @@
-from fastmcp import Client
-from utils.load_config import global_config
-
-# 创建全局 Client 实例，传入 MCP 服务 URL
-MCP_CLIENT = None
-
-def get_mcp_client():
-    global MCP_CLIENT
-    if not MCP_CLIENT:
-        config = {}
-        for key, value in global_config.mcp_db_dict.items():
-            config[key] = {
-                "transport": "sse",
-                "url": value.get("url")
-            }
-        MCP_CLIENT = Client({
-            "mcpServers": config
-        })
-    return MCP_CLIENT
-
-
-async def call_tool_with_stream(tool: str, db_key: str, args: dict):
+import logging
+
+from fastmcp.exceptions import ToolError
+
+from .mcp_sessions import get_mcp_sessions
+from .result_cache import get_mcp_result_cache, is_read_only
+
+logger = logging.getLogger(__name__)
+
+
+async def call_tool_with_stream(tool: str, db_key: str, args: dict, raise_tool_errors: bool = False):
     """
-    使用 FastMCP.Client 调用 MCP tool 并逐步返回每次的 MCPContent.text。
+    在 db_key 对应 MCP 服务器的常驻会话上调用 tool, 并逐步返回每次的 MCPContent.text。
+    相同的元数据查询与只读 SQL 在 TTL 内直接返回缓存的结果.
+    出错时记录日志且不返回内容; raise_tool_errors 为 True 时, 工具本身报错 (ToolError, 如 SQL 错误)
+    向调用方抛出, 以便与连接中断等暂时性错误区分.
     """
-    mcp_client = get_mcp_client()
-    tools = await mcp_client.list_tools()
-    if not mcp_client:
+    cache = get_mcp_result_cache()
+    key = cache.key(db_key, tool, args)
+    if key is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            logger.debug("mcp result cache hit: %s", key)
+            for item in cached:
+                yield item
+            return
+
+    server = get_mcp_sessions().get(db_key)
+    if not server.has_tool(tool):
+        logger.error("call tool error: %s 不在 %s 的工具目录中", tool, db_key)
         return
     try:
-        # 异步上下文管理客户端连接
-        async with mcp_client as client:
-            print("tools-------------------:", tools, f"{db_key}_{tool}")
-            # 流式调用指定工具
-            result = await client.call_tool(f"{db_key}_{tool}", args)
-
-            for item in result.content:
-                if hasattr(item, "text"):
-                    yield item.text  # type: ignore
-                elif hasattr(item, "data"):
-                    yield item.data  # type: ignore
-                else:
-                    yield str(item)
+        logger.debug("tools: %s, %s", [t.name for t in server.tools], f"{db_key}.{tool}")
+        result = await server.call_tool(tool, args)
+
+        outputs = []
+        for item in result.content:
+            if hasattr(item, "text"):
+                outputs.append(item.text)  # type: ignore
+            elif hasattr(item, "data"):
+                outputs.append(item.data)  # type: ignore
+            else:
+                outputs.append(str(item))
+    except ToolError as e:
+        logger.error("call tool error: %s", e)
+        if raise_tool_errors:
+            raise
+        return
     except Exception as e:
-        print("call tool error:----------------", e)
+        logger.error("call tool error: %s", e)
+        return
+
+    if key is not None and outputs:
+        cache.put(key, outputs, args)
+    elif tool == "execute_sql" and not is_read_only(str(args.get("sql", ""))):
+        # 写语句之后, 该库已缓存的查询结果可能过期
+        cache.invalidate(db_key, "execute_sql")
+    for output in outputs:
+        yield output
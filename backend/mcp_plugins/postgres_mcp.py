@@ -1,69 +1,313 @@
-from utils.models import generate_with_ollama, generate_with_ollama_stream
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from fastmcp.exceptions import ToolError
+from utils.cancellation import upstream_stage
+from utils.load_config import global_config
+from utils.metrics import stage_timer
+from utils.model_routes import get_model_routes
 from utils.promptsArchive import (END_KEYWORD, get_mcp_prompt,
                                   get_summary_prompt)
-from utils.utils import clean_message, extract_json, get_tables_by_keys, get_mcp_config_by_keyword
+from utils.sql_plan_cache import SqlPlan, get_sql_plan_cache
+from utils.keyword_router import KeywordRoute, get_keyword_router
+from utils.utils import clean_message, extract_json
 
 from .mcp_stream import call_tool_with_stream
+from .result_cache import is_read_only
+from .schema_index import get_schema_index
+from .sql_result import TableFrame, get_sql_result_formatter, parse_rows
+from .table_renderer import get_table_renderer
 
-async def run_postgres_mcp_tool(user_query: str, context_list: list[str], rag_result: list[str]):
-    context = ""
-    times = 1
-    config = get_mcp_config_by_keyword(user_query)
-    db_key = list(config.keys())[0]
-    db_config = config[db_key]
-    dbs = get_tables_by_keys(user_query, db_config.get("keyword_maps"), db_config.get("schemas")) or config.get("schemas")
-    print("dbs:-------------------------------------", dbs)
+logger = logging.getLogger(__name__)
 
+def is_valid_plan(reply: str) -> bool:
+    """规划输出可用: 结束标记, 或能解析出带 tool 字段的 JSON"""
+    reply = clean_message(reply)
+    return END_KEYWORD in reply or "tool" in extract_json(reply)
 
-    yield "loading: mcp_begining \n\n"
+
+def is_useful_result(outputs: list) -> bool:
+    """execute_sql 返回了数据行 (报错信息、"No results"、写语句的返回不算)"""
+    for output in outputs:
+        parsed = parse_rows(output)
+        if parsed is not None and parsed[1]:
+            return True
+    return False
+
+
+def is_sql_error(outputs: list) -> bool:
+    """postgres-mcp 以 "Error: ..." 文本返回 SQL 执行错误"""
+    return any(str(output).strip().lower().startswith("error") for output in outputs)
+
+
+async def summarize(user_query: str, context: str, rag_result: list[str], context_list: list[str]):
+    yield "loading: mcp_ending_summarize \n\n"
+    summary_prompt = get_summary_prompt(user_query, context, rag_result)
+    final_token = ""
+    with upstream_stage("mcp_summary"), stage_timer("mcp_summary") as timer:
+        async for chunk in get_model_routes().stream("mcp_summary", summary_prompt):
+            if isinstance(chunk, dict) and chunk.get("done"):
+                timer.model = chunk["model"]
+            token = (
+                str(chunk.get("response"))
+                if isinstance(chunk, dict) and "response" in chunk
+                else str(chunk)
+            )
+            final_token += token
+            yield token
+
+    context_list.append(f"summary: {final_token}\n")
+
+
+async def run_cached_plan(
+    progress: "DbProgress", plan: SqlPlan, sql: str, context_list: list[str]
+) -> Optional[List[TableFrame]]:
+    """
+    执行缓存的 SQL 计划, 结果写入 progress, 返回 table 帧; 无结果或出错时返回 None, 回到规划循环.
+    只有 SQL 本身报错 (表结构在 config 之外发生了变化等) 时删除该计划, MCP / 数据库暂时不可用时保留.
+    """
+    if not is_read_only(sql):
+        # 旧版本可能保存过写语句的计划, 不直接执行
+        await get_sql_plan_cache().invalidate(plan)
+        return None
+    args = {"sql": sql}
+    outputs = []
+    try:
+        with upstream_stage("mcp_tool"), stage_timer("mcp_tool_call"):
+            async for tool_output in call_tool_with_stream(
+                "execute_sql", progress.db_key, args, raise_tool_errors=True
+            ):
+                outputs.append(tool_output)
+    except ToolError:
+        await get_sql_plan_cache().invalidate(plan)
+        return None
+    if is_sql_error(outputs):
+        await get_sql_plan_cache().invalidate(plan)
+        return None
+    if not is_useful_result(outputs):
+        return None
+    frames: List[TableFrame] = []
+    for tool_output in outputs:
+        text, tables = await asyncio.to_thread(
+            get_sql_result_formatter().handle, "execute_sql", args, tool_output
+        )
+        frames += tables
+        context_list.append(f"tool: execute_sql, args: {args}, output: {text}\n")
+        progress.context += f"TOOL(execute_sql, {args}) => {text}\n"
+    progress.results.append((sql, outputs))
+    return frames
+
+
+@dataclass
+class DbProgress:
+    """单个数据库的规划进度; 截止时间到达时, 已得到的 context 仍用于总结"""
+
+    db_key: str
+    # 库的关键词, 用于进度事件与合并后的 context
+    name: str
+    context: str = ""
+    # running / done / not_match / error / timeout
+    status: str = "running"
+    # 规划模型给出了结束标记 (或执行了缓存的计划); 规划轮数用尽时为 False
+    finished: bool = False
+    error: str = ""
+    # 返回了数据的 execute_sql: (sql, 输出)
+    results: List[Tuple[str, list]] = field(default_factory=list)
+
+
+async def plan_database(
+    progress: DbProgress,
+    user_query: str,
+    route: KeywordRoute,
+    context_list: list[str],
+    emit: Callable[[Union[str, TableFrame]], None],
+) -> None:
+    """
+    单个数据库的规划与工具执行循环 (不含总结), 结果写入 progress;
+    进度 (loading 阶段名) 与查询结果表格通过 emit 发出.
+    """
+    db_key = progress.db_key
+    # keyword_maps 命中的表 + 向量检索的 top_k 张表, 紧凑格式
+    dbs = await get_schema_index().select(db_key, user_query, route.tables.get(db_key, ()))
+    logger.debug("dbs: %s", dbs)
+
+    # 同一模板的问题已有验证过的 SQL: 直接执行, 跳过规划循环
+    cached = await get_sql_plan_cache().lookup(db_key, user_query)
+    if cached is not None:
+        logger.debug("cached sql plan: %s", cached[1])
+        emit("mcp_execute_sql")
+        frames = await run_cached_plan(progress, *cached, context_list)
+        if frames is not None:
+            for frame in frames:
+                emit(frame)
+            progress.status = "done"
+            progress.finished = True
+            return
+
+    times = 1
     while True:
-        prompt = get_mcp_prompt(user_query, context, dbs)
-        llm_reply = await generate_with_ollama(prompt)
+        prompt = get_mcp_prompt(user_query, progress.context, dbs)
+        with upstream_stage("mcp_planning"), stage_timer("mcp_planning_round") as timer:
+            llm_reply = await get_model_routes().generate(
+                "mcp_planner", prompt, accept=is_valid_plan
+            )
+            timer.model = llm_reply["model"]
         llm_reply = clean_message(llm_reply["response"])
 
         if END_KEYWORD in llm_reply or times == 5:
             if times == 1:
-                yield "loading: mcp_ending_not_match \n\n"
-                break
-            yield "loading: mcp_ending_summarize \n\n"
-            summary_prompt = get_summary_prompt(user_query, context, rag_result)
-            final_token = ""
-            async for chunk in generate_with_ollama_stream(
-                prompt=summary_prompt, model="qwen3:32b"
-            ):
-                token = (
-                    str(chunk.get("response"))
-                    if isinstance(chunk, dict) and "response" in chunk
-                    else str(chunk)
-                )
-                print("token-------------", token)
-                final_token += token
-                yield token
-
-            context_list.append(f"summary: {final_token}\n")
-            break
+                progress.status = "not_match"
+                return
+            progress.finished = END_KEYWORD in llm_reply
+            # 最近一次返回了数据行的只读 execute_sql, 规划正常结束后作为计划保存
+            if progress.finished and progress.results and is_read_only(progress.results[-1][0]):
+                await get_sql_plan_cache().store(db_key, user_query, progress.results[-1][0])
+            progress.status = "done"
+            return
 
         try:
             plan = extract_json(llm_reply)
-            print("tool plan----------------------", plan)
+            logger.debug("tool plan: %s", plan)
             tool = plan["tool"]
             args = plan.get("args", {})
             if times > 1:
-                yield "loading: mcp_another_try \n\n"
-
-            # yield f"正在使用MCP tool: {tool}, 参数: {json.dumps(args, ensure_ascii=False)}\n" yield f"loading: {getLoadingTextByTool(tool)} \n\n"
-            async for tool_output in call_tool_with_stream(tool, db_key, args):
-                # yield f"TOOL_OUTPUT: {json.dumps(tool_output, ensure_ascii=False)}\n\n"
-                context_list.append(
-                    f"tool: {tool}, args: {args}, output: {tool_output}\n"
-                )
-                context += f"TOOL({tool}, {args}) => {tool_output}\n"
-                print("tool_output------------------", tool_output)
+                emit("mcp_another_try")
+            if loading := getLoadingTextByTool(tool):
+                emit(loading)
+
+            outputs = []
+            with upstream_stage("mcp_tool"), stage_timer("mcp_tool_call"):
+                async for tool_output in call_tool_with_stream(tool, db_key, args):
+                    outputs.append(tool_output)
+                    # prompt 中只放限制大小后的结果, 完整的查询结果以 table 事件发给前端; 解析大结果较耗 CPU, 放到线程中
+                    text, tables = await asyncio.to_thread(
+                        get_sql_result_formatter().handle, tool, args, tool_output
+                    )
+                    for frame in tables:
+                        emit(frame)
+                    context_list.append(
+                        f"tool: {tool}, args: {args}, output: {text}\n"
+                    )
+                    progress.context += f"TOOL({tool}, {args}) => {text}\n"
+                    logger.debug("tool_output: %s", text)
+            if tool == "execute_sql" and args.get("sql") and is_useful_result(outputs):
+                progress.results.append((args["sql"], outputs))
             times += 1
         except Exception as e:
-            print("error in run_agent-----------------", e)
-            yield f"** Error parsing or executing plan: {e} **\n"
-            break
+            logger.error("error in run_agent (%s): %s", db_key, e)
+            progress.status = "error"
+            progress.error = str(e)
+            return
+
+
+def merge_contexts(progresses: List[DbProgress]) -> str:
+    """单库时即该库的 context; 多库时按库分段, 未得到 (完整) 结果的库注明原因, 便于总结时说明"""
+    if len(progresses) == 1:
+        return progresses[0].context
+    notes = {"not_match": "该库中没有与问题相关的数据", "error": "查询出错", "timeout": "查询超时, 未完成"}
+    sections = []
+    for progress in progresses:
+        note = notes.get(progress.status)
+        if progress.context:
+            body = progress.context + (f"({note}, 以上为部分结果)\n" if note else "")
+        else:
+            body = f"{note}\n"
+        sections.append(f"【{progress.name}】\n{body}")
+    return "".join(sections)
+
+
+async def run_postgres_mcp_tool(
+    user_query: str, context_list: list[str], rag_result: list[str], route: Optional[KeywordRoute] = None
+):
+    """
+    命中的每个数据库各自以独立的任务并发规划与执行, 共用一个截止时间 (mcp_fanout.deadline);
+    各库的进度以 loading 事件实时发出 (多库时为 "mcp_db:库名:阶段"), 结束后合并各库的结果, 只调用一次总结.
+    """
+    # route 由 /analyze 分类时传入, 避免重复扫描
+    route = route or get_keyword_router().route(user_query)
+    progresses = [
+        DbProgress(db_key, global_config.mcp_db_dict[db_key].get("keyword") or db_key)
+        for db_key in route.databases
+    ]
+    multi = len(progresses) > 1
+
+    def loading(progress: DbProgress, stage: str) -> str:
+        return f"loading: mcp_db:{progress.name}:{stage} \n\n" if multi else f"loading: {stage} \n\n"
+
+    yield "loading: mcp_begining \n\n"
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + global_config.mcp_fanout.get("deadline", 90)
+    # (进度, 事件); 事件为 None 表示该库的任务已结束
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def emitter(progress: DbProgress) -> Callable[[Union[str, TableFrame, None]], None]:
+        return lambda item: queue.put_nowait((progress, item))
+
+    tasks: Dict[str, asyncio.Task] = {}
+    for progress in progresses:
+        emit = emitter(progress)
+        tasks[progress.db_key] = asyncio.create_task(
+            plan_database(progress, user_query, route, context_list, emit)
+        )
+        tasks[progress.db_key].add_done_callback(lambda _, emit=emit: emit(None))
+
+    try:
+        running = len(tasks)
+        while running:
+            try:
+                progress, item = await asyncio.wait_for(queue.get(), deadline - loop.time())
+            except asyncio.TimeoutError:
+                break
+            if isinstance(item, TableFrame):
+                yield item
+            elif item is not None:
+                yield loading(progress, item)
+            else:
+                running -= 1
+                if progress.status == "running":
+                    # 任务抛出了异常 (规划模型调用失败等)
+                    progress.status, progress.error = "error", str(tasks[progress.db_key].exception())
+                    logger.error("mcp planning error (%s): %s", progress.db_key, progress.error)
+                if multi:
+                    yield loading(progress, f"mcp_db_{progress.status}")
+    finally:
+        unfinished = [task for task in tasks.values() if not task.done()]
+        for task in unfinished:
+            task.cancel()
+        if unfinished:
+            await asyncio.gather(*unfinished, return_exceptions=True)
+
+    for progress in progresses:
+        if progress.status == "running":
+            progress.status = "timeout"
+            logger.warning("mcp planning timeout: %s", progress.db_key)
+            if multi:
+                yield loading(progress, "mcp_db_timeout")
+
+    if not any(p.context for p in progresses):
+        failed = next((p for p in progresses if p.status in ("error", "timeout")), None)
+        if failed is None:
+            yield "loading: mcp_ending_not_match \n\n"
+        elif failed.status == "timeout":
+            yield "** MCP query timed out **\n"
+        else:
+            yield f"** Error parsing or executing plan: {failed.error} **\n"
+        return
+
+    # 简单的聚合/查找结果直接渲染为表格, 不调用总结模型; 规划轮数用尽的库结果可能不完整, 交给总结说明
+    rendered = None
+    if all(p.status == "done" and p.finished for p in progresses):
+        rendered = get_table_renderer().render([(p.db_key, p.name, p.results) for p in progresses], rag_result)
+    if rendered is not None:
+        context_list.append(f"summary: {rendered}\n")
+        yield rendered
+        return
+
+    async for token in summarize(user_query, merge_contexts(progresses), rag_result, context_list):
+        yield token
 
 
 # 生成 loading text, 前端匹配
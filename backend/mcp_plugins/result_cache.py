@@ -0,0 +1,131 @@
+import json
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utils.load_config import global_config
+
+_SQL_STRING = re.compile(r"'(?:[^']|'')*'")
+_SQL_QUOTED = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"")
+# 只缓存只读语句; 字符串字面量之外出现写操作关键字 (含 SELECT INTO、nextval 等有副作用的写法) 时视为写入
+_READ_ONLY = re.compile(r"^\s*(select|with|show|explain|values|table)\b", re.IGNORECASE)
+_WRITE = re.compile(
+    r"\b(insert|update|delete|merge|upsert|create|alter|drop|truncate|grant|revoke|copy|call|do|vacuum|refresh|lock|into|nextval|setval)\b",
+    re.IGNORECASE,
+)
+
+CacheKey = Tuple[str, str, str]
+
+
+def normalize_sql(sql: str) -> str:
+    """字符串字面量与带引号的标识符之外: 空白合并为一个空格并转为小写; 去掉结尾的分号"""
+    pieces, position = [], 0
+    for match in _SQL_QUOTED.finditer(sql):
+        pieces.append(re.sub(r"\s+", " ", sql[position : match.start()]).lower())
+        pieces.append(match.group(0))
+        position = match.end()
+    pieces.append(re.sub(r"\s+", " ", sql[position:]).lower())
+    return "".join(pieces).strip().rstrip(";").strip()
+
+
+def is_read_only(sql: str) -> bool:
+    return bool(_READ_ONLY.match(sql)) and not _WRITE.search(_SQL_STRING.sub("''", sql))
+
+
+class McpResultCache:
+    """
+    MCP 工具结果的 TTL 缓存
+
+    按 (数据库, 工具名, 规范化的参数) 缓存成功的工具输出: 表结构等元数据工具 (metadata_tools) 缓存 metadata_ttl 秒,
+    只读的 execute_sql 缓存 sql_ttl 秒. 规划循环中重复的查询与重复的用户问题不再访问数据库.
+    执行写语句时清空该库的 execute_sql 缓存; 数据在 MCP 之外更新时可调用 /mcp_result_cache/invalidate.
+    缓存在各 worker 进程内.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        sql_ttl: float = 60,
+        metadata_ttl: float = 3600,
+        max_entries: int = 1000,
+        metadata_tools: Iterable[str] = ("list_schemas", "list_objects", "get_object_details"),
+    ):
+        self.enabled = enabled
+        self.sql_ttl = sql_ttl
+        self.metadata_ttl = metadata_ttl
+        self.max_entries = max_entries
+        self.metadata_tools = set(metadata_tools)
+        # key -> (过期时间, 工具输出)
+        self._entries: "OrderedDict[CacheKey, Tuple[float, list]]" = OrderedDict()
+        self.stats: Dict[str, int] = {
+            "hits": 0,
+            "misses": 0,
+            "stored": 0,
+            "expired": 0,
+            "evicted": 0,
+            "invalidated": 0,
+        }
+        self.tool_hits: Dict[str, int] = {}
+
+    def _ttl(self, tool: str, args: dict) -> float:
+        if tool in self.metadata_tools:
+            return self.metadata_ttl
+        if tool == "execute_sql" and is_read_only(str(args.get("sql", ""))):
+            return self.sql_ttl
+        return 0
+
+    def key(self, db_key: str, tool: str, args: dict) -> Optional[CacheKey]:
+        """可缓存的调用返回缓存键, 否则 (写语句、未知工具、缓存关闭) 返回 None"""
+        if not self.enabled or self._ttl(tool, args) <= 0:
+            return None
+        if tool == "execute_sql":
+            args = {**args, "sql": normalize_sql(str(args["sql"]))}
+        return db_key, tool, json.dumps(args, ensure_ascii=False, sort_keys=True, default=str)
+
+    def get(self, key: CacheKey) -> Optional[list]:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] <= time.monotonic():
+            del self._entries[key]
+            self.stats["expired"] += 1
+            entry = None
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats["hits"] += 1
+        self.tool_hits[key[1]] = self.tool_hits.get(key[1], 0) + 1
+        return entry[1]
+
+    def put(self, key: CacheKey, outputs: List, args: dict) -> None:
+        self._entries[key] = (time.monotonic() + self._ttl(key[1], args), list(outputs))
+        self._entries.move_to_end(key)
+        self.stats["stored"] += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evicted"] += 1
+
+    def invalidate(self, db_key: Optional[str] = None, tool: Optional[str] = None) -> int:
+        """删除匹配 db_key / tool 的缓存 (为空表示不限), 返回删除的条数"""
+        keys = [
+            key
+            for key in self._entries
+            if (db_key is None or key[0] == db_key) and (tool is None or key[1] == tool)
+        ]
+        for key in keys:
+            del self._entries[key]
+        self.stats["invalidated"] += len(keys)
+        return len(keys)
+
+    def cache_stats(self) -> Dict[str, object]:
+        return {**self.stats, "entries": len(self._entries), "tool_hits": dict(self.tool_hits)}
+
+
+MCP_RESULT_CACHE: Optional[McpResultCache] = None
+
+
+def get_mcp_result_cache() -> McpResultCache:
+    global MCP_RESULT_CACHE
+    if not MCP_RESULT_CACHE:
+        MCP_RESULT_CACHE = McpResultCache(**global_config.mcp_result_cache)
+    return MCP_RESULT_CACHE
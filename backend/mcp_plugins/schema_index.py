@@ -0,0 +1,113 @@
+import logging
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+from utils.embedding import embed_query, embed_texts
+from utils.load_config import global_config
+
+logger = logging.getLogger(__name__)
+
+
+def table_document(name: str, schema: dict) -> str:
+    """用于向量化的表描述: 表名、表说明与各字段的名称和说明"""
+    fields = " ".join(
+        f"{field.get('title')} {field.get('introduction') or ''}".strip() for field in schema.get("fields", [])
+    )
+    return f"{name} {schema.get('introduction') or ''}\n{fields}"
+
+
+def render_table(name: str, schema: dict) -> str:
+    """紧凑的表结构: 一行一张表, 字段写作 "名称 类型 说明", 省略长度与空说明"""
+    fields = ", ".join(
+        " ".join(
+            part
+            for part in (field.get("title"), str(field.get("type") or "").lower(), field.get("introduction"))
+            if part
+        )
+        for field in schema.get("fields", [])
+    )
+    return f"{name}({schema.get('introduction') or ''}): {fields}"
+
+
+def _bigrams(text: str) -> set:
+    text = text.lower()
+    return {text[i : i + 2] for i in range(len(text) - 1)}
+
+
+class SchemaIndex:
+    """
+    数据库表结构的向量索引
+
+    启动时为 mcp_db_dict 中每张表的说明与字段说明计算向量, 请求时取与问题最相近的 top_k 张表,
+    与 keyword_maps 命中的表合并后以紧凑格式放入 MCP 规划 prompt, prompt 大小不随表的数量增长.
+    向量不可用时按问题与表描述的字符二元组重合度排序.
+    """
+
+    def __init__(self, top_k: int = 5, max_tables: int = 8):
+        self.top_k = top_k
+        self.max_tables = max_tables
+        self.names: Dict[str, List[str]] = {}
+        self.documents: Dict[str, List[str]] = {}
+        # 各表的紧凑格式在启动时生成一次, 请求中只做拼接
+        self.rendered: Dict[str, Mapping[str, str]] = {}
+        for db_key, db_config in global_config.mcp_db_dict.items():
+            schemas = db_config.get("schemas", {})
+            self.names[db_key] = list(schemas)
+            self.documents[db_key] = [table_document(name, schemas[name]) for name in schemas]
+            self.rendered[db_key] = MappingProxyType({name: render_table(name, schemas[name]) for name in schemas})
+        self.vectors: Dict[str, np.ndarray] = {}
+        self.stats: Dict[str, int] = {"vector": 0, "lexical": 0}
+
+    async def build(self) -> None:
+        """预计算各表的向量; 失败的库在请求时按字符重合度排序"""
+        for db_key in self.names:
+            try:
+                self.vectors[db_key] = await embed_texts(self.documents[db_key])
+            except Exception as e:
+                logger.error("build schema index error (%s): %s", db_key, e)
+
+    async def search(self, db_key: str, query: str) -> List[str]:
+        """与问题最相近的 top_k 张表名"""
+        names = self.names.get(db_key, [])
+        if not names:
+            return []
+        vectors = self.vectors.get(db_key)
+        scores: Optional[np.ndarray] = None
+        if vectors is not None:
+            try:
+                scores = vectors @ await embed_query(query)
+                self.stats["vector"] += 1
+            except Exception as e:
+                logger.warning("schema index embedding error: %s", e)
+        if scores is None:
+            query_bigrams = _bigrams(query)
+            scores = np.array([len(query_bigrams & _bigrams(doc)) for doc in self.documents[db_key]])
+            self.stats["lexical"] += 1
+        return [names[i] for i in np.argsort(-scores, kind="stable")[: self.top_k]]
+
+    async def select(self, db_key: str, query: str, keyword_tables: Sequence[str]) -> str:
+        """keyword_maps 命中的表在前, 之后补充检索结果, 最多 max_tables 张, 返回紧凑的表结构文本"""
+        rendered = self.rendered.get(db_key, {})
+        selected = [name for name in keyword_tables if name in rendered]
+        for name in await self.search(db_key, query):
+            if name not in selected:
+                selected.append(name)
+        return "\n".join(rendered[name] for name in selected[: self.max_tables])
+
+    def index_stats(self) -> Dict[str, object]:
+        return {
+            **self.stats,
+            "tables": {db_key: len(names) for db_key, names in self.names.items()},
+            "embedded": [db_key for db_key in self.vectors],
+        }
+
+
+SCHEMA_INDEX: Optional[SchemaIndex] = None
+
+
+def get_schema_index() -> SchemaIndex:
+    global SCHEMA_INDEX
+    if not SCHEMA_INDEX:
+        SCHEMA_INDEX = SchemaIndex(**global_config.schema_index)
+    return SCHEMA_INDEX
@@ -0,0 +1,230 @@
+import ast
+import itertools
+import json
+import re
+from collections import Counter
+from functools import lru_cache
+from json.encoder import encode_basestring
+from typing import Dict, List, Optional, Tuple
+
+from utils.load_config import global_config
+from utils.single_flight import LiveFrame
+from utils.utils import dumps_json
+
+# postgres-mcp 以 str(list[dict]) 返回查询结果. 逐个替换其中的 Python 字面量 (字符串、None/True/False、
+# Decimal / UUID / datetime) 转成 JSON 后用 json.loads 解析, 比对整段文本 ast.literal_eval 快得多
+_PY_TOKEN = re.compile(
+    r"""'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|\b(?:None|True|False)\b"""
+    r"""|(?:decimal\.)?Decimal\('([^']*)'\)|(?:uuid\.)?UUID\('([^']*)'\)"""
+    r"""|datetime\.(date|datetime|time|timedelta)\(((?:[^()]|\([^()]*\))*)\)"""
+)
+_JSON_NUMBER = re.compile(r"-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?")
+_CONSTANTS = {"None": "null", "True": "true", "False": "false"}
+
+
+@lru_cache(maxsize=4096)
+def _datetime_text(kind: str, args: str) -> str:
+    numbers = [int(n) for n in re.findall(r"(?<![\w=.])-?\d+", args.split("tzinfo=")[0])]
+    if kind == "date" and len(numbers) >= 3:
+        return "%04d-%02d-%02d" % tuple(numbers[:3])
+    if kind == "datetime" and len(numbers) >= 3:
+        numbers += [0] * (6 - len(numbers))
+        return "%04d-%02d-%02d %02d:%02d:%02d" % tuple(numbers[:6])
+    if kind == "time" and numbers:
+        numbers += [0] * (3 - len(numbers))
+        return "%02d:%02d:%02d" % tuple(numbers[:3])
+    return f"{kind}({args})"
+
+
+def _json_token(match: re.Match) -> str:
+    token = match.group(0)
+    if token[0] in "'\"":
+        if "\\" in token:
+            return encode_basestring(ast.literal_eval(token))
+        if token[0] == "'" and '"' not in token:
+            return f'"{token[1:-1]}"'
+        return encode_basestring(token[1:-1])
+    if token in _CONSTANTS:
+        return _CONSTANTS[token]
+    decimal, uuid, kind, args = match.groups()
+    if decimal is not None:
+        return decimal if _JSON_NUMBER.fullmatch(decimal) else encode_basestring(decimal)
+    if uuid is not None:
+        return f'"{uuid}"'
+    return encode_basestring(_datetime_text(kind, args))
+
+
+def parse_rows(output) -> Optional[Tuple[List[str], List[list]]]:
+    """
+    将 execute_sql 的输出解析为 (列名, 行); 输出不是行列表 (报错信息、"No results" 等) 时返回 None.
+    支持 JSON 与 Python repr (postgres-mcp 的格式).
+    """
+    data = output
+    if isinstance(output, (str, bytes)):
+        text = output.decode("utf-8", "replace") if isinstance(output, bytes) else output
+        text = text.strip()
+        if not text.startswith("["):
+            return None
+        try:
+            data = json.loads(text)
+        except ValueError:
+            try:
+                data = json.loads(_PY_TOKEN.sub(_json_token, text))
+            except (ValueError, SyntaxError):
+                try:
+                    # 元组、非字符串键等 JSON 无法表示的结构
+                    data = ast.literal_eval(text)
+                except (ValueError, SyntaxError, MemoryError, RecursionError):
+                    return None
+    if not isinstance(data, list):
+        return None
+    if all(isinstance(row, dict) for row in data):
+        columns = list(dict.fromkeys(key for row in data for key in row))
+        return [str(c) for c in columns], [[row.get(c) for c in columns] for row in data]
+    if all(isinstance(row, (list, tuple)) for row in data):
+        width = max((len(row) for row in data), default=0)
+        return [f"c{i + 1}" for i in range(width)], [list(row) + [None] * (width - len(row)) for row in data]
+    return None
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _cell(value):
+    return value if value is None or isinstance(value, (str, int, float, bool)) else str(value)
+
+
+def _short(value, limit: int = 40) -> str:
+    text = str(value)
+    return text if len(text) <= limit else text[:limit] + "…"
+
+
+def column_stats(columns: List[str], rows: List[list]) -> List[str]:
+    """每列一行: 数值列给出范围与均值, 其他列给出不同值数量与最常见的值"""
+    lines = []
+    for index, column in enumerate(columns):
+        values = [row[index] for row in rows if row[index] is not None]
+        if values and all(_is_number(v) for v in values):
+            lines.append(
+                f"- {column}: 数值, 非空 {len(values)}, 最小 {min(values)}, 最大 {max(values)}, "
+                f"平均 {sum(values) / len(values):.4g}"
+            )
+            continue
+        counts = Counter(_short(v) for v in values)
+        common = ", ".join(f"{value}({count})" for value, count in counts.most_common(3))
+        lines.append(f"- {column}: 非空 {len(values)}, 不同值 {len(counts)}, 常见: {common}")
+    return lines
+
+
+class TableFrame(LiveFrame):
+    """
+    已编码的 table SSE 帧; MCP 流程中与 token 一起产出, /analyze 原样转发给前端, 不进入回答文本.
+    只发给执行时已在订阅的客户端, single flight 不保存它供之后加入的请求回放.
+    """
+
+
+class SqlResultFormatter:
+    """
+    MCP 工具结果的大小限制
+
+    放入规划与总结 prompt 的工具结果不超过 max_rows 行、max_bytes 字节, 超出时换成摘要:
+    总行数、各列统计与前 sample_rows 行样例. 这类被省略的 execute_sql 结果的前 max_table_rows 行以 table 事件
+    (每帧 chunk_rows 行) 发送给前端展示, 不经过 LLM; 完整放入 prompt 的结果由回答 (总结或直接渲染的表格) 展示,
+    不再重复发送.
+    """
+
+    def __init__(
+        self,
+        max_rows: int = 50,
+        max_bytes: int = 8000,
+        sample_rows: int = 5,
+        chunk_rows: int = 200,
+        max_table_rows: int = 1000,
+    ):
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.sample_rows = sample_rows
+        self.chunk_rows = chunk_rows
+        self.max_table_rows = max_table_rows
+        self._ids = itertools.count(1)
+        self.stats: Dict[str, int] = {
+            "results": 0,
+            "truncated": 0,
+            "bytes_in": 0,
+            "bytes_to_prompt": 0,
+            "table_rows": 0,
+            "table_rows_dropped": 0,
+        }
+
+    def _truncate(self, text: str) -> str:
+        data = text.encode("utf-8")
+        if len(data) <= self.max_bytes:
+            return text
+        return data[: self.max_bytes].decode("utf-8", "ignore") + f"\n...[已截断, 原文 {len(data)} 字节]"
+
+    def summarize(self, columns: List[str], rows: List[list]) -> str:
+        sample = [dict(zip(columns, row)) for row in rows[: self.sample_rows]]
+        lines = [
+            f"[结果过大, 已省略] 共 {len(rows)} 行 {len(columns)} 列; 完整结果已以表格展示给用户",
+            "列统计:",
+            *column_stats(columns, rows),
+            f"前 {len(sample)} 行样例:",
+            json.dumps(sample, ensure_ascii=False, default=str),
+        ]
+        return self._truncate("\n".join(lines))
+
+    def handle(self, tool: str, args: dict, output) -> Tuple[str, List[TableFrame]]:
+        """
+        返回 (放入 prompt 的文本, table 帧). 未超限时文本为原输出, 没有 table 帧;
+        否则换成摘要 (能解析出行时) 或截断, execute_sql 解析出的结果取前 max_table_rows 行按 chunk_rows 行分帧.
+        """
+        text = output if isinstance(output, str) else str(output)
+        size = len(text.encode("utf-8"))
+        parsed = parse_rows(output)
+        self.stats["results"] += 1
+        self.stats["bytes_in"] += size
+        if size <= self.max_bytes and (parsed is None or len(parsed[1]) <= self.max_rows):
+            self.stats["bytes_to_prompt"] += size
+            return text, []
+        self.stats["truncated"] += 1
+        prompt_text = self.summarize(*parsed) if parsed is not None else self._truncate(text)
+        self.stats["bytes_to_prompt"] += len(prompt_text.encode("utf-8"))
+
+        frames = []
+        if tool == "execute_sql" and parsed is not None and parsed[1]:
+            frames = self._table_frames(args.get("sql", ""), *parsed)
+        return prompt_text, frames
+
+    def _table_frames(self, sql: str, columns: List[str], rows: List[list]) -> List[TableFrame]:
+        table_id = next(self._ids)
+        # 超出 max_table_rows 的行不发送, total 仍为实际行数, 前端据此提示只显示了前若干行
+        shown = rows[: self.max_table_rows]
+        self.stats["table_rows"] += len(shown)
+        self.stats["table_rows_dropped"] += len(rows) - len(shown)
+        frames = []
+        for start in range(0, len(shown), self.chunk_rows):
+            event = {
+                "type": "table",
+                "id": table_id,
+                "sql": sql,
+                "columns": columns,
+                "rows": [[_cell(v) for v in row] for row in shown[start : start + self.chunk_rows]],
+                "total": len(rows),
+                "done": start + self.chunk_rows >= len(shown),
+            }
+            frames.append(TableFrame(f"data: {dumps_json(event)}\n\n"))
+        return frames
+
+    def result_stats(self) -> Dict[str, int]:
+        return dict(self.stats)
+
+
+SQL_RESULT_FORMATTER: Optional[SqlResultFormatter] = None
+
+
+def get_sql_result_formatter() -> SqlResultFormatter:
+    global SQL_RESULT_FORMATTER
+    if not SQL_RESULT_FORMATTER:
+        SQL_RESULT_FORMATTER = SqlResultFormatter(**global_config.sql_result)
+    return SQL_RESULT_FORMATTER
@@ -0,0 +1,118 @@
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from utils.load_config import global_config
+
+from .sql_result import parse_rows
+
+# 单条 SELECT: 无联表、子查询、CTE、集合运算与窗口函数
+_COMPLEX_SQL = re.compile(r"\b(join|union|intersect|except|with|over|having)\b|\(\s*select\b", re.IGNORECASE)
+_TABLES = re.compile(r"\bfrom\s+([\w.\"]+)", re.IGNORECASE)
+_AGGREGATES = {"count": "数量", "sum": "合计", "avg": "平均值", "max": "最大值", "min": "最小值"}
+
+
+def is_simple_sql(sql: str) -> bool:
+    """简单的聚合或查找: 单条 SELECT, 不含联表、子查询等"""
+    sql = sql.strip().rstrip(";")
+    return bool(re.match(r"select\b", sql, re.IGNORECASE)) and ";" not in sql and not _COMPLEX_SQL.search(sql)
+
+
+def format_cell(value) -> str:
+    if value is None:
+        return "-"
+    if isinstance(value, bool):
+        return "是" if value else "否"
+    if isinstance(value, float):
+        value = int(value) if value.is_integer() else round(value, 2)
+    return str(value).replace("|", "\\|").replace("\n", " ").strip() or "-"
+
+
+def sql_tables(sql: str) -> List[str]:
+    return [name.strip('"').split(".")[-1] for name in _TABLES.findall(sql)]
+
+
+def column_headers(db_key: str, sql: str, columns: Sequence[str]) -> List[str]:
+    """列名换成 config.jsonc 中 SQL 所查表的字段说明; 聚合列 (count、sum...) 换成对应的中文, 都没有时保留列名"""
+    schemas = global_config.mcp_db_dict.get(db_key, {}).get("schemas", {})
+    tables = sql_tables(sql)
+    introductions: Dict[str, str] = {}
+    for table in tables + [name for name in schemas if name not in tables]:
+        for field in schemas.get(table, {}).get("fields", []):
+            if field.get("introduction"):
+                introductions.setdefault(field.get("title"), field["introduction"])
+    return [introductions.get(column) or _AGGREGATES.get(column.lower()) or column for column in columns]
+
+
+class TableRenderer:
+    """
+    简单查询结果的直接渲染
+
+    每个数据库只有一次返回数据的 execute_sql、SQL 为简单的聚合或查找、结果不超过 max_rows 行
+    max_columns 列且没有知识库资料需要结合时, 按模板输出引导语与 markdown 表格 (表头取自字段说明),
+    不再调用总结模型; 其余情况仍由 LLM 总结.
+    """
+
+    def __init__(self, enabled: bool = True, max_rows: int = 20, max_columns: int = 6, max_bytes: int = 2000):
+        self.enabled = enabled
+        self.max_rows = max_rows
+        self.max_columns = max_columns
+        self.max_bytes = max_bytes
+        self.stats: Dict[str, int] = {"rendered": 0, "summarized": 0}
+
+    def _table(self, db_key: str, sql: str, outputs: list) -> Optional[str]:
+        text = "".join(str(output) for output in outputs)
+        if not is_simple_sql(sql) or len(outputs) != 1 or len(text.encode("utf-8")) > self.max_bytes:
+            return None
+        parsed = parse_rows(outputs[0])
+        if parsed is None:
+            return None
+        columns, rows = parsed
+        if not rows or len(rows) > self.max_rows or not columns or len(columns) > self.max_columns:
+            return None
+        headers = column_headers(db_key, sql, columns)
+        schemas = global_config.mcp_db_dict.get(db_key, {}).get("schemas", {})
+        table = next(iter(sql_tables(sql)), "")
+        source = schemas.get(table, {}).get("introduction") or table
+        if len(rows) == 1 and len(columns) == 1:
+            return f"根据{source}的查询结果, {headers[0]}为 **{format_cell(rows[0][0])}**。"
+        lines = [
+            f"根据{source}的查询结果, 共 {len(rows)} 条记录:",
+            "",
+            "| " + " | ".join(format_cell(h) for h in headers) + " |",
+            "| " + " | ".join("---" for _ in headers) + " |",
+            *("| " + " | ".join(format_cell(v) for v in row) + " |" for row in rows),
+        ]
+        return "\n".join(lines)
+
+    def render(self, databases: List[Tuple[str, str, List[Tuple[str, list]]]], rag_result: list) -> Optional[str]:
+        """
+        databases 为各库的 (db_key, 库名, 返回了数据的 execute_sql 列表);
+        可以直接渲染时返回 markdown, 否则返回 None 由 LLM 总结.
+        """
+        sections = None
+        if self.enabled and not rag_result and databases:
+            sections = []
+            for db_key, name, results in databases:
+                table = self._table(db_key, *results[0]) if len(results) == 1 else None
+                if table is None:
+                    sections = None
+                    break
+                sections.append(f"**{name}** {table}" if len(databases) > 1 else table)
+        if sections is None:
+            self.stats["summarized"] += 1
+            return None
+        self.stats["rendered"] += 1
+        return "\n\n".join(sections) + "\n"
+
+    def render_stats(self) -> Dict[str, int]:
+        return dict(self.stats)
+
+
+TABLE_RENDERER: Optional[TableRenderer] = None
+
+
+def get_table_renderer() -> TableRenderer:
+    global TABLE_RENDERER
+    if not TABLE_RENDERER:
+        TABLE_RENDERER = TableRenderer(**global_config.table_render)
+    return TABLE_RENDERER
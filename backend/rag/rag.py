@@ -1,25 +1,48 @@
+import logging
+
 import httpx
 from typing import Optional
 from utils.promptsArchive import get_rag_analysis_prompt, NO_RELATION
-from utils.models import generate_with_ollama
+from utils.model_routes import get_model_routes
 from utils.utils import clean_message
 from utils.load_config import global_config
+from utils.cancellation import upstream_stage
+from utils.metrics import stage_timer
+from .relevance_gate import get_relevance_gate
 
 SUB_DOMAIN = "/search"
 
-async def run_rag_analyzing(text: str, images: Optional[str] = None, top_k: int = 3):
-    yield "loading: rag_analyzing \n\n"
+logger = logging.getLogger(__name__)
 
+async def llm_relevance_check(text: str, images: Optional[str] = None) -> bool:
+    """使用大模型判断问题 (及图片) 是否与 RAG 库主题相关"""
     prompt = get_rag_analysis_prompt(text)
-    llm_reply = await generate_with_ollama(
-        model="qwen2.5vl:7b" if images else "qwen3:32b",
-        prompt=prompt,
-        image=images,
-    )
+    site, default = ("rag_gate_image", "qwen2.5vl:7b") if images else ("rag_gate", "qwen3:32b")
+    with upstream_stage("rag_gate"), stage_timer("rag_gate_llm") as timer:
+        llm_reply = await get_model_routes().generate(
+            site,
+            prompt,
+            default=default,
+            image=images,
+            accept=lambda reply: NO_RELATION in reply or "yes" in clean_message(reply).lower(),
+        )
+        # 按实际回复的模型记录 (小模型输出不可用时为 fallback 模型)
+        timer.model = llm_reply["model"]
     llm_reply = clean_message(llm_reply["response"])
-    print("analyzing result: -------------------", llm_reply)
+    logger.debug("analyzing result: %s", llm_reply)
+    return NO_RELATION not in llm_reply
+
 
-    if NO_RELATION in llm_reply:
+async def run_rag_analyzing(text: str, images: Optional[str] = None, top_k: int = 3):
+    yield "loading: rag_analyzing \n\n"
+
+    # 优先使用本地向量判断, 不确定时才回退到 LLM
+    with stage_timer("rag_gate_local"):
+        relevant = await get_relevance_gate().classify(text, has_image=bool(images))
+    if relevant is None:
+        relevant = await llm_relevance_check(text, images)
+
+    if not relevant:
         yield "loading: rag_no_relation \n\n"
     else:
         yield "loading: rag_searching \n\n"
@@ -28,13 +51,14 @@ async def run_rag_analyzing(text: str, images: Optional[str] = None, top_k: int
 
 
 async def retrieveRAGResult(text: Optional[str] = None, image: Optional[str] = None, top_k: int = 3):
-    async with httpx.AsyncClient(timeout=None) as client:
-        response = await client.post(
-            global_config.rag_url + SUB_DOMAIN,
-            json={
-                "text": text,
-                "image_base64": image,
-                "top_k": top_k
-            },
-        )
-        return response.json()
+    with upstream_stage("rag_search"), stage_timer("rag_search"):
+        async with httpx.AsyncClient(timeout=None) as client:
+            response = await client.post(
+                global_config.rag_url + SUB_DOMAIN,
+                json={
+                    "text": text,
+                    "image_base64": image,
+                    "top_k": top_k
+                },
+            )
+            return response.json()
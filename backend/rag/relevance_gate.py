@@ -0,0 +1,101 @@
+import json
+import logging
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+from utils.embedding import embed_query, embed_texts, normalize
+from utils.load_config import global_config
+
+logger = logging.getLogger(__name__)
+
+
+class RelevanceGate:
+    """
+    本地 RAG 相关性判断
+
+    启动时根据 rag_classification 与 RAG 语料标题预先计算每个分类的向量中心,
+    请求时只需向量化查询并与各中心做点积 (纯 CPU), 不再经过大模型.
+    相似度落在 [reject_threshold, accept_threshold) 区间时视为不确定, 交由 LLM 判断.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        corpus_path: str = "",
+        accept_threshold: float = 0.6,
+        reject_threshold: float = 0.4,
+    ):
+        self.enabled = enabled
+        self.corpus_path = corpus_path
+        self.accept_threshold = accept_threshold
+        self.reject_threshold = reject_threshold
+        self.labels: List[str] = []
+        self.centroids: Optional[np.ndarray] = None
+        self.stats: Dict[str, int] = {"accept": 0, "reject": 0, "uncertain": 0}
+
+    @property
+    def ready(self) -> bool:
+        return self.enabled and self.centroids is not None
+
+    def _load_corpus_titles(self) -> List[str]:
+        if not self.corpus_path or not os.path.exists(self.corpus_path):
+            logger.warning("RAG 语料文件不存在, 仅使用分类名称构建向量中心: %s", self.corpus_path)
+            return []
+        with open(self.corpus_path, "r", encoding="utf-8") as f:
+            return [item["title"] for item in json.load(f) if item.get("title")]
+
+    async def build(self) -> None:
+        """预计算各分类的向量中心; 失败时关闭本地判断, 全部回退到 LLM"""
+        if not self.enabled:
+            return
+        try:
+            self.labels = list(global_config.rag_classification)
+            titles = self._load_corpus_titles()
+            label_vectors = await embed_texts(self.labels)
+            members = [[vector] for vector in label_vectors]
+            if titles:
+                # 每个语料标题归入与其最相近的分类
+                title_vectors = await embed_texts(titles)
+                nearest = np.argmax(title_vectors @ label_vectors.T, axis=1)
+                for vector, label_index in zip(title_vectors, nearest):
+                    members[label_index].append(vector)
+            self.centroids = normalize(np.stack([np.mean(m, axis=0) for m in members]))
+        except Exception as e:
+            logger.error("build relevance gate error: %s", e)
+            self.centroids = None
+
+    def score(self, query_vector: np.ndarray) -> float:
+        return float(np.max(self.centroids @ query_vector))
+
+    async def classify(self, text: str, has_image: bool = False) -> Optional[bool]:
+        """
+        返回 True / False 表示相关 / 无关, None 表示不确定或本地判断不可用.
+        带图片时问题文本可能很短 (如 "这是什么病"), 低分不能说明无关, 同样视为不确定.
+        """
+        if not self.ready or not text:
+            return None
+        try:
+            score = self.score(await embed_query(text))
+        except Exception as e:
+            logger.warning("relevance gate embedding error: %s", e)
+            return None
+
+        if score >= self.accept_threshold:
+            self.stats["accept"] += 1
+            return True
+        if score < self.reject_threshold and not has_image:
+            self.stats["reject"] += 1
+            return False
+        self.stats["uncertain"] += 1
+        return None
+
+
+RELEVANCE_GATE: Optional[RelevanceGate] = None
+
+
+def get_relevance_gate() -> RelevanceGate:
+    global RELEVANCE_GATE
+    if not RELEVANCE_GATE:
+        RELEVANCE_GATE = RelevanceGate(**global_config.rag_gate)
+    return RELEVANCE_GATE
@@ -0,0 +1,13 @@
+import os
+import sys
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 与 benchmarks 一样在 backend 目录下运行: config.jsonc 按相对路径读取
+os.chdir(BACKEND)
+sys.path.insert(0, BACKEND)
+os.environ.setdefault("SERVER_INFO", '{"host": "127.0.0.1", "port": 11434}')
+
+from utils.load_config import load_config  # noqa: E402
+
+load_config()
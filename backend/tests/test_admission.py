@@ -0,0 +1,74 @@
+"""
+按模型的并发限制: 突发请求中超出并发与等待队列的部分在返回 SSE 流之前得到 503 + Retry-After.
+以 benchmarks/fake_ollama.py 的替身服务器作为 Ollama, 在 backend 目录下运行:
+    python -m pytest tests
+"""
+import asyncio
+
+import httpx
+
+import main
+import utils.admission as admission
+import utils.models as models
+from benchmarks.fake_ollama import FakeOllama
+from utils.admission import AdmissionController, ModelLimiter
+
+MODELS = ["qwen3:32b", "qwen3:4b", "qwen2.5vl:7b", "bge-m3"]
+
+
+def test_burst_over_limit_gets_503():
+    async def run():
+        # 每次生成约 0.5s, 突发的 10 个请求都在任何名额归还之前到达
+        fake = FakeOllama("a", models=MODELS, tokens=10, token_delay=0.05).start()
+        models.OLLAMA_CLIENT = models.OllamaClient([fake.endpoint], router={"health_interval": 0})
+        admission.ADMISSION_CONTROLLER = AdmissionController(
+            retry_after=7, default={"max_concurrent": 2, "max_queue": 3}
+        )
+        try:
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as client:
+                responses = await asyncio.gather(
+                    *(
+                        client.post("/analyze", json={"prompt": f"讲个笑话 {i}", "chat_id": f"burst-{i}"})
+                        for i in range(10)
+                    )
+                )
+                stats = (await client.get("/admission_stats")).json()["qwen3:32b"]
+        finally:
+            await models.OLLAMA_CLIENT.aclose()
+            models.OLLAMA_CLIENT = None
+            admission.ADMISSION_CONTROLLER = None
+            fake.stop()
+        return responses, stats
+
+    responses, stats = asyncio.run(run())
+    rejected = [r for r in responses if r.status_code == 503]
+    # 2 个并发 + 3 个排队, 其余 5 个直接拒绝, 不会先打开 SSE 流
+    assert len(rejected) == 5
+    assert all(r.headers["Retry-After"] == "7" for r in rejected)
+    assert all(r.status_code == 200 and '"type":"done"' in r.text.replace(" ", "") for r in responses if r not in rejected)
+    assert stats["rejected"] == 5 and stats["active"] == 0 and stats["waiting"] == 0
+
+
+def test_unclaimed_reservation_is_returned():
+    async def run():
+        limiter = ModelLimiter(max_concurrent=1, max_queue=1)
+        first, queued = limiter.try_reserve(), limiter.try_reserve()
+        assert limiter.try_reserve() is None
+
+        # 流没有启动 (客户端提前断开): 响应关闭时归还, 排队的预留随即得到名额
+        first.release_unclaimed()
+        assert queued.claim()
+        positions = [position async for position in limiter.wait(queued)]
+        assert positions == [] and limiter.active == 1
+
+        # 已被接管的预留由执行它的流归还, 响应关闭时不重复归还
+        queued.release_unclaimed()
+        assert limiter.active == 1
+        queued.release()
+        queued.release()
+        return limiter.limiter_stats()
+
+    assert asyncio.run(run()) == {
+        "admitted": 2, "queued": 1, "rejected": 1, "timeouts": 0, "active": 0, "waiting": 0,
+    }
@@ -0,0 +1,129 @@
+"""
+多台 Ollama 的路由: 以 benchmarks/fake_ollama.py 的替身服务器验证负载均衡、chat 亲和、故障摘除与恢复.
+在 backend 目录下运行:
+    python -m pytest tests
+"""
+import asyncio
+import time
+from collections import Counter
+
+import httpx
+import pytest
+
+from benchmarks.fake_ollama import FakeOllama
+from utils.models import OllamaClient
+
+MODEL = "qwen3:32b"
+# 不启动后台健康检查, 由测试显式调用 router.check
+ROUTER = {"health_interval": 0, "failure_threshold": 2, "eject_seconds": 1.0, "affinity_slack": 2}
+
+
+@pytest.fixture
+def servers():
+    started = [FakeOllama(name, models=[MODEL], tokens=5, token_delay=0.02).start() for name in ("a", "b")]
+    yield started
+    for server in started:
+        server.stop()
+
+
+async def ask(client: OllamaClient, chat_id=None) -> str:
+    """发一次流式请求, 返回应答的服务器名 (替身按 "<name>-<i>" 输出)"""
+    owner = ""
+    async for chunk in client.stream("/api/generate", {"model": MODEL, "prompt": "玉米螟怎么防治"}, chat_id=chat_id):
+        owner = owner or chunk.get("response", "").split("-")[0]
+    return owner
+
+
+def endpoint_of(client: OllamaClient, server: FakeOllama):
+    return next(e for e in client.router.endpoints if e.base_url.endswith(f":{server.port}"))
+
+
+def test_least_outstanding_balancing(servers):
+    async def run():
+        async with OllamaClient([s.endpoint for s in servers], router=ROUTER) as client:
+            owners = await asyncio.gather(*(ask(client) for _ in range(8)))
+            assert all(e.outstanding == 0 for e in client.router.endpoints)
+        return Counter(owners)
+
+    # 同时发出的请求依次选择未完成请求最少的服务器, 两台各承接一半
+    assert asyncio.run(run()) == {"a": 4, "b": 4}
+
+
+def test_chat_affinity_with_slack(servers):
+    a, b = servers
+
+    async def run():
+        async with OllamaClient([s.endpoint for s in servers], router=ROUTER) as client:
+            first = await ask(client, chat_id="chat-1")
+            home = endpoint_of(client, a if first == "a" else b)
+
+            # 上次的服务器多出的请求不超过 affinity_slack: 仍留在原服务器
+            home.outstanding += ROUTER["affinity_slack"]
+            stayed = await ask(client, chat_id="chat-1")
+            # 超过 affinity_slack: 迁移到较空闲的服务器, 之后跟随新服务器
+            home.outstanding += 1
+            moved = await ask(client, chat_id="chat-1")
+            home.outstanding -= ROUTER["affinity_slack"] + 1
+            followed = await ask(client, chat_id="chat-1")
+        return first, stayed, moved, followed
+
+    first, stayed, moved, followed = asyncio.run(run())
+    assert stayed == first
+    assert moved != first
+    assert followed == moved
+
+
+def test_unhealthy_host_is_ejected_and_retried(servers):
+    a, b = servers
+    b.stop()
+
+    async def run():
+        async with OllamaClient([s.endpoint for s in servers], router=ROUTER) as client:
+            down = endpoint_of(client, b)
+            # a 稍忙, 未摘除前依次的请求都会选择 b
+            endpoint_of(client, a).outstanding += 1
+            errors = 0
+            owners = Counter()
+            for i in range(10):
+                try:
+                    owners[await ask(client, chat_id=f"chat-{i}")] += 1
+                except httpx.TransportError:
+                    errors += 1
+            # 连续 failure_threshold 次连接错误后摘除, 其余请求都发往 a
+            assert errors == ROUTER["failure_threshold"]
+            assert owners == {"a": 10 - errors}
+            assert not down.healthy
+            endpoint_of(client, a).outstanding -= 1
+
+            # eject_seconds 后重新尝试; 服务器已恢复时请求成功并标记为健康
+            b.start()
+            await asyncio.sleep(ROUTER["eject_seconds"])
+            down.outstanding = -10  # 让下一次选择落到 b
+            assert await ask(client) == "b"
+            down.outstanding = 0
+            assert down.healthy and down.failures == 0
+
+    asyncio.run(run())
+
+
+def test_health_check_brings_host_back(servers):
+    a, b = servers
+
+    async def run():
+        async with OllamaClient([s.endpoint for s in servers], router=ROUTER) as client:
+            host = endpoint_of(client, b)
+            b.stop()
+            for _ in range(ROUTER["failure_threshold"]):
+                await client.router.check(client.client)
+            assert not host.healthy
+            assert not host.available(time.monotonic())
+            # 摘除期间的请求都发往 a
+            assert {await ask(client) for _ in range(4)} == {"a"}
+
+            b.start()
+            await client.router.check(client.client)
+            assert host.healthy and host.failures == 0
+            owners = Counter(await asyncio.gather(*(ask(client) for _ in range(6))))
+            assert owners["b"] > 0
+
+    asyncio.run(run())
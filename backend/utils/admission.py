@@ -0,0 +1,158 @@
+import asyncio
+import time
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, Optional
+
+from utils.load_config import global_config
+
+
+class AdmissionError(Exception):
+    """排队已满或排队超时"""
+
+
+class Reservation:
+    """
+    try_reserve 在请求到达时同步取得的并发名额或排队位置
+
+    执行该请求的流先 claim() 再通过 ModelLimiter.wait 等待轮到自己, 结束后 release();
+    流没有启动 (客户端提前断开、加入了已在执行的相同请求) 时, 响应关闭时 release_unclaimed() 归还.
+    """
+
+    def __init__(self, limiter: "ModelLimiter", waiter: Optional[asyncio.Future] = None):
+        self.limiter = limiter
+        # None 表示已直接取得名额
+        self.waiter = waiter
+        self.created = time.monotonic()
+        self.claimed = False
+        self.released = False
+
+    def claim(self) -> bool:
+        """由执行请求的流接管; 已归还时返回 False"""
+        if self.released:
+            return False
+        self.claimed = True
+        return True
+
+    def release(self) -> None:
+        """归还名额, 仍在排队时离开队列; 可重复调用"""
+        if self.released:
+            return
+        self.released = True
+        if self.waiter is not None and not self.waiter.done():
+            self.waiter.cancel()
+            self.limiter._waiters.remove(self.waiter)
+        else:
+            self.limiter.release()
+
+    def release_unclaimed(self) -> None:
+        if not self.claimed:
+            self.release()
+
+
+class ModelLimiter:
+    """
+    单个模型的并发限制
+
+    同时最多 max_concurrent 个请求使用该模型, 其余请求按 FIFO 进入长度为 max_queue 的等待队列,
+    等待超过 queue_timeout 秒则放弃. 名额与排队位置在请求到达时由 try_reserve 同步预留,
+    超出时直接以 503 拒绝, 不会先打开 SSE 流.
+    """
+
+    def __init__(self, max_concurrent: int = 4, max_queue: int = 20, queue_timeout: float = 60):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.stats: Dict[str, int] = {"admitted": 0, "queued": 0, "rejected": 0, "timeouts": 0}
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def try_reserve(self) -> Optional[Reservation]:
+        """
+        取得一个名额, 或在等待队列中占一个位置; 并发与队列都已占满时返回 None (应直接拒绝).
+        不含 await, 同一时刻到达的请求不会都通过检查.
+        """
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            self.stats["admitted"] += 1
+            return Reservation(self)
+        if len(self._waiters) >= self.max_queue:
+            self.stats["rejected"] += 1
+            return None
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.stats["queued"] += 1
+        return Reservation(self, waiter)
+
+    async def wait(self, reservation: Reservation, position_interval: float = 1.0) -> AsyncIterator[int]:
+        """
+        等待排队中的预留取得名额, 每当排队位置变化就 yield 当前位置 (从 1 开始);
+        迭代正常结束即表示已获得名额. 排队超过 queue_timeout 秒 (从预留时算起) 时抛出 AdmissionError.
+        无论结果如何, 调用方最后都要 reservation.release().
+        """
+        waiter = reservation.waiter
+        if waiter is None:
+            return
+        deadline = reservation.created + self.queue_timeout
+        last_position = None
+        while not waiter.done():
+            position = self._waiters.index(waiter) + 1
+            if position != last_position:
+                last_position = position
+                yield position
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.stats["timeouts"] += 1
+                raise AdmissionError("排队超时, 请稍后重试")
+            try:
+                await asyncio.wait_for(
+                    asyncio.shield(waiter), timeout=min(position_interval, remaining)
+                )
+            except asyncio.TimeoutError:
+                pass
+        self.stats["admitted"] += 1
+
+    def release(self) -> None:
+        """归还名额; 有请求在排队时直接转交给队首"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)
+                return
+        self.active -= 1
+
+    def limiter_stats(self) -> Dict[str, int]:
+        return {**self.stats, "active": self.active, "waiting": self.waiting}
+
+
+class AdmissionController:
+    """按模型分别限流 (qwen3:32b 与 qwen2.5vl:7b 互不影响)"""
+
+    def __init__(self, retry_after: int = 10, models: Optional[Dict[str, dict]] = None, default: Optional[dict] = None):
+        self.retry_after = retry_after
+        self._model_configs = models or {}
+        self._default_config = default or {}
+        self._limiters: Dict[str, ModelLimiter] = {}
+
+    def limiter(self, model: str) -> ModelLimiter:
+        if model not in self._limiters:
+            self._limiters[model] = ModelLimiter(
+                **self._model_configs.get(model, self._default_config)
+            )
+        return self._limiters[model]
+
+    def controller_stats(self) -> Dict[str, Dict[str, int]]:
+        return {model: limiter.limiter_stats() for model, limiter in self._limiters.items()}
+
+
+ADMISSION_CONTROLLER: Optional[AdmissionController] = None
+
+
+def get_admission_controller() -> AdmissionController:
+    global ADMISSION_CONTROLLER
+    if not ADMISSION_CONTROLLER:
+        ADMISSION_CONTROLLER = AdmissionController(**global_config.admission)
+    return ADMISSION_CONTROLLER
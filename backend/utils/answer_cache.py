@@ -0,0 +1,168 @@
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from utils.embedding import embed_query
+from utils.load_config import global_config
+
+logger = logging.getLogger(__name__)
+
+# 每条缓存的固定开销估算 (字节)
+_ENTRY_OVERHEAD = 256
+# 没有检索到任何文档时的文档键, 与有文档的问题分开
+_NO_DOCS = "<no-rag>"
+
+
+@dataclass
+class CachedAnswer:
+    vector: np.ndarray
+    key: str
+    tokens: List[str]
+    size: int
+    created: float
+
+
+class SemanticAnswerCache:
+    """
+    /analyze 语义答案缓存
+
+    以 处理路径 + 对话历史指纹 + 检索到的文档 id 作为键: 键完全相同且查询向量余弦相似度
+    >= similarity_threshold 时命中, 直接回放已生成的答案. 带历史的回答只会在历史相同的会话间复用.
+    同一个键下的向量按需堆叠为矩阵, 一次矩阵乘法得到全部相似度. 支持 TTL、LRU 淘汰与内存上限.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        similarity_threshold: float = 0.95,
+        ttl: float = 86400,
+        max_entries: int = 2000,
+        max_bytes: int = 64 * 1024 * 1024,
+        bypass_mcp: bool = True,
+    ):
+        self.enabled = enabled
+        self.similarity_threshold = similarity_threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bypass_mcp = bypass_mcp
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        # 键 -> 该键下的条目 id; 以及按需构建的 (条目 id, 向量矩阵, 创建时间)
+        self._buckets: Dict[str, Dict[int, None]] = {}
+        self._matrices: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        self._next_id = 0
+        self.bytes = 0
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+    @staticmethod
+    def doc_key(rag_result: Iterable[dict]) -> str:
+        return "|".join(sorted(str(res.get("id") or res.get("title")) for res in rag_result)) or _NO_DOCS
+
+    @staticmethod
+    def scope(path: str, history: Optional[list] = None) -> str:
+        """
+        处理路径 + 对话历史指纹. history 仅在 prompt 中会带上对话历史的路径传入,
+        与 single_flight 的 flight_key 一致.
+        """
+        digest = hashlib.sha256(path.encode("utf-8"))
+        if history:
+            digest.update(json.dumps(history, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    @staticmethod
+    async def _query_vector(query: str) -> Optional[np.ndarray]:
+        # 向量化失败时直接跳过缓存, 不影响主流程
+        try:
+            return await embed_query(query)
+        except Exception as e:
+            logger.warning("answer cache embedding error: %s", e)
+            return None
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        self.bytes -= entry.size
+        bucket = self._buckets[entry.key]
+        del bucket[entry_id]
+        if not bucket:
+            del self._buckets[entry.key]
+        self._matrices.pop(entry.key, None)
+
+    def _matrix(self, key: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        matrix = self._matrices.get(key)
+        if matrix is None:
+            entries = [self._entries[entry_id] for entry_id in self._buckets[key]]
+            matrix = (
+                np.fromiter(self._buckets[key], dtype=np.int64, count=len(entries)),
+                np.stack([entry.vector for entry in entries]),
+                np.array([entry.created for entry in entries]),
+            )
+            self._matrices[key] = matrix
+        return matrix
+
+    async def get(self, query: str, rag_result: List[dict], scope: str = "") -> Optional[List[str]]:
+        """命中时返回缓存的 token 列表; scope 为 SemanticAnswerCache.scope 的结果"""
+        vector = await self._query_vector(query)
+        if vector is None:
+            return None
+        key = f"{scope}:{self.doc_key(rag_result)}"
+        if key not in self._buckets:
+            self.stats["misses"] += 1
+            return None
+
+        ids, matrix, created = self._matrix(key)
+        expired = created < time.monotonic() - self.ttl
+        for entry_id in ids[expired]:
+            self._remove(int(entry_id))
+            self.stats["expired"] += 1
+        scores = matrix @ vector
+        scores[expired] = -np.inf
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity_threshold:
+            self.stats["misses"] += 1
+            return None
+        best_id = int(ids[best])
+        self._entries.move_to_end(best_id)
+        self.stats["hits"] += 1
+        return self._entries[best_id].tokens
+
+    async def put(self, query: str, rag_result: List[dict], tokens: List[str], scope: str = "") -> None:
+        vector = await self._query_vector(query)
+        if vector is None:
+            return
+        size = vector.nbytes + sum(len(token.encode("utf-8")) for token in tokens) + _ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        key = f"{scope}:{self.doc_key(rag_result)}"
+        self._entries[self._next_id] = CachedAnswer(
+            vector=vector,
+            key=key,
+            tokens=list(tokens),
+            size=size,
+            created=time.monotonic(),
+        )
+        self._buckets.setdefault(key, {})[self._next_id] = None
+        self._matrices.pop(key, None)
+        self._next_id += 1
+        self.bytes += size
+        # LRU 淘汰, 直到满足条数与内存上限
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.stats["evictions"] += 1
+
+    def cache_stats(self) -> Dict[str, int]:
+        return {**self.stats, "entries": len(self._entries), "bytes": self.bytes}
+
+
+ANSWER_CACHE: Optional[SemanticAnswerCache] = None
+
+
+def get_answer_cache() -> SemanticAnswerCache:
+    global ANSWER_CACHE
+    if not ANSWER_CACHE:
+        ANSWER_CACHE = SemanticAnswerCache(**global_config.answer_cache)
+    return ANSWER_CACHE
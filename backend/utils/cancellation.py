@@ -0,0 +1,136 @@
+import asyncio
+import inspect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Union
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+# 因客户端断开而中止的上游调用统计: {stage: {"count": 次数, "seconds": 中止前该阶段已占用的时间}}
+ABORT_STATS: Dict[str, Dict[str, float]] = {}
+
+_current_guard: ContextVar[Optional["UpstreamGuard"]] = ContextVar(
+    "upstream_guard", default=None
+)
+
+_END = object()
+
+
+class UpstreamGuard:
+    """单个请求的上游调用守护, 记录当前所处阶段, 中止时计数"""
+
+    def __init__(self):
+        self.stage = "idle"
+        self.stage_started = time.monotonic()
+        self.aborted = False
+
+    def record_abort(self) -> None:
+        if self.aborted:
+            return
+        self.aborted = True
+        stats = ABORT_STATS.setdefault(self.stage, {"count": 0, "seconds": 0.0})
+        stats["count"] += 1
+        stats["seconds"] += time.monotonic() - self.stage_started
+
+
+@contextmanager
+def upstream_stage(name: str):
+    """
+    标记当前请求正在进行的上游调用 (ollama_stream / mcp_tool / rag_search 等),
+    请求被取消时按该阶段计数. 不在受守护的请求中时为空操作.
+    """
+    guard = _current_guard.get()
+    if guard is None:
+        yield
+        return
+    prev_stage, prev_started = guard.stage, guard.stage_started
+    guard.stage, guard.stage_started = name, time.monotonic()
+    try:
+        yield
+    except (asyncio.CancelledError, GeneratorExit):
+        guard.record_abort()
+        raise
+    finally:
+        guard.stage, guard.stage_started = prev_stage, prev_started
+
+
+async def run_guarded(
+    source: AsyncIterator[str], sink: Callable[[str], Union[None, Awaitable[Any]]]
+) -> None:
+    """
+    在当前任务中以独立的 UpstreamGuard 运行 source, 每帧交给 sink (sink 可以是协程, 如有界队列的 put);
+    任务被取消时按当时所处的上游阶段计数.
+    """
+    guard = UpstreamGuard()
+    _current_guard.set(guard)
+    try:
+        async for frame in source:
+            result = sink(frame)
+            if inspect.isawaitable(result):
+                await result
+    except asyncio.CancelledError:
+        guard.record_abort()
+        raise
+
+
+async def _watch_disconnect(request: Request, task: asyncio.Task, poll_interval: float):
+    while not task.done():
+        if await request.is_disconnected():
+            task.cancel()
+            return
+        await asyncio.sleep(poll_interval)
+
+
+async def stream_until_disconnect(
+    request: Request,
+    source: Callable[[], AsyncIterator[str]],
+    poll_interval: float = 0.5,
+    max_buffered: int = 64,
+) -> AsyncIterator[str]:
+    """
+    在独立任务中运行 source 生成 SSE 数据; 一旦客户端断开 (或响应被关闭),
+    立即取消该任务, 从而中止进行中的 Ollama 流、MCP 工具调用和 RAG 请求.
+    最多缓冲 max_buffered 帧, 客户端读取较慢时 source 等待, 不在内存中堆积.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max_buffered)
+
+    async def produce():
+        try:
+            await run_guarded(source(), queue.put)
+        finally:
+            await queue.put(_END)
+
+    producer = asyncio.create_task(produce())
+    watcher = asyncio.create_task(_watch_disconnect(request, producer, poll_interval))
+    try:
+        while True:
+            frame = await queue.get()
+            if frame is _END:
+                break
+            yield frame
+        await asyncio.wait([producer])
+        if not producer.cancelled():
+            # 传播 source 中未处理的异常
+            producer.result()
+    finally:
+        watcher.cancel()
+        producer.cancel()
+
+
+class ClosingStreamingResponse(StreamingResponse):
+    """
+    响应结束后调用 on_close, 无论流是否被读取过 (客户端在第一帧前断开时, 生成器的 finally 不会执行);
+    用于归还请求到达时预留的资源.
+    """
+
+    def __init__(self, *args, on_close: Callable[[], None], **kwargs):
+        super().__init__(*args, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.on_close()
@@ -0,0 +1,94 @@
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from utils.load_config import global_config
+from utils.memory import WindowedSummaryMemory
+
+
+class _Entry:
+    __slots__ = ("context", "last_turn", "expires")
+
+    def __init__(self, context: array, last_turn: dict, expires: float):
+        self.context = context
+        self.last_turn = last_turn
+        self.expires = expires
+
+
+class OllamaContextStore:
+    """
+    保存 Ollama /api/generate 返回的 context (已编码的对话 token), 按 (chat_id, 模型) 索引
+
+    下一轮只发送新的问题与检索结果并带上 context, 模型无需重新预填充整个历史 prompt.
+    context 与会话记忆的最后一轮不一致 (其他 worker 写入、清空、中间有其他路径的回答)、
+    过期或超过 max_context_tokens 时不使用, 回退到完整 prompt.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        ttl: float = 600,
+        max_entries: int = 1000,
+        max_context_tokens: int = 6144,
+    ):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_context_tokens = max_context_tokens
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "stale": 0, "too_long": 0}
+
+    def get(self, chat_id: str, model: str, memory: WindowedSummaryMemory) -> Optional[List[int]]:
+        key = (chat_id, model)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        history = memory.history
+        last_turn = history[-1] if history else {}
+        if (
+            time.monotonic() > entry.expires
+            or last_turn.get("input") != entry.last_turn["input"]
+            or last_turn.get("output") != entry.last_turn["output"]
+        ):
+            del self._entries[key]
+            self.stats["stale"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return entry.context.tolist()
+
+    def put(self, chat_id: str, model: str, context: List[int], last_turn: dict) -> None:
+        """last_turn 为本轮写入会话记忆的 {"input", "output"}"""
+        key = (chat_id, model)
+        if len(context) > self.max_context_tokens:
+            # 上下文将满, 下一轮改用带摘要的完整 prompt 重新开始
+            self._entries.pop(key, None)
+            self.stats["too_long"] += 1
+            return
+        self._entries[key] = _Entry(array("I", context), last_turn, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def drop(self, chat_id: str) -> None:
+        for key in [key for key in self._entries if key[0] == chat_id]:
+            del self._entries[key]
+
+    def context_stats(self) -> Dict[str, int]:
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "tokens": sum(len(entry.context) for entry in self._entries.values()),
+        }
+
+
+CONTEXT_STORE: Optional[OllamaContextStore] = None
+
+
+def get_context_store() -> OllamaContextStore:
+    global CONTEXT_STORE
+    if not CONTEXT_STORE:
+        CONTEXT_STORE = OllamaContextStore(**global_config.ollama_context)
+    return CONTEXT_STORE
@@ -0,0 +1,47 @@
+from collections import OrderedDict
+from typing import List
+
+import numpy as np
+from utils.load_config import global_config
+from utils.models import get_ollama_client
+
+DEFAULT_EMBEDDING_MODEL = "bge-m3"
+
+# 查询向量 LRU 缓存, 同一请求内的多个环节 (相关性判断、语义缓存等) 共用一次向量化
+_query_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+
+def _embedding_config() -> dict:
+    return global_config.embedding or {}
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2 归一化, 之后余弦相似度即为点积"""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+async def embed_texts(texts: List[str]) -> np.ndarray:
+    """批量向量化, 返回已归一化的 (n, dim) float32 矩阵"""
+    response = await get_ollama_client().post(
+        "/api/embed",
+        {
+            "model": _embedding_config().get("model", DEFAULT_EMBEDDING_MODEL),
+            "input": texts,
+        },
+    )
+    return normalize(np.asarray(response["embeddings"], dtype=np.float32))
+
+
+async def embed_query(text: str) -> np.ndarray:
+    """向量化单条查询, 带 LRU 缓存"""
+    vector = _query_cache.get(text)
+    if vector is not None:
+        _query_cache.move_to_end(text)
+        return vector
+
+    vector = (await embed_texts([text]))[0]
+    _query_cache[text] = vector
+    if len(_query_cache) > _embedding_config().get("cache_size", 1024):
+        _query_cache.popitem(last=False)
+    return vector
@@ -0,0 +1,211 @@
+import asyncio
+import base64
+import binascii
+import hashlib
+import io
+import logging
+import math
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageOps
+from utils.load_config import global_config
+from utils.metrics import stage_timer
+
+logger = logging.getLogger(__name__)
+
+_DATA_URL = re.compile(r"^data:[^;,]*;base64,")
+# Ollama 与 RAG 服务都能直接使用的格式, 无需缩小时原样转发
+_PASSTHROUGH_FORMATS = {"JPEG", "PNG"}
+
+DEFAULT_TARGETS = {
+    # RAG 相关性判断 (qwen2.5vl:7b), 只需看清图片主题
+    "rag_gate": {"max_side": 448},
+    # RAG /search 的 CLIP 图像向量, 预处理时短边缩放到 224
+    "rag_search": {"short_side": 224},
+    # 最终回答 (qwen2.5vl:7b)
+    "generate": {"max_side": 1024},
+}
+
+
+class ImageError(ValueError):
+    """图片无法解码或超出大小限制"""
+
+
+@dataclass
+class PreparedImage:
+    digest: str
+    size: Tuple[int, int]
+    # 用途 -> 转发给该用途的 base64
+    variants: Dict[str, str]
+
+
+class ImagePreprocessor:
+    """
+    /analyze 图片的一次性预处理
+
+    收到的 base64 图片只解码一次: 检查字节数与像素数上限, 按各用途 (targets) 需要的分辨率缩小并重新编码为 JPEG,
+    RAG 相关性判断、RAG /search 与最终回答各自使用对应的版本. 结果按内容 sha256 做 LRU 缓存,
+    之后的轮次再带同一张图片时不再处理.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        max_bytes: int = 10 * 1024 * 1024,
+        max_pixels: int = 40_000_000,
+        quality: int = 85,
+        max_entries: int = 256,
+        targets: Optional[Dict[str, Dict[str, int]]] = None,
+    ):
+        self.enabled = enabled
+        self.max_bytes = max_bytes
+        self.max_pixels = max_pixels
+        self.quality = quality
+        self.max_entries = max_entries
+        # 配置中的 targets 覆盖默认值, 三种用途总是存在
+        self.targets = {**DEFAULT_TARGETS, **(targets or {})}
+        self._entries: "OrderedDict[str, PreparedImage]" = OrderedDict()
+        self.stats: Dict[str, float] = {
+            "images": 0,
+            "hits": 0,
+            "rejected": 0,
+            "seconds": 0.0,
+            "received_bytes": 0,
+        }
+        self.forwarded_bytes: Dict[str, int] = {use: 0 for use in self.targets}
+
+    @staticmethod
+    def strip(image: str) -> str:
+        """去掉 data URL 头与空白, 得到纯 base64"""
+        if image.startswith("data:"):
+            image = _DATA_URL.sub("", image, count=1)
+        # 浏览器生成的 base64 通常不含空白, 有换行等时才逐字符处理
+        if any(char in image for char in "\n\r\t "):
+            image = re.sub(r"\s+", "", image)
+        return image
+
+    def _scale(self, target: Dict[str, int], size: Tuple[int, int]) -> float:
+        scale = 1.0
+        if target.get("max_side"):
+            scale = min(scale, target["max_side"] / max(size))
+        if target.get("short_side"):
+            scale = min(scale, target["short_side"] / min(size))
+        return scale
+
+    def _encode(self, image: Image.Image) -> str:
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=self.quality, optimize=True)
+        return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+    def _process(self, data: str, digest: str) -> PreparedImage:
+        # base64 每 4 个字符对应 3 个字节, 先按长度估算, 超限的图片不解码
+        if len(data) * 3 // 4 > self.max_bytes:
+            raise ImageError(f"图片超过 {self.max_bytes // (1024 * 1024)}MB")
+        try:
+            raw = base64.b64decode(data, validate=True)
+            image = Image.open(io.BytesIO(raw))
+        except (binascii.Error, ValueError, OSError, Image.DecompressionBombError) as e:
+            raise ImageError("无法识别的图片") from e
+        width, height = image.size
+        if width * height > self.max_pixels:
+            raise ImageError(f"图片像素过多 ({width}x{height})")
+
+        scales = {use: self._scale(target, (width, height)) for use, target in self.targets.items()}
+        # JPEG 直接按所需的最大分辨率解码 (DCT 缩放), 大照片不必完整解码
+        largest = max(scales.values())
+        if largest < 1:
+            image.draft("RGB", (math.ceil(width * largest), math.ceil(height * largest)))
+        try:
+            source_format = image.format
+            orientation = image.getexif().get(0x0112, 1)
+            image = ImageOps.exif_transpose(image)
+            if image.mode in ("RGBA", "LA", "P"):
+                image = image.convert("RGBA")
+                background = Image.new("RGB", image.size, (255, 255, 255))
+                background.paste(image, mask=image.getchannel("A"))
+                image = background
+            elif image.mode != "RGB":
+                image = image.convert("RGB")
+        except (OSError, ValueError) as e:
+            raise ImageError(f"图片解码失败: {e}") from e
+
+        # 转正后的原始尺寸
+        full = (height, width) if orientation in (5, 6, 7, 8) else (width, height)
+        encoded: Dict[Tuple[int, int], str] = {}
+        variants = {}
+        # 从大到小依次缩小, 小尺寸由上一个尺寸缩得, 不必每次都从原图开始
+        for use, scale in sorted(scales.items(), key=lambda item: -item[1]):
+            size = (max(1, round(full[0] * scale)), max(1, round(full[1] * scale)))
+            if size == full and source_format in _PASSTHROUGH_FORMATS and orientation == 1:
+                variants[use] = data
+                continue
+            if size not in encoded:
+                if image.size != size:
+                    image = image.resize(size, Image.LANCZOS, reducing_gap=2.0)
+                encoded[size] = self._encode(image)
+            variants[use] = encoded[size]
+        return PreparedImage(digest, full, {use: variants[use] for use in self.targets})
+
+    async def prepare_one(self, image: str) -> PreparedImage:
+        data = self.strip(image)
+        digest = hashlib.sha256(data.encode("ascii", "ignore")).hexdigest()
+        self.stats["images"] += 1
+        self.stats["received_bytes"] += len(data)
+        prepared = self._entries.get(digest)
+        if prepared is not None:
+            self._entries.move_to_end(digest)
+            self.stats["hits"] += 1
+        else:
+            started = time.perf_counter()
+            try:
+                with stage_timer("image_preprocess"):
+                    prepared = await asyncio.to_thread(self._process, data, digest)
+            except ImageError:
+                self.stats["rejected"] += 1
+                raise
+            self.stats["seconds"] += time.perf_counter() - started
+            logger.debug(
+                "image %s %s: %s",
+                digest[:12],
+                prepared.size,
+                {use: len(variant) for use, variant in prepared.variants.items()},
+            )
+            self._entries[digest] = prepared
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        for use, variant in prepared.variants.items():
+            self.forwarded_bytes[use] += len(variant)
+        return prepared
+
+    async def prepare(self, images: List[str]) -> Dict[str, List[str]]:
+        """
+        返回 用途 -> 该用途使用的 base64 图片列表; 关闭时各用途都使用原图.
+        图片无法解码或超出限制时抛出 ImageError.
+        """
+        if not self.enabled:
+            return {use: list(images) for use in self.targets}
+        prepared = [await self.prepare_one(image) for image in images]
+        return {use: [p.variants[use] for p in prepared] for use in self.targets}
+
+    def preprocess_stats(self) -> Dict[str, object]:
+        processed = self.stats["images"] - self.stats["hits"] - self.stats["rejected"]
+        return {
+            **{key: int(value) for key, value in self.stats.items() if key != "seconds"},
+            "avg_ms": round(self.stats["seconds"] / processed * 1000, 1) if processed else 0,
+            "forwarded_bytes": dict(self.forwarded_bytes),
+            "entries": len(self._entries),
+        }
+
+
+IMAGE_PREPROCESSOR: Optional[ImagePreprocessor] = None
+
+
+def get_image_preprocessor() -> ImagePreprocessor:
+    global IMAGE_PREPROCESSOR
+    if not IMAGE_PREPROCESSOR:
+        IMAGE_PREPROCESSOR = ImagePreprocessor(**global_config.image_preprocess)
+    return IMAGE_PREPROCESSOR
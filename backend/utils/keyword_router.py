@@ -0,0 +1,168 @@
+from collections import deque
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional, Set, Tuple
+
+from utils.load_config import global_config
+
+
+class AhoCorasick:
+    """多模式匹配自动机: 一次扫描文本即找出其中出现的全部关键词 (按下标返回)"""
+
+    def __init__(self, patterns: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+        for index, pattern in enumerate(patterns):
+            self._add(pattern, index)
+        self._link()
+
+    def _add(self, pattern: str, index: int) -> None:
+        state = 0
+        for char in pattern:
+            if char not in self._goto[state]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+                self._goto[state][char] = len(self._goto) - 1
+            state = self._goto[state][char]
+        self._out[state] += (index,)
+
+    def _link(self) -> None:
+        # 按层构建失配指针, 并把失配转移展开进每个状态的转移表 (确定自动机), 扫描时每个字符只查一次字典;
+        # 输出合并失配链上的关键词
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._out[child] += self._out[self._fail[child]]
+        self._delta: List[Dict[str, int]] = [dict(self._goto[0])] + [{} for _ in self._goto[1:]]
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            self._delta[state] = {**self._delta[self._fail[state]], **self._goto[state]}
+            queue.extend(self._goto[state].values())
+
+    def find(self, text: str) -> Set[int]:
+        found: Set[int] = set()
+        delta, out = self._delta, self._out
+        state = 0
+        for char in text:
+            state = delta[state].get(char, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+
+@dataclass(frozen=True)
+class KeywordRoute:
+    """一次分类的结果, 各字段按 config.jsonc 中的顺序排列"""
+
+    # 命中 keyword 的数据库 (mcp_db_dict 的键)
+    databases: Tuple[str, ...]
+    # 每个数据库命中的 keyword_maps 关键词
+    table_groups: Mapping[str, Tuple[str, ...]]
+    # 命中关键词对应的表名 (去重)
+    tables: Mapping[str, Tuple[str, ...]]
+    # 命中的 PROMPT_TRIGGER_KEYWORDS
+    triggers: Tuple[str, ...]
+
+    @property
+    def use_mcp(self) -> bool:
+        return bool(self.databases)
+
+    @property
+    def enhanced(self) -> bool:
+        return bool(self.triggers)
+
+
+class KeywordRouter:
+    """
+    关键词路由
+
+    将 mcp_db_dict 的数据库关键词、各库 keyword_maps 与 PROMPT_TRIGGER_KEYWORDS 编译进同一个
+    Aho-Corasick 自动机, 每个请求只需小写一次并扫描一遍, 即得到全部命中的数据库、表分组与触发词.
+    同一组命中关键词的分类结果只组装一次, 最多保留 max_routes 种组合.
+    """
+
+    def __init__(self, mcp_db_dict: dict, trigger_keywords: Iterable[str], max_routes: int = 4096):
+        keywords: Dict[str, int] = {}
+        # 关键词下标 -> 命中后的目标: ("db", 库), ("group", 库, 分组序号), ("trigger", 序号)
+        targets: List[List[tuple]] = []
+
+        def register(keyword: str, target: tuple) -> None:
+            keyword = keyword.lower()
+            if not keyword:
+                return
+            if keyword not in keywords:
+                keywords[keyword] = len(targets)
+                targets.append([])
+            targets[keywords[keyword]].append(target)
+
+        self._db_order = list(mcp_db_dict)
+        self._groups: Dict[str, List[Tuple[str, Tuple[str, ...]]]] = {}
+        for db_key, db_config in mcp_db_dict.items():
+            register(db_config.get("keyword") or "", ("db", db_key))
+            self._groups[db_key] = []
+            for index, item in enumerate(db_config.get("keyword_maps") or []):
+                tables = tuple(table.get("name") for table in item["tables"])
+                self._groups[db_key].append((item["key"], tables))
+                register(item["key"], ("group", db_key, index))
+        self._triggers = list(trigger_keywords)
+        for index, keyword in enumerate(self._triggers):
+            register(keyword, ("trigger", index))
+
+        self._targets = [tuple(t) for t in targets]
+        self._automaton = AhoCorasick(keywords)
+        # 命中的关键词组合 -> 分类结果; 结果不可变, 可在请求间共享
+        self._routes: Dict[FrozenSet[int], KeywordRoute] = {}
+        self._max_routes = max_routes
+
+    def route(self, text: str) -> KeywordRoute:
+        found = frozenset(self._automaton.find(text.lower()))
+        route = self._routes.get(found)
+        if route is None:
+            route = self._build(found)
+            if len(self._routes) < self._max_routes:
+                self._routes[found] = route
+        return route
+
+    def _build(self, found: FrozenSet[int]) -> KeywordRoute:
+        databases: Set[str] = set()
+        groups: Dict[str, Set[int]] = {}
+        triggers: Set[int] = set()
+        for index in found:
+            for target in self._targets[index]:
+                if target[0] == "db":
+                    databases.add(target[1])
+                elif target[0] == "group":
+                    groups.setdefault(target[1], set()).add(target[2])
+                else:
+                    triggers.add(target[1])
+
+        table_groups, tables = {}, {}
+        for db_key, indexes in groups.items():
+            matched = [self._groups[db_key][i] for i in sorted(indexes)]
+            table_groups[db_key] = tuple(key for key, _ in matched)
+            tables[db_key] = tuple(dict.fromkeys(name for _, names in matched for name in names))
+        return KeywordRoute(
+            databases=tuple(db_key for db_key in self._db_order if db_key in databases),
+            table_groups=MappingProxyType(table_groups),
+            tables=MappingProxyType(tables),
+            triggers=tuple(self._triggers[i] for i in sorted(triggers)),
+        )
+
+
+KEYWORD_ROUTER: Optional[KeywordRouter] = None
+
+
+def get_keyword_router() -> KeywordRouter:
+    global KEYWORD_ROUTER
+    if not KEYWORD_ROUTER:
+        KEYWORD_ROUTER = KeywordRouter(global_config.mcp_db_dict, global_config.PROMPT_TRIGGER_KEYWORDS)
+    return KEYWORD_ROUTER
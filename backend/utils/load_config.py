@@ -1,6 +1,6 @@
 import json
 import re
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import TypedDict, Dict, List, Union, Any
 
 global_config = None
@@ -35,6 +35,30 @@ class Config:
     mcp_db_dict: Dict[str, SystemConfig]
     PROMPT_TRIGGER_KEYWORDS: list[str]
     rag_classification: list[str]
+    log_level: str = "INFO"
+    workers: int = 1
+    log_shipper: Dict[str, Any] = field(default_factory=dict)
+    ollama_client: Dict[str, Any] = field(default_factory=dict)
+    ollama_router: Dict[str, Any] = field(default_factory=dict)
+    single_flight: Dict[str, Any] = field(default_factory=dict)
+    sessions: Dict[str, Any] = field(default_factory=dict)
+    memory_store: Dict[str, Any] = field(default_factory=dict)
+    prompt_budget: Dict[str, Any] = field(default_factory=dict)
+    ollama_context: Dict[str, Any] = field(default_factory=dict)
+    model_routes: Dict[str, Any] = field(default_factory=dict)
+    mcp: Dict[str, Any] = field(default_factory=dict)
+    mcp_fanout: Dict[str, Any] = field(default_factory=dict)
+    sql_plan_cache: Dict[str, Any] = field(default_factory=dict)
+    schema_index: Dict[str, Any] = field(default_factory=dict)
+    sql_result: Dict[str, Any] = field(default_factory=dict)
+    table_render: Dict[str, Any] = field(default_factory=dict)
+    mcp_result_cache: Dict[str, Any] = field(default_factory=dict)
+    image_preprocess: Dict[str, Any] = field(default_factory=dict)
+    embedding: Dict[str, Any] = field(default_factory=dict)
+    rag_gate: Dict[str, Any] = field(default_factory=dict)
+    answer_cache: Dict[str, Any] = field(default_factory=dict)
+    sse: Dict[str, Any] = field(default_factory=dict)
+    admission: Dict[str, Any] = field(default_factory=dict)
 
 class ConfigObject:
     def __init__(self, data):
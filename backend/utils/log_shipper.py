@@ -0,0 +1,142 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+import httpx
+from utils.load_config import global_config
+
+logger = logging.getLogger(__name__)
+
+
+class LogShipper:
+    """
+    向管理后台 (:8200) 批量发送日志
+
+    日志先进入有界队列, 由后台任务按批次发送: 一批中的日志通过同一个连接池 (max_connections 个持久连接) 并发发送.
+    队列中不足一批时才等待 flush_interval 凑批, 有积压时连续发送.
+    队列满时直接丢弃新日志, 管理后台不可用 (第一条即连接失败) 时整批丢弃, 避免在故障时放大负载.
+    """
+
+    def __init__(
+        self,
+        url: str = "http://localhost:8200/api/v1/log",
+        max_queue: int = 1000,
+        batch_size: int = 50,
+        flush_interval: float = 1.0,
+        timeout: float = 2.0,
+        max_connections: int = 4,
+    ):
+        self.url = url
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats: Dict[str, int] = {"queued": 0, "sent": 0, "dropped": 0, "failed": 0}
+
+    def submit(self, level: str, message: str, **kwargs) -> None:
+        """非阻塞地加入一条日志"""
+        try:
+            self._queue.put_nowait(
+                {"level": level, "module": "ollama_service", "message": message, **kwargs}
+            )
+            self.stats["queued"] += 1
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+
+    async def start(self) -> None:
+        # 持久连接池, 一批日志并发发送时最多 max_connections 个连接
+        self._client = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+            ),
+        )
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        # 尽量发送剩余日志
+        remaining = self._drain(self._queue.qsize())
+        if remaining and self._client:
+            await self._send(remaining)
+        if self._client:
+            await self._client.aclose()
+
+    def _drain(self, limit: int) -> List[Dict[str, Any]]:
+        batch = []
+        while len(batch) < limit and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            batch += self._drain(self.batch_size - 1)
+            if len(batch) < self.batch_size:
+                # 队列已空: 等待一个 flush 间隔, 凑成一批再发送
+                await asyncio.sleep(self.flush_interval)
+                batch += self._drain(self.batch_size - len(batch))
+            await self._send(batch)
+
+    async def _post(self, entry: Dict[str, Any]) -> bool:
+        try:
+            response = await self._client.post(self.url, json=entry)
+            response.raise_for_status()
+        except httpx.TransportError:
+            raise
+        except Exception:
+            self.stats["failed"] += 1
+            return False
+        self.stats["sent"] += 1
+        return True
+
+    async def _send(self, batch: List[Dict[str, Any]]) -> None:
+        # 先发第一条: 管理后台不可达时整批放弃, 不再逐条尝试
+        try:
+            await self._post(batch[0])
+        except httpx.TransportError:
+            self.stats["failed"] += len(batch)
+            return
+        results = await asyncio.gather(
+            *(self._post(entry) for entry in batch[1:]), return_exceptions=True
+        )
+        self.stats["failed"] += sum(isinstance(result, httpx.TransportError) for result in results)
+
+    def shipper_stats(self) -> Dict[str, int]:
+        return {**self.stats, "pending": self._queue.qsize()}
+
+
+LOG_SHIPPER: Optional[LogShipper] = None
+
+
+def get_log_shipper() -> LogShipper:
+    global LOG_SHIPPER
+    if not LOG_SHIPPER:
+        LOG_SHIPPER = LogShipper(**global_config.log_shipper)
+    return LOG_SHIPPER
+
+
+def log_async(level: str, message: str, **kwargs) -> None:
+    """非阻塞日志记录, 同时写入本地日志并发送到管理后台"""
+    logger.log(getattr(logging, level, logging.INFO), message)
+    get_log_shipper().submit(level, message, **kwargs)
+
+
+def setup_logging() -> None:
+    """按 config.jsonc 中的 log_level 配置日志级别, 设为 WARNING 即可关闭热路径上的调试日志"""
+    logging.basicConfig(
+        level=global_config.log_level,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    # httpx 每个请求都会输出 INFO 日志, 仅在 DEBUG 下保留
+    if logging.getLogger().getEffectiveLevel() > logging.DEBUG:
+        logging.getLogger("httpx").setLevel(logging.WARNING)
@@ -1,12 +1,58 @@
-from typing import Any, Dict, List
+import time
+from typing import Any, Callable, Dict, List, Optional
 
 from langchain_core.memory import BaseMemory
 from pydantic import Field, PrivateAttr
 
+from .memory_store import MemoryBackend
+
 class WindowedSummaryMemory(BaseMemory):
+    """
+    最近 max_window 轮原文 + 更早对话的滚动摘要
+
+    超出窗口 (或超出 prompt 历史预算) 的旧轮次先保留, 由后台任务并入摘要后再移除
+    (见 utils/prompt_budget.py), 摘要失败时最多保留 max_kept (2 * max_window) 轮;
+    持久化后端使用同一上限, 并按轮次的 created 删除已并入摘要的轮次, 与进程内删除的轮次一致.
+    """
+
     max_window: int = Field(default=10)
     memory_key: str = Field(default="history")
     _history: List[Dict[str, Any]] = PrivateAttr(default_factory=list)
+    _summary: str = PrivateAttr(default="")
+    # clear / 重新加载时递增, 用于丢弃基于旧内容计算出的摘要
+    _epoch: int = PrivateAttr(default=0)
+    # 内容变化时的回调, 由 UserMemoryManager 用于更新内存占用
+    _on_change: Optional[Callable[[], None]] = PrivateAttr(default=None)
+    # 持久化后端, 未绑定时只保存在进程内
+    _backend: Optional[MemoryBackend] = PrivateAttr(default=None)
+    _session: Optional[tuple] = PrivateAttr(default=None)
+    _version: Optional[int] = PrivateAttr(default=None)
+
+    @property
+    def max_kept(self) -> int:
+        return self.max_window * 2
+
+    async def bind(self, backend: MemoryBackend, chat_id: str, llm: str) -> "WindowedSummaryMemory":
+        self._backend = backend
+        self._session = (chat_id, llm)
+        await self.refresh()
+        return self
+
+    async def refresh(self) -> None:
+        """其他进程写入过该会话时, 从后端重新加载"""
+        if self._backend is None or self._backend.has_pending(*self._session):
+            return
+        version = await self._backend.version(*self._session)
+        if version is None or version == self._version:
+            return
+        epoch = self._epoch
+        history, summary, version = await self._backend.load(*self._session, self.max_kept)
+        # 加载期间本进程写入或清空过该会话: 保留本地内容, 下次访问再同步
+        if epoch != self._epoch or self._backend.has_pending(*self._session):
+            return
+        self._history, self._summary, self._version = history, summary, version
+        self._epoch += 1
+        self._changed()
 
     @property
     def memory_variables(self) -> List[str]:
@@ -18,16 +64,62 @@ class WindowedSummaryMemory(BaseMemory):
 
     def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, Any]) -> None:
         """Save context from conversation to memory."""
-        self._history.append(
-            {"input": inputs.get("input", ""), "output": outputs.get("response", "")}
-        )
-        # Trim history to max_window size
-        if len(self._history) > self.max_window:
+        # created 作为轮次 id, 摘要按它删除已并入的轮次
+        turn = {
+            "input": inputs.get("input", ""),
+            "output": outputs.get("response", ""),
+            "created": time.time_ns(),
+        }
+        # /api/chat 模式下实际发送的用户消息 (含检索结果), 之后原样放回历史, 使消息前缀逐轮追加
+        if inputs.get("message"):
+            turn["message"] = inputs["message"]
+        self._history.append(turn)
+        # 未能并入摘要的旧轮次最多保留 max_kept 轮
+        if len(self._history) > self.max_kept:
             self._history.pop(0)
+            self._epoch += 1
+        if self._backend is not None:
+            self._backend.append(*self._session, self._history[-1], self.max_kept)
+        self._changed()
+
+    def fold(self, epoch: int, count: int, summary: str) -> bool:
+        """将最早的 count 轮替换为新的摘要; 期间记忆被清空或重新加载过则放弃"""
+        if epoch != self._epoch:
+            return False
+        until = self._history[count - 1]["created"]
+        self._history = [turn for turn in self._history if turn["created"] > until]
+        self._summary = summary
+        if self._backend is not None:
+            self._backend.fold(*self._session, until, summary)
+        self._changed()
+        return True
 
     def clear(self) -> None:
         """Clear memory contents."""
         self._history = []
+        self._summary = ""
+        self._epoch += 1
+        if self._backend is not None:
+            self._backend.clear(*self._session)
+        self._changed()
+
+    def _changed(self) -> None:
+        if self._on_change is not None:
+            self._on_change()
+
+    def size_bytes(self) -> int:
+        """估算占用的内存 (对话文本的 UTF-8 字节数)"""
+        return len(self._summary.encode("utf-8")) + sum(
+            len(str(value).encode("utf-8")) for turn in self._history for value in turn.values()
+        )
+
+    @property
+    def summary(self) -> str:
+        return self._summary
+
+    @property
+    def epoch(self) -> int:
+        return self._epoch
 
     @property
     def history(self) -> List[Dict[str, Any]]:
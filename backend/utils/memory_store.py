@@ -0,0 +1,295 @@
+import asyncio
+import logging
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# {"input", "output", "created" (time.time_ns(), 轮次 id), 可选 "message"}
+Turn = Dict[str, Any]
+
+
+class MemoryBackend:
+    """
+    会话记忆的持久化后端, 默认实现只保存在进程内 (即 WindowedSummaryMemory 自身)
+
+    version() 在会话每次写入/清空后变化, 各进程据此判断本地缓存是否过期.
+    """
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def flush(self) -> None:
+        """等待已提交的写入全部落盘"""
+
+    async def version(self, chat_id: str, llm: str) -> Optional[int]:
+        """None 表示不需要与其他进程同步"""
+        return None
+
+    def has_pending(self, chat_id: str, llm: str) -> bool:
+        return False
+
+    async def load(self, chat_id: str, llm: str, limit: int) -> Tuple[List[Turn], str, int]:
+        """返回 (最近 limit 轮, 摘要, 版本号)"""
+        return [], "", 0
+
+    def append(self, chat_id: str, llm: str, turn: Turn, keep: int) -> None:
+        """追加一轮, 该会话只保留最近 keep 轮 (与进程内记忆的上限相同)"""
+
+    def clear(self, chat_id: str, llm: str) -> None:
+        pass
+
+    def fold(self, chat_id: str, llm: str, until: int, summary: str) -> None:
+        """删除 created <= until 的轮次并保存新的摘要"""
+
+
+class SQLiteMemoryBackend(MemoryBackend):
+    """
+    本地 SQLite (WAL) 会话存储, 供同一台机器上的多个 uvicorn worker 共享
+
+    - 写入先进入队列, 由后台任务每 flush_interval 秒在一个事务中批量提交
+    - 读取只在会话版本号变化时进行 (一次主键查询), 其余时间使用进程内缓存; 查询在线程中执行
+    - 每个会话保留的轮数与进程内记忆相同 (append 的 keep), 摘要按轮次的 created 删除已并入的轮次,
+      两边删除的总是同一批轮次; 超过 retention 秒未更新的会话定期删除
+    """
+
+    def __init__(
+        self,
+        path: str = "chat_memory.db",
+        flush_interval: float = 0.05,
+        retention: float = 30 * 86400,
+        busy_timeout: float = 5,
+    ):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.retention = retention
+        self.busy_timeout = busy_timeout
+        self._queue: List[Tuple[str, str, str, Any]] = []
+        self._pending: Dict[Tuple[str, str], int] = {}
+        self._wakeup = asyncio.Event()
+        self._flushed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._last_cleanup = 0.0
+        self._reader = self._connect()
+        self._writer = self._connect()
+        with self._writer:
+            self._writer.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS chat_sessions (
+                    chat_id TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    version INTEGER NOT NULL DEFAULT 0,
+                    updated REAL NOT NULL,
+                    summary TEXT NOT NULL DEFAULT '',
+                    PRIMARY KEY (chat_id, model)
+                );
+                CREATE TABLE IF NOT EXISTS chat_turns (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    chat_id TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    input TEXT NOT NULL,
+                    output TEXT NOT NULL,
+                    message TEXT,
+                    created INTEGER
+                );
+                CREATE INDEX IF NOT EXISTS idx_chat_turns_session ON chat_turns (chat_id, model, id);
+                """
+            )
+            columns = [row[1] for row in self._writer.execute("PRAGMA table_info(chat_sessions)")]
+            if "summary" not in columns:
+                self._writer.execute(
+                    "ALTER TABLE chat_sessions ADD COLUMN summary TEXT NOT NULL DEFAULT ''"
+                )
+            columns = [row[1] for row in self._writer.execute("PRAGMA table_info(chat_turns)")]
+            if "message" not in columns:
+                self._writer.execute("ALTER TABLE chat_turns ADD COLUMN message TEXT")
+            if "created" not in columns:
+                self._writer.execute("ALTER TABLE chat_turns ADD COLUMN created INTEGER")
+                # 旧数据以自增 id 作为 created, 都早于新的轮次
+                self._writer.execute("UPDATE chat_turns SET created = id")
+            self._writer.execute(
+                "CREATE INDEX IF NOT EXISTS idx_chat_turns_created ON chat_turns (chat_id, model, created)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # 提交剩余写入
+        self._write_now()
+        self._reader.close()
+        self._writer.close()
+
+    async def flush(self) -> None:
+        if self._task is None:
+            self._write_now()
+            return
+        while self._pending:
+            self._flushed.clear()
+            self._wakeup.set()
+            await self._flushed.wait()
+
+    def _version(self, chat_id: str, llm: str) -> int:
+        row = self._reader.execute(
+            "SELECT version FROM chat_sessions WHERE chat_id = ? AND model = ?",
+            (chat_id, llm),
+        ).fetchone()
+        return row[0] if row else 0
+
+    async def version(self, chat_id: str, llm: str) -> Optional[int]:
+        return await asyncio.to_thread(self._version, chat_id, llm)
+
+    def _summary(self, chat_id: str, llm: str) -> Tuple[str, int]:
+        row = self._reader.execute(
+            "SELECT summary, version FROM chat_sessions WHERE chat_id = ? AND model = ?",
+            (chat_id, llm),
+        ).fetchone()
+        return row if row else ("", 0)
+
+    def has_pending(self, chat_id: str, llm: str) -> bool:
+        return self._pending.get((chat_id, llm), 0) > 0
+
+    def _load(self, chat_id: str, llm: str, limit: int) -> Tuple[List[Turn], str, int]:
+        # 先读版本号: 若两次查询之间有新写入, 下次访问会因版本变化再次加载
+        summary, version = self._summary(chat_id, llm)
+        rows = self._reader.execute(
+            "SELECT input, output, message, created FROM chat_turns WHERE chat_id = ? AND model = ? "
+            "ORDER BY created DESC, id DESC LIMIT ?",
+            (chat_id, llm, limit),
+        ).fetchall()
+        turns = []
+        for i, o, m, c in reversed(rows):
+            turns.append({"input": i, "output": o, "created": c, **({"message": m} if m else {})})
+        return turns, summary, version
+
+    async def load(self, chat_id: str, llm: str, limit: int) -> Tuple[List[Turn], str, int]:
+        return await asyncio.to_thread(self._load, chat_id, llm, limit)
+
+    def append(self, chat_id: str, llm: str, turn: Turn, keep: int) -> None:
+        self._enqueue("append", chat_id, llm, (turn, keep))
+
+    def clear(self, chat_id: str, llm: str) -> None:
+        self._enqueue("clear", chat_id, llm, None)
+
+    def fold(self, chat_id: str, llm: str, until: int, summary: str) -> None:
+        self._enqueue("fold", chat_id, llm, (until, summary))
+
+    def _enqueue(self, op: str, chat_id: str, llm: str, data: Any) -> None:
+        self._queue.append((op, chat_id, llm, data))
+        key = (chat_id, llm)
+        self._pending[key] = self._pending.get(key, 0) + 1
+        self._wakeup.set()
+
+    def _take(self) -> List[Tuple[str, str, str, Any]]:
+        batch, self._queue = self._queue, []
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            # 等待一个间隔, 凑成一批
+            await asyncio.sleep(self.flush_interval)
+            self._wakeup.clear()
+            batch = self._take()
+            try:
+                if batch:
+                    await asyncio.to_thread(self._write, batch)
+            except Exception as e:
+                logger.error("write chat memory error: %s", e)
+            finally:
+                self._done(batch)
+                self._flushed.set()
+
+    def _write_now(self) -> None:
+        batch = self._take()
+        try:
+            if batch:
+                self._write(batch)
+        finally:
+            self._done(batch)
+
+    def _done(self, batch: List[Tuple[str, str, str, Any]]) -> None:
+        for _, chat_id, llm, _ in batch:
+            key = (chat_id, llm)
+            self._pending[key] -= 1
+            if self._pending[key] <= 0:
+                del self._pending[key]
+
+    def _write(self, batch: List[Tuple[str, str, str, Any]]) -> None:
+        now = time.time()
+        # 会话 -> 追加后保留的轮数
+        kept: Dict[Tuple[str, str], int] = {}
+        with self._writer:
+            for op, chat_id, llm, data in batch:
+                self._writer.execute(
+                    "INSERT INTO chat_sessions (chat_id, model, version, updated) VALUES (?, ?, 1, ?) "
+                    "ON CONFLICT (chat_id, model) DO UPDATE SET version = version + 1, updated = excluded.updated",
+                    (chat_id, llm, now),
+                )
+                if op == "append":
+                    turn, kept[(chat_id, llm)] = data
+                    self._writer.execute(
+                        "INSERT INTO chat_turns (chat_id, model, input, output, message, created) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (chat_id, llm, turn["input"], turn["output"], turn.get("message"), turn["created"]),
+                    )
+                elif op == "clear":
+                    self._writer.execute(
+                        "DELETE FROM chat_turns WHERE chat_id = ? AND model = ?", (chat_id, llm)
+                    )
+                    self._writer.execute(
+                        "UPDATE chat_sessions SET summary = '' WHERE chat_id = ? AND model = ?",
+                        (chat_id, llm),
+                    )
+                elif op == "fold":
+                    until, summary = data
+                    self._writer.execute(
+                        "DELETE FROM chat_turns WHERE chat_id = ? AND model = ? AND created <= ?",
+                        (chat_id, llm, until),
+                    )
+                    self._writer.execute(
+                        "UPDATE chat_sessions SET summary = ? WHERE chat_id = ? AND model = ?",
+                        (summary, chat_id, llm),
+                    )
+            for (chat_id, llm), keep in kept.items():
+                # 与进程内记忆一样只保留最近 keep 轮
+                self._writer.execute(
+                    "DELETE FROM chat_turns WHERE chat_id = ? AND model = ? AND id NOT IN "
+                    "(SELECT id FROM chat_turns WHERE chat_id = ? AND model = ? "
+                    "ORDER BY created DESC, id DESC LIMIT ?)",
+                    (chat_id, llm, chat_id, llm, keep),
+                )
+            if now - self._last_cleanup > 3600:
+                self._last_cleanup = now
+                expired = now - self.retention
+                self._writer.execute(
+                    "DELETE FROM chat_turns WHERE (chat_id, model) IN "
+                    "(SELECT chat_id, model FROM chat_sessions WHERE updated < ?)",
+                    (expired,),
+                )
+                self._writer.execute("DELETE FROM chat_sessions WHERE updated < ?", (expired,))
+
+
+def create_memory_backend(backend: str = "memory", **kwargs) -> MemoryBackend:
+    if backend == "sqlite":
+        return SQLiteMemoryBackend(**kwargs)
+    if backend == "memory":
+        return MemoryBackend()
+    raise ValueError(f"unknown memory backend: {backend}")
@@ -0,0 +1,121 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from prometheus_client import (CONTENT_TYPE_LATEST, Counter, Histogram,
+                               generate_latest)
+
+# 各阶段耗时分桶 (秒), 覆盖本地判断的毫秒级到大模型生成的分钟级
+_SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+STAGE_SECONDS = Histogram(
+    "analyze_stage_seconds",
+    "Duration of each /analyze pipeline stage",
+    ["stage", "model", "path"],
+    buckets=_SECONDS_BUCKETS,
+)
+TIME_TO_FIRST_TOKEN = Histogram(
+    "analyze_time_to_first_token_seconds",
+    "Time from request start to the first answer token",
+    ["model", "path"],
+    buckets=_SECONDS_BUCKETS,
+)
+TOKENS_PER_SECOND = Histogram(
+    "analyze_tokens_per_second",
+    "Generation speed of the answer stream",
+    ["model", "path"],
+    buckets=(1, 2, 5, 10, 15, 20, 30, 40, 60, 80, 120, 200),
+)
+STREAM_SECONDS = Histogram(
+    "analyze_stream_duration_seconds",
+    "Full duration of an /analyze stream",
+    ["model", "path"],
+    buckets=_SECONDS_BUCKETS,
+)
+# 辅助 LLM 调用 (RAG 判断、MCP 规划、摘要) 按调用点与模型统计, GPU 时间取自 Ollama 的 total_duration
+LLM_CALL_SECONDS = Histogram(
+    "llm_call_seconds",
+    "Latency of auxiliary LLM calls per call site",
+    ["site", "model"],
+    buckets=_SECONDS_BUCKETS,
+)
+LLM_GPU_SECONDS = Counter(
+    "llm_gpu_seconds",
+    "Ollama total_duration of auxiliary LLM calls per call site",
+    ["site", "model"],
+)
+
+_current_request: ContextVar[Optional["RequestMetrics"]] = ContextVar(
+    "request_metrics", default=None
+)
+
+
+class RequestMetrics:
+    """
+    单个 /analyze 请求的指标, 标签为模型与路径 (plain / enhanced / mcp / image).
+    start() 之后, 同一请求内任意模块中的 stage_timer 都会带上这两个标签.
+    """
+
+    def __init__(self, model: str, path: str):
+        self.model = model
+        self.path = path
+        self.started = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.token_count = 0
+
+    def start(self) -> "RequestMetrics":
+        _current_request.set(self)
+        return self
+
+    def token(self) -> None:
+        """记录一个输出给用户的答案 token"""
+        now = time.perf_counter()
+        if self.first_token_at is None:
+            self.first_token_at = now
+            TIME_TO_FIRST_TOKEN.labels(self.model, self.path).observe(now - self.started)
+        self.token_count += 1
+
+    def generation_done(self, chunk: dict) -> None:
+        """根据 Ollama 最后一个响应块中的 eval_count / eval_duration 记录生成速度"""
+        eval_count = chunk.get("eval_count")
+        eval_duration = chunk.get("eval_duration")
+        if eval_count and eval_duration:
+            tokens_per_second = eval_count / (eval_duration / 1e9)
+        elif self.first_token_at is not None and self.token_count > 1:
+            tokens_per_second = self.token_count / (time.perf_counter() - self.first_token_at)
+        else:
+            return
+        TOKENS_PER_SECOND.labels(self.model, self.path).observe(tokens_per_second)
+
+    def finish(self) -> None:
+        STREAM_SECONDS.labels(self.model, self.path).observe(time.perf_counter() - self.started)
+
+
+class StageTimer:
+    """stage_timer 的句柄; 阶段结束前可设置 model, 如按路由或 fallback 实际使用的模型"""
+
+    __slots__ = ("model",)
+
+    def __init__(self, model: Optional[str] = None):
+        self.model = model
+
+
+@contextmanager
+def stage_timer(stage: str, model: Optional[str] = None):
+    """记录一个阶段的耗时; model 默认为请求的模型, 不在 /analyze 请求中时 path 标签为 none"""
+    request = _current_request.get()
+    timer = StageTimer(model)
+    started = time.perf_counter()
+    try:
+        yield timer
+    finally:
+        STAGE_SECONDS.labels(
+            stage,
+            timer.model or (request.model if request else "none"),
+            request.path if request else "none",
+        ).observe(time.perf_counter() - started)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    return generate_latest(), CONTENT_TYPE_LATEST
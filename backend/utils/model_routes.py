@@ -0,0 +1,118 @@
+import logging
+import time
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+import httpx
+
+from utils.load_config import global_config
+from utils.metrics import LLM_CALL_SECONDS, LLM_GPU_SECONDS
+from utils.models import generate_with_ollama, generate_with_ollama_stream
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRoutes:
+    """
+    按调用点选择模型
+
+    routes 形如 {"rag_gate": {"model": "qwen3:4b", "fallback": "qwen3:32b"}, ...}.
+    判断、工具规划等只输出很短结果的调用走小模型, 用户直接看到的回答仍用大模型.
+    小模型调用失败 (模型不存在、没有服务器提供) 或输出不满足 accept 时, 在 fallback 模型上重试一次.
+    每个调用点按模型统计调用次数、耗时与 GPU 时间 (Ollama 返回的 total_duration).
+    """
+
+    def __init__(self, routes: Optional[Dict[str, dict]] = None):
+        self.routes = routes or {}
+        self.stats: Dict[str, Dict[str, Dict[str, float]]] = {}
+        self.retries: Dict[str, int] = {}
+
+    def model(self, site: str, default: str) -> str:
+        return self.routes.get(site, {}).get("model") or default
+
+    def fallback(self, site: str) -> Optional[str]:
+        return self.routes.get(site, {}).get("fallback")
+
+    def record(self, site: str, model: str, seconds: float, reply: dict) -> None:
+        gpu_seconds = (reply.get("total_duration") or 0) / 1e9
+        entry = self.stats.setdefault(site, {}).setdefault(
+            model, {"calls": 0, "seconds": 0.0, "gpu_seconds": 0.0}
+        )
+        entry["calls"] += 1
+        entry["seconds"] += seconds
+        entry["gpu_seconds"] += gpu_seconds
+        LLM_CALL_SECONDS.labels(site, model).observe(seconds)
+        LLM_GPU_SECONDS.labels(site, model).inc(gpu_seconds)
+
+    async def _call(self, site: str, model: str, prompt: str, image: List[str]) -> dict:
+        started = time.perf_counter()
+        reply = await generate_with_ollama(prompt, model=model, image=image)
+        self.record(site, model, time.perf_counter() - started, reply)
+        reply["model"] = model
+        return reply
+
+    async def generate(
+        self,
+        site: str,
+        prompt: str,
+        default: str = "qwen3:32b",
+        image: Optional[List[str]] = None,
+        accept: Optional[Callable[[str], bool]] = None,
+    ) -> dict:
+        """
+        非流式生成; accept 接收 response 文本, 返回 False 时改用 fallback 模型重试一次.
+        返回的 reply["model"] 为最终给出回复的模型.
+        """
+        image = image or []
+        model = self.model(site, default)
+        fallback = self.fallback(site)
+        if not fallback or fallback == model:
+            return await self._call(site, model, prompt, image)
+
+        try:
+            reply = await self._call(site, model, prompt, image)
+        except (httpx.HTTPStatusError, ValueError) as e:
+            logger.warning("%s: %s 调用失败 (%s), 改用 %s", site, model, e, fallback)
+        else:
+            if accept is None or accept(reply.get("response", "")):
+                return reply
+            logger.info("%s: %s 输出无法使用, 改用 %s 重试", site, model, fallback)
+        self.retries[site] = self.retries.get(site, 0) + 1
+        return await self._call(site, fallback, prompt, image)
+
+    async def stream(
+        self, site: str, prompt: str, default: str = "qwen3:32b", **kwargs
+    ) -> AsyncIterator[dict]:
+        """流式生成, 用于用户可见的输出, 不做重试; 最后一个 (done) chunk 的 model 为所用模型"""
+        model = self.model(site, default)
+        started = time.perf_counter()
+        async for chunk in generate_with_ollama_stream(prompt, model=model, **kwargs):
+            if isinstance(chunk, dict) and chunk.get("done"):
+                self.record(site, model, time.perf_counter() - started, chunk)
+                chunk["model"] = model
+            yield chunk
+
+    def route_stats(self) -> Dict[str, dict]:
+        return {
+            site: {
+                "retries": self.retries.get(site, 0),
+                "models": {
+                    model: {
+                        "calls": int(entry["calls"]),
+                        "avg_ms": round(entry["seconds"] / entry["calls"] * 1000, 1),
+                        "gpu_seconds": round(entry["gpu_seconds"], 3),
+                    }
+                    for model, entry in models.items()
+                },
+            }
+            for site, models in self.stats.items()
+        }
+
+
+MODEL_ROUTES: Optional[ModelRoutes] = None
+
+
+def get_model_routes() -> ModelRoutes:
+    global MODEL_ROUTES
+    if not MODEL_ROUTES:
+        MODEL_ROUTES = ModelRoutes(global_config.model_routes)
+    return MODEL_ROUTES
@@ -1,36 +1,364 @@
+import asyncio
 import json
+import logging
 import re
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
 
 import httpx
-from env import SERVER_INFO
+from env import OLLAMA_ENDPOINTS
+from utils.load_config import global_config
+
+logger = logging.getLogger(__name__)
+
+
+class OllamaEndpoint:
+    """一台 Ollama 服务器及其当前状态"""
+
+    def __init__(self, host: str, port: int, models: Optional[Iterable[str]] = None):
+        self.base_url = f"http://{host}:{port}"
+        # None 表示提供所有模型
+        self.models = set(models) if models else None
+        self.outstanding = 0
+        self.total_requests = 0
+        self.failures = 0
+        self.healthy = True
+        self.ejected_until = 0.0
+
+    def serves(self, model: Optional[str]) -> bool:
+        return self.models is None or model is None or model in self.models
+
+    def available(self, now: float) -> bool:
+        return self.healthy or now >= self.ejected_until
+
+    def endpoint_stats(self) -> Dict[str, Any]:
+        return {
+            "base_url": self.base_url,
+            "models": sorted(self.models) if self.models else "*",
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "total_requests": self.total_requests,
+            "failures": self.failures,
+        }
+
+
+class OllamaRouter:
+    """
+    多台 Ollama 服务器间的请求路由
+
+    - 在提供该模型且健康的服务器中选择未完成请求最少的一台
+    - 同一 chat_id 优先落到上次的服务器, 使其 KV 缓存保持热; 仅当该服务器比最空闲的一台
+      多出 affinity_slack 个以上请求时才迁移
+    - 后台定时 GET /api/tags 做健康检查, 连续失败 failure_threshold 次 (含请求时的连接错误)
+      即摘除, eject_seconds 后允许重新尝试
+    """
+
+    def __init__(
+        self,
+        endpoints: List[OllamaEndpoint],
+        health_interval: float = 10,
+        health_timeout: float = 3,
+        failure_threshold: int = 2,
+        eject_seconds: float = 30,
+        affinity_slack: int = 2,
+        affinity_size: int = 10000,
+    ):
+        if not endpoints:
+            raise ValueError("未配置 Ollama 服务器 (SERVER_INFO)")
+        self.endpoints = endpoints
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.failure_threshold = failure_threshold
+        self.eject_seconds = eject_seconds
+        self.affinity_slack = affinity_slack
+        self.affinity_size = affinity_size
+        # chat_id -> base_url, 有界 LRU
+        self._affinity: "OrderedDict[str, str]" = OrderedDict()
+        self._task: Optional[asyncio.Task] = None
+
+    def pick(self, model: Optional[str], chat_id: Optional[str] = None) -> OllamaEndpoint:
+        now = time.monotonic()
+        serving = [e for e in self.endpoints if e.serves(model)]
+        if not serving:
+            raise ValueError(f"没有 Ollama 服务器提供模型 {model}")
+        # 全部被摘除时仍尝试, 由调用方得到真实的连接错误
+        candidates = [e for e in serving if e.available(now)] or serving
+        least = min(candidates, key=lambda e: e.outstanding)
+
+        if chat_id is None:
+            return least
+        key = f"{chat_id}:{model}"
+        preferred_url = self._affinity.get(key)
+        chosen = least
+        if preferred_url is not None:
+            preferred = next((e for e in candidates if e.base_url == preferred_url), None)
+            if preferred and preferred.outstanding <= least.outstanding + self.affinity_slack:
+                chosen = preferred
+        self._affinity[key] = chosen.base_url
+        self._affinity.move_to_end(key)
+        if len(self._affinity) > self.affinity_size:
+            self._affinity.popitem(last=False)
+        return chosen
+
+    def mark_success(self, endpoint: OllamaEndpoint) -> None:
+        if not endpoint.healthy:
+            logger.info("Ollama 服务器恢复: %s", endpoint.base_url)
+        endpoint.failures = 0
+        endpoint.healthy = True
+
+    def mark_failure(self, endpoint: OllamaEndpoint) -> None:
+        endpoint.failures += 1
+        if endpoint.failures >= self.failure_threshold:
+            if endpoint.healthy:
+                logger.warning("Ollama 服务器摘除: %s", endpoint.base_url)
+            endpoint.healthy = False
+            endpoint.ejected_until = time.monotonic() + self.eject_seconds
+
+    async def check(self, client: httpx.AsyncClient) -> None:
+        async def check_one(endpoint: OllamaEndpoint) -> None:
+            try:
+                response = await client.get(
+                    f"{endpoint.base_url}/api/tags", timeout=self.health_timeout
+                )
+                response.raise_for_status()
+                self.mark_success(endpoint)
+            except Exception as e:
+                logger.debug("health check %s failed: %s", endpoint.base_url, e)
+                self.mark_failure(endpoint)
+
+        await asyncio.gather(*(check_one(e) for e in self.endpoints))
+
+    async def _run(self, client: httpx.AsyncClient) -> None:
+        while True:
+            await self.check(client)
+            await asyncio.sleep(self.health_interval)
+
+    def start(self, client: httpx.AsyncClient) -> None:
+        if self._task is None and self.health_interval > 0:
+            self._task = asyncio.create_task(self._run(client))
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def router_stats(self) -> List[Dict[str, Any]]:
+        return [e.endpoint_stats() for e in self.endpoints]
+
+
+class OllamaClient:
+    """
+    App 生命周期内共享的 Ollama HTTP 客户端
+
+    - 连接池 + HTTP keep-alive, 避免每次调用都重新建立 TCP 连接
+    - 分阶段超时 (connect / read / write / pool), 替代 timeout=None
+    - 自行统计进行中的请求 (不读取 httpx 连接池的内部状态), 便于压测时调整池大小
+    - 多台服务器时由 OllamaRouter 选择目标
+    """
+
+    def __init__(
+        self,
+        endpoints: List[dict],
+        router: Optional[dict] = None,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 60,
+        connect_timeout: float = 5,
+        read_timeout: float = 300,
+        write_timeout: float = 30,
+        pool_timeout: float = 30,
+    ):
+        self.router = OllamaRouter(
+            [OllamaEndpoint(**endpoint) for endpoint in endpoints], **(router or {})
+        )
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(
+            connect=connect_timeout,
+            read=read_timeout,
+            write=write_timeout,
+            pool=pool_timeout,
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+        # 连接池使用统计: in_flight 为进行中的请求, streaming 为其中已收到响应头、正在读取流的请求
+        self.in_flight = 0
+        self.streaming = 0
+        self.peak_in_flight = 0
+        self.total_requests = 0
+        self.pool_timeouts = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # 未经 lifespan 启动时 (例如脚本直接调用) 惰性创建
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                limits=self.limits, timeout=self.timeout, proxy=None
+            )
+        return self._client
+
+    async def __aenter__(self) -> "OllamaClient":
+        self.router.start(self.client)
+        return self
+
+    async def __aexit__(self, *_exc) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self.router.stop()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _begin(self, endpoint: Optional[OllamaEndpoint]) -> None:
+        self.in_flight += 1
+        self.total_requests += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        if endpoint:
+            endpoint.outstanding += 1
+            endpoint.total_requests += 1
+
+    def _end(self, endpoint: Optional[OllamaEndpoint]) -> None:
+        self.in_flight -= 1
+        if endpoint:
+            endpoint.outstanding -= 1
+
+    def _target(
+        self, payload: dict, base_url: Optional[str], chat_id: Optional[str]
+    ) -> tuple[str, Optional[OllamaEndpoint]]:
+        # 显式指定 host/port 时不经过路由
+        if base_url:
+            return base_url, None
+        endpoint = self.router.pick(payload.get("model"), chat_id)
+        return endpoint.base_url, endpoint
+
+    def _on_error(self, endpoint: Optional[OllamaEndpoint], error: Exception) -> None:
+        if isinstance(error, httpx.PoolTimeout):
+            self.pool_timeouts += 1
+        elif endpoint and isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout)):
+            self.router.mark_failure(endpoint)
+
+    async def post(
+        self,
+        path: str,
+        payload: dict,
+        base_url: Optional[str] = None,
+        chat_id: Optional[str] = None,
+    ) -> dict:
+        base_url, endpoint = self._target(payload, base_url, chat_id)
+        self._begin(endpoint)
+        try:
+            response = await self.client.post(f"{base_url}{path}", json=payload)
+            response.raise_for_status()
+            if endpoint:
+                self.router.mark_success(endpoint)
+            return response.json()
+        except httpx.TransportError as e:
+            self._on_error(endpoint, e)
+            raise
+        finally:
+            self._end(endpoint)
+
+    async def stream(
+        self,
+        path: str,
+        payload: dict,
+        base_url: Optional[str] = None,
+        chat_id: Optional[str] = None,
+    ) -> AsyncIterator[dict]:
+        base_url, endpoint = self._target(payload, base_url, chat_id)
+        self._begin(endpoint)
+        try:
+            async with self.client.stream("POST", f"{base_url}{path}", json=payload) as response:
+                self.streaming += 1
+                try:
+                    response.raise_for_status()
+                    if endpoint:
+                        self.router.mark_success(endpoint)
+                    async for line in response.aiter_lines():
+                        line = line.strip()
+                        if line:
+                            yield json.loads(line)
+                finally:
+                    self.streaming -= 1
+        except httpx.TransportError as e:
+            self._on_error(endpoint, e)
+            raise
+        finally:
+            self._end(endpoint)
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """
+        返回连接池使用情况. 每个进行中的请求占用一个连接 (或在 pool_timeout 内等待连接),
+        in_flight 接近 max_connections 时说明池大小成为瓶颈;
+        waiting 为尚未收到响应头的请求 (等待连接、Ollama 预填充或非流式生成).
+        """
+        return {
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "in_flight": self.in_flight,
+            "streaming": self.streaming,
+            "waiting": self.in_flight - self.streaming,
+            "peak_in_flight": self.peak_in_flight,
+            "total_requests": self.total_requests,
+            "pool_timeouts": self.pool_timeouts,
+            "endpoints": self.router.router_stats(),
+        }
+
+
+OLLAMA_CLIENT: Optional[OllamaClient] = None
+
+
+def get_ollama_client() -> OllamaClient:
+    global OLLAMA_CLIENT
+    if not OLLAMA_CLIENT:
+        OLLAMA_CLIENT = OllamaClient(
+            endpoints=OLLAMA_ENDPOINTS,
+            router=global_config.ollama_router,
+            **global_config.ollama_client,
+        )
+    return OLLAMA_CLIENT
+
+
+def _base_url(host: Optional[str], port: Optional[int]) -> Optional[str]:
+    if host is None and port is None:
+        return None
+    default = OLLAMA_ENDPOINTS[0]
+    return f"http://{host or default['host']}:{port or default['port']}"
+
 
 async def generate_with_ollama(
     prompt,
     model="qwen3:32b",
     image=[],
-    host=SERVER_INFO["host"],
-    port=SERVER_INFO["port"],
+    host=None,
+    port=None,
+    chat_id=None,
 ):
-    url = f"http://{host}:{port}/api/generate"
     payload = {"model": model, "prompt": prompt, "images": image, "stream": False, "temperature": 0.2}
 
     try:
-        async with httpx.AsyncClient(timeout=None) as client:
-            response = await client.post(url, json=payload)
-            response.raise_for_status()
-            return response.json()
+        return await get_ollama_client().post(
+            "/api/generate", payload, base_url=_base_url(host, port), chat_id=chat_id
+        )
     except httpx.HTTPStatusError as e:
-        print(f"HTTP Error: {e.response.status_code} - {e.response.text}")
+        logger.error("HTTP Error: %s - %s", e.response.status_code, e.response.text)
         raise
     except httpx.RequestError as e:
-        print(f"Network Error: {str(e)}")
+        logger.error("Network Error: %s", e)
         raise
     except json.JSONDecodeError as e:
-        print(f"Invalid JSON response: {str(e)}")
+        logger.error("Invalid JSON response: %s", e)
         raise
     except Exception as e:
-        print(f"❗ Unexpected Error: {type(e).__name__}")
-        print("Exception details:", vars(e))
+        logger.exception("❗ Unexpected Error: %s", type(e).__name__)
         raise
 
 
@@ -38,20 +366,33 @@ async def generate_with_ollama_stream(
     prompt,
     model="qwen3",
     image=[],
-    host=SERVER_INFO["host"],
-    port=SERVER_INFO["port"],
+    host=None,
+    port=None,
+    chat_id=None,
+    context=None,
 ):
-    url = f"http://{host}:{port}/api/generate"
     payload = {"model": model, "prompt": prompt, "images": image, "stream": True, "temperature": 0.2}
+    if context:
+        # 续接上一轮返回的 context, prompt 只包含新输入
+        payload["context"] = context
 
-    async with httpx.AsyncClient(timeout=None, proxy=None) as client:
-        async with client.stream("POST", url, json=payload) as response:
-            response.raise_for_status()
-            async for line in response.aiter_lines():
-                line = line.strip()
-                print("line--------------", line)
-                if line:
-                    yield json.loads(line)
+    async for chunk in get_ollama_client().stream(
+        "/api/generate", payload, base_url=_base_url(host, port), chat_id=chat_id
+    ):
+        yield chunk
+
+
+async def generate_with_ollama_chat_stream(
+    messages,
+    model="qwen3",
+    chat_id=None,
+):
+    """/api/chat 流式生成, 每个块补上 response 字段, 与 generate_with_ollama_stream 的输出一致"""
+    payload = {"model": model, "messages": messages, "stream": True, "temperature": 0.2}
+
+    async for chunk in get_ollama_client().stream("/api/chat", payload, chat_id=chat_id):
+        chunk["response"] = (chunk.get("message") or {}).get("content", "")
+        yield chunk
 
 
 def clean_llm_response(text: str) -> str:
@@ -0,0 +1,252 @@
+import asyncio
+import logging
+import re
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from utils.load_config import global_config
+from utils.memory import WindowedSummaryMemory
+from utils.metrics import stage_timer
+from utils.model_routes import get_model_routes
+from utils.models import clean_llm_response
+from utils.promptsArchive import (get_agriculture_prompt_without_image,
+                                  get_history_summary_prompt)
+
+logger = logging.getLogger(__name__)
+
+# 中文字符与全角标点
+_CJK = re.compile(r"[\u3000-\u303f\u3400-\u9fff\uf900-\ufaff\uff00-\uffef]")
+
+# RAG 结果中不放入 prompt 的字段
+_RAG_SKIP_KEYS = {"id", "image", "image_path"}
+
+
+def estimate_tokens(text: str) -> int:
+    """近似 token 数: 中文字符约 1 个 token, 其余字符约 4 个 1 个 token"""
+    if not text:
+        return 0
+    other = len(_CJK.sub("", text))
+    return len(text) - other + (other + 3) // 4
+
+
+def truncate_tokens(text: str, budget: int) -> str:
+    """截断到约 budget 个 token"""
+    if estimate_tokens(text) <= budget:
+        return text
+    used = 0.0
+    for index, char in enumerate(text):
+        used += 1 if _CJK.match(char) else 0.25
+        if used > budget:
+            return text[:index] + "..."
+    return text
+
+
+def render_turns(turns: List[dict]) -> str:
+    return "\n".join(f"用户: {turn['input']}\n小羲: {turn['output']}" for turn in turns)
+
+
+def render_rag_hit(hit) -> str:
+    if not isinstance(hit, dict):
+        return str(hit)
+    return "\n".join(
+        str(value) for key, value in hit.items() if key not in _RAG_SKIP_KEYS and value
+    )
+
+
+class PromptBudget:
+    """
+    按 num_ctx 分配 prompt 预算
+
+    num_ctx 扣除输出预留 (reserve_output) 与模板本身后, 按固定比例分给对话历史、RAG 结果和用户问题.
+    历史从最新一轮往前放, 放不下的旧轮次在每轮结束后由后台任务并入滚动摘要, 不增加请求延迟.
+
+    use_chat_api 为 true 时组装 /api/chat 消息: 固定的 system 消息在最前, 之后依次为摘要、
+    历史轮次和本轮的 RAG 结果与问题, 前缀逐轮追加而不变, 服务端可复用其 KV 缓存.
+    """
+
+    def __init__(
+        self,
+        num_ctx: int = 8192,
+        reserve_output: int = 2048,
+        history_share: float = 0.3,
+        rag_share: float = 0.5,
+        question_share: float = 0.2,
+        summary_model: str = "qwen3:32b",
+        summary_tokens: int = 300,
+        use_chat_api: bool = False,
+    ):
+        self.num_ctx = num_ctx
+        self.reserve_output = reserve_output
+        self.history_share = history_share
+        self.rag_share = rag_share
+        self.question_share = question_share
+        self.summary_model = summary_model
+        self.summary_tokens = summary_tokens
+        self.use_chat_api = use_chat_api
+        self._template_tokens: Dict[object, int] = {}
+        self._running: Set[int] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self.stats: Dict[str, int] = {"summaries": 0, "failed": 0, "discarded": 0}
+
+    def shares(self, template: Callable[..., str], with_history: bool = True) -> Dict[str, int]:
+        if template not in self._template_tokens:
+            empty = {"query": "", "rag_result": ""}
+            if with_history:
+                empty["history"] = ""
+            self._template_tokens[template] = estimate_tokens(template(**empty))
+        return self._split(self._template_tokens[template])
+
+    def _split(self, overhead: int) -> Dict[str, int]:
+        available = max(self.num_ctx - self.reserve_output - overhead, 0)
+        return {
+            "history": int(available * self.history_share),
+            "rag": int(available * self.rag_share),
+            "question": int(available * self.question_share),
+        }
+
+    def _fit_turns(self, memory: WindowedSummaryMemory, budget: int) -> int:
+        """从最新一轮往前, 在预算内 (扣除摘要) 能放下的轮数"""
+        used = estimate_tokens(memory.summary)
+        turns = memory.load_memory_variables({})[memory.memory_key]
+        fit = 0
+        for turn in reversed(turns):
+            used += estimate_tokens(render_turns([turn])) + estimate_tokens(turn.get("message", ""))
+            if used > budget:
+                break
+            fit += 1
+        return fit
+
+    def render_history(self, memory: WindowedSummaryMemory, budget: int) -> str:
+        turns = memory.load_memory_variables({})[memory.memory_key]
+        fit = self._fit_turns(memory, budget)
+        parts = []
+        if memory.summary:
+            parts.append(f"之前对话摘要: {memory.summary}")
+        if fit:
+            parts.append(render_turns(turns[-fit:]))
+        elif turns:
+            # 最新一轮本身就超出预算时截断保留
+            remaining = budget - estimate_tokens(memory.summary)
+            if remaining > 0:
+                parts.append(truncate_tokens(render_turns(turns[-1:]), remaining))
+        return "\n\n".join(parts)
+
+    def render_rag(self, rag_result: list, budget: int) -> str:
+        """按检索排序依次放入, 第一条即超出预算时截断"""
+        parts = []
+        used = 0
+        for index, hit in enumerate(rag_result, 1):
+            text = f"[{index}] {render_rag_hit(hit)}"
+            cost = estimate_tokens(text)
+            if used + cost > budget:
+                if not parts:
+                    parts.append(truncate_tokens(text, budget))
+                break
+            parts.append(text)
+            used += cost
+        return "\n\n".join(parts)
+
+    def assemble(
+        self,
+        template: Callable[..., str],
+        query: str,
+        memory: WindowedSummaryMemory,
+        rag_result: list,
+    ) -> str:
+        shares = self.shares(template)
+        return template(
+            query=truncate_tokens(query, shares["question"]),
+            history=self.render_history(memory, shares["history"]),
+            rag_result=self.render_rag(rag_result, shares["rag"]),
+        )
+
+    def assemble_messages(
+        self,
+        system: str,
+        user_template: Callable[..., str],
+        query: str,
+        memory: WindowedSummaryMemory,
+        rag_result: list,
+        images: Optional[List[str]] = None,
+    ) -> List[dict]:
+        """组装 /api/chat 消息, system 为模块加载时构建好的固定字符串"""
+        key: Tuple[str, Callable] = (system, user_template)
+        if key not in self._template_tokens:
+            self._template_tokens[key] = estimate_tokens(system) + estimate_tokens(
+                user_template(query="", rag_result="")
+            )
+        shares = self._split(self._template_tokens[key])
+
+        messages = [{"role": "system", "content": system}]
+        if memory.summary:
+            messages.append({"role": "system", "content": f"之前对话摘要: {memory.summary}"})
+        fit = self._fit_turns(memory, shares["history"])
+        if fit:
+            for turn in memory.load_memory_variables({})[memory.memory_key][-fit:]:
+                messages.append({"role": "user", "content": turn.get("message") or turn["input"]})
+                messages.append({"role": "assistant", "content": turn["output"]})
+        user = {
+            "role": "user",
+            "content": user_template(
+                query=truncate_tokens(query, shares["question"]),
+                rag_result=self.render_rag(rag_result, shares["rag"]),
+            ),
+        }
+        if images:
+            user["images"] = images
+        messages.append(user)
+        return messages
+
+    def assemble_followup(self, template: Callable[..., str], query: str, rag_result: list) -> str:
+        """续接 Ollama context 时的 prompt: 只有新问题与本轮检索结果, 历史已在 context 中"""
+        shares = self.shares(template, with_history=False)
+        return template(
+            query=truncate_tokens(query, shares["question"]),
+            rag_result=self.render_rag(rag_result, shares["rag"]),
+        )
+
+    def schedule_summary(self, memory: WindowedSummaryMemory) -> None:
+        """一轮结束后调用: 有轮次超出窗口或历史预算时, 在后台并入摘要"""
+        if id(memory) in self._running:
+            return
+        budget = self.shares(get_agriculture_prompt_without_image)["history"]
+        kept = min(self._fit_turns(memory, budget), memory.max_window)
+        count = len(memory.history) - kept
+        if count <= 0:
+            return
+        self._running.add(id(memory))
+        task = asyncio.create_task(self._summarize(memory, memory.epoch, count))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _summarize(self, memory: WindowedSummaryMemory, epoch: int, count: int) -> None:
+        try:
+            prompt = get_history_summary_prompt(
+                memory.summary, render_turns(memory.history[:count]), self.summary_tokens
+            )
+            with stage_timer("history_summary") as timer:
+                reply = await get_model_routes().generate(
+                    "history_summary", prompt, default=self.summary_model
+                )
+                timer.model = reply["model"]
+            summary = truncate_tokens(
+                clean_llm_response(reply["response"]), self.summary_tokens
+            )
+            if memory.fold(epoch, count, summary):
+                self.stats["summaries"] += 1
+            else:
+                self.stats["discarded"] += 1
+        except Exception as e:
+            self.stats["failed"] += 1
+            logger.warning("summarize history error: %s", e)
+        finally:
+            self._running.discard(id(memory))
+
+
+PROMPT_BUDGET: Optional[PromptBudget] = None
+
+
+def get_prompt_budget() -> PromptBudget:
+    global PROMPT_BUDGET
+    if not PROMPT_BUDGET:
+        PROMPT_BUDGET = PromptBudget(**global_config.prompt_budget)
+    return PROMPT_BUDGET
@@ -0,0 +1,187 @@
+import asyncio
+import hashlib
+import json
+import re
+from collections import deque
+from typing import AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+
+from utils.cancellation import run_guarded, upstream_stage
+from utils.load_config import global_config
+
+
+def flight_key(
+    prompt: str,
+    images: List[str],
+    path: str,
+    history: Optional[list] = None,
+) -> str:
+    """
+    去重键: 规范化后的问题 + 图片哈希 + 处理路径.
+    history 仅在 prompt 中会带上对话历史的路径 (enhanced / image) 传入, 历史不同的会话不会合并.
+    """
+    digest = hashlib.sha256()
+    digest.update(path.encode("utf-8"))
+    digest.update(re.sub(r"\s+", " ", prompt).strip().lower().encode("utf-8"))
+    for image in images:
+        digest.update(hashlib.sha256(image.encode("utf-8")).digest())
+    if history:
+        digest.update(json.dumps(history, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class LiveFrame(str):
+    """只发给当前订阅者的 SSE 帧 (如查询结果表格), 不保存供之后加入的订阅者回放"""
+
+
+class StatusFrame(LiveFrame):
+    """排队位置等状态帧; 之后加入的订阅者只收到最新的一个, 其后已有其他帧时不再回放"""
+
+
+class Flight:
+    """
+    一次实际执行的 /analyze 流, 保存已产生的 SSE 帧供后加入的订阅者回放;
+    LiveFrame 只放入当时各订阅者的收件箱, 送出后即释放; StatusFrame 另外只保留最新的一个.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.frames: List[str] = []
+        # 各订阅者尚未送出的 LiveFrame: (发布时 frames 的长度, 帧)
+        self._inboxes: List[Deque[Tuple[int, str]]] = []
+        # 最新的 StatusFrame, 尚未被其他帧取代时回放给新的订阅者
+        self.status: Optional[str] = None
+        # 完整答案, 由 source 在生成结束时设置, 各订阅者据此写入自己的会话记忆
+        self.answer: Optional[str] = None
+        # /api/chat 模式下实际发送的用户消息
+        self.message: Optional[str] = None
+        self.error: Optional[Exception] = None
+        self.done = False
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def publish(self, frame: str) -> None:
+        self.status = frame if isinstance(frame, StatusFrame) else None
+        if isinstance(frame, LiveFrame):
+            for inbox in self._inboxes:
+                inbox.append((len(self.frames), frame))
+        else:
+            self.frames.append(frame)
+        self._wake()
+
+    def _wake(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def replay(self) -> AsyncIterator[str]:
+        """从第一帧开始输出, 追上后等待新帧, 直到执行结束; 加入之后发布的 LiveFrame 按发布顺序插入"""
+        inbox: Deque[Tuple[int, str]] = deque()
+        if self.status is not None:
+            inbox.append((len(self.frames), self.status))
+        self._inboxes.append(inbox)
+        index = 0
+        try:
+            while True:
+                while True:
+                    if inbox and inbox[0][0] <= index:
+                        yield inbox.popleft()[1]
+                    elif index < len(self.frames):
+                        yield self.frames[index]
+                        index += 1
+                    else:
+                        break
+                if self.done:
+                    return
+                await self._changed.wait()
+        finally:
+            self._inboxes.remove(inbox)
+
+
+class SingleFlight:
+    """
+    相同请求的在途合并
+
+    同一个键只有第一个请求 (leader) 真正执行 RAG 判断、检索与生成, 之后到达的相同请求
+    直接订阅它的输出. 执行在独立任务中进行, 与任何单个客户端的连接无关;
+    所有订阅者都断开后才取消该任务及其上游调用.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._flights: Dict[str, Flight] = {}
+        self.stats: Dict[str, int] = {"leaders": 0, "followers": 0, "cancelled": 0}
+
+    def in_flight(self, key: str) -> bool:
+        return self.enabled and key in self._flights
+
+    def _join(self, key: str, source: Callable[[Flight], AsyncIterator[str]]) -> Flight:
+        flight = self._flights.get(key) if self.enabled else None
+        if flight is not None:
+            self.stats["followers"] += 1
+            return flight
+        flight = Flight(key)
+        flight.task = asyncio.create_task(self._run(flight, source))
+        if self.enabled:
+            self._flights[key] = flight
+        self.stats["leaders"] += 1
+        return flight
+
+    def _forget(self, flight: Flight) -> None:
+        if self._flights.get(flight.key) is flight:
+            del self._flights[flight.key]
+
+    async def _run(self, flight: Flight, source: Callable[[Flight], AsyncIterator[str]]) -> None:
+        try:
+            await run_guarded(source(flight), flight.publish)
+        except asyncio.CancelledError:
+            self.stats["cancelled"] += 1
+        except Exception as e:
+            flight.error = e
+        finally:
+            flight.done = True
+            flight._wake()
+            self._forget(flight)
+
+    async def subscribe(
+        self,
+        key: str,
+        source: Callable[[Flight], AsyncIterator[str]],
+        on_answer: Optional[Callable[[Flight], None]] = None,
+    ) -> AsyncIterator[str]:
+        """
+        加入 (或发起) 键为 key 的执行并输出其全部 SSE 帧, 包括加入前已发送的帧.
+        执行正常结束且有答案时调用 on_answer(flight).
+        """
+        flight = self._join(key, source)
+        flight.subscribers += 1
+        try:
+            with upstream_stage("single_flight"):
+                async for frame in flight.replay():
+                    yield frame
+            if flight.error is not None:
+                raise flight.error
+            if flight.answer is not None and on_answer is not None:
+                on_answer(flight)
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                # 最后一个订阅者离开, 中止上游调用; 新的相同请求将重新执行
+                self._forget(flight)
+                flight.task.cancel()
+
+    def flight_stats(self) -> Dict[str, int]:
+        return {
+            **self.stats,
+            "in_flight": len(self._flights),
+            "subscribers": sum(f.subscribers for f in self._flights.values()),
+        }
+
+
+SINGLE_FLIGHT: Optional[SingleFlight] = None
+
+
+def get_single_flight() -> SingleFlight:
+    global SINGLE_FLIGHT
+    if not SINGLE_FLIGHT:
+        SINGLE_FLIGHT = SingleFlight(**global_config.single_flight)
+    return SINGLE_FLIGHT
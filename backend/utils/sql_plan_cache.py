@@ -0,0 +1,342 @@
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Pattern, Tuple
+
+from utils.load_config import global_config
+
+logger = logging.getLogger(__name__)
+
+# SQL 中的字符串字面量 (含 '' 转义) 与数字字面量
+_SQL_STRING = re.compile(r"'((?:[^']|'')*)'")
+_SQL_NUMBER = re.compile(r"(?<![\w.'])(\d+(?:\.\d+)?)(?![\w.'])")
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_TRAILING = re.compile(r"[\s,.;:!?，。；：！？、]+$")
+# 模板中除参数外至少保留的字符数
+_MIN_TEMPLATE_CHARS = 4
+# 字符串参数: 最多 _MAX_PARAM_CHARS 个字符, 不含空白、标点与并列连词, 避免把 "小麦和玉米"、"小麦, 玉米" 当作一个值
+_MAX_PARAM_CHARS = 16
+_PARAM_CHARS = r"[^\s,.;:!?'\"()\[\]{}<>/\\|%_*+=~`@#$^&，。；：！？、（）【】《》“”‘’…—和与及或]"
+# LIKE 字面量中的参数, 代入时转义通配符
+_LIKE_BEFORE = re.compile(r"\b(?:i?like)\s*$", re.IGNORECASE)
+_ESCAPE_AFTER = re.compile(r"\s*escape\b", re.IGNORECASE)
+# 旧版本保存的 LIKE 参数没有转义, 加载时删除, 由规划循环重新生成
+_UNESCAPED_LIKE = re.compile(r"\blike\s+'[^']*<<p\d+>>", re.IGNORECASE)
+
+
+def normalize_question(question: str) -> str:
+    return _TRAILING.sub("", re.sub(r"\s+", " ", question).strip())
+
+
+def _marker(index: int, like: bool = False) -> str:
+    return f"<<p{index}|like>>" if like else f"<<p{index}>>"
+
+
+def escape_like(value: str) -> str:
+    """转义 LIKE 通配符, 配合 ESCAPE '\\' 使用"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def parameterize(question: str, sql: str) -> Tuple[str, str, List[str]]:
+    """
+    将 SQL 中同时出现在问题里的字面量 (品种名、年份、数量...) 换成参数.
+    返回 (问题模板, SQL 模板, 各参数类型 "str" / "num"); 没有可替换的字面量时模板即原问题.
+    LIKE 字面量中的参数写作 <<pN|like>> 并加上 ESCAPE '\\', 代入时按字面值匹配.
+    """
+    question = normalize_question(question)
+    values: Dict[Tuple[str, str], int] = {}
+    kinds: List[str] = []
+    pieces: List[str] = []
+    position = 0
+
+    def param(value: str, kind: str) -> Optional[int]:
+        if (value, kind) in values:
+            return values[(value, kind)]
+        if kind == "str":
+            found = (
+                len(value) >= 2
+                and re.fullmatch(f"{_PARAM_CHARS}{{1,{_MAX_PARAM_CHARS}}}", value) is not None
+                and value.lower() in question.lower()
+            )
+        else:
+            found = re.search(rf"(?<![\d.]){re.escape(value)}(?![\d.])", question) is not None
+        if not found:
+            return None
+        values[(value, kind)] = len(kinds)
+        kinds.append(kind)
+        return values[(value, kind)]
+
+    string_spans = [m.span() for m in _SQL_STRING.finditer(sql)]
+    literals = [(m.start(), m.end(), m.group(1).replace("''", "'"), "str") for m in _SQL_STRING.finditer(sql)]
+    literals += [
+        (m.start(), m.end(), m.group(1), "num")
+        for m in _SQL_NUMBER.finditer(sql)
+        if not any(start <= m.start() < end for start, end in string_spans)
+    ]
+    for start, end, value, kind in sorted(literals):
+        # LIKE '%xxx%' 只参数化中间的值
+        core = value.strip("%") if kind == "str" else value
+        index = param(core, kind)
+        if index is None:
+            continue
+        pieces.append(sql[position:start])
+        if kind == "str":
+            prefix, suffix = value[: value.index(core)], value[value.index(core) + len(core) :]
+            like = _LIKE_BEFORE.search(sql, 0, start) is not None
+            literal = f"'{prefix}{_marker(index, like)}{suffix}'"
+            if like and not _ESCAPE_AFTER.match(sql, end):
+                literal += " ESCAPE '\\'"
+            pieces.append(literal)
+        else:
+            pieces.append(_marker(index))
+        position = end
+    pieces.append(sql[position:])
+
+    template = question
+    # 先替换较长的值, 避免短值命中长值的一部分
+    for (value, kind), index in sorted(values.items(), key=lambda item: -len(item[0][0])):
+        if kind == "str":
+            template = re.sub(re.escape(value), _marker(index), template, flags=re.IGNORECASE)
+        else:
+            template = re.sub(rf"(?<![\d.]){re.escape(value)}(?![\d.])", _marker(index), template)
+    return template, "".join(pieces), kinds
+
+
+def compile_template(template: str, kinds: List[str]) -> Pattern:
+    pattern, seen = "", set()
+    for part in re.split(r"(<<p\d+>>)", template):
+        match = re.fullmatch(r"<<p(\d+)>>", part)
+        if not match:
+            pattern += re.escape(part)
+            continue
+        index = int(match.group(1))
+        if index in seen:
+            pattern += f"(?P=p{index})"
+        else:
+            seen.add(index)
+            pattern += (
+                rf"(?P<p{index}>\d+(?:\.\d+)?)"
+                if kinds[index] == "num"
+                else rf"(?P<p{index}>{_PARAM_CHARS}{{1,{_MAX_PARAM_CHARS}}}?)"
+            )
+    return re.compile(pattern, re.IGNORECASE)
+
+
+def fill_sql(sql_template: str, kinds: List[str], params: Dict[str, str]) -> Optional[str]:
+    sql = sql_template
+    for index, kind in enumerate(kinds):
+        value = params[f"p{index}"]
+        if kind == "num" and not _NUMBER.fullmatch(value):
+            return None
+        if kind == "str":
+            # 字符串参数位于单引号内, 转义其中的单引号; LIKE 中的参数另外转义通配符
+            sql = sql.replace(_marker(index, like=True), escape_like(value).replace("'", "''"))
+            sql = sql.replace(_marker(index), value.replace("'", "''"))
+        else:
+            sql = sql.replace(_marker(index), value)
+    return sql
+
+
+def schema_hash(db_config: dict) -> str:
+    schemas = json.dumps(db_config.get("schemas", {}), ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(schemas.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class SqlPlan:
+    db_key: str
+    template: str
+    sql: str
+    kinds: List[str]
+    pattern: Pattern
+    hits: int = 0
+
+
+class SqlPlanCache:
+    """
+    已验证的 NL-to-SQL 计划缓存
+
+    MCP 规划循环以 execute_sql 得到有效结果并结束后, 按 (数据库, 参数化的问题模板) 保存最终 SQL.
+    之后匹配同一模板的问题直接执行保存的 SQL (代入新的参数) 并进入总结, 跳过规划循环.
+    计划保存在 SQLite 中, 多个 worker 与重启后共享: 查找前检查 PRAGMA data_version,
+    其他 worker 写入或删除了计划时重新加载. 本进程对该连接的读写由一个 asyncio.Lock 串行化, 各事务互不交叉. config.jsonc 中该库的 schemas 变化后 (schema 哈希不同)
+    计划在加载时删除. 缓存的 SQL 执行报错时删除该计划, 无结果或 MCP 不可用时回退到规划循环.
+    """
+
+    def __init__(
+        self,
+        schema_hashes: Dict[str, str],
+        enabled: bool = True,
+        path: str = "sql_plans.db",
+        max_plans: int = 1000,
+    ):
+        self.enabled = enabled
+        self.schema_hashes = schema_hashes
+        self.max_plans = max_plans
+        self._plans: "OrderedDict[Tuple[str, str], SqlPlan]" = OrderedDict()
+        self.stats: Dict[str, int] = {
+            "hits": 0,
+            "misses": 0,
+            "stored": 0,
+            "invalidated": 0,
+            "evicted": 0,
+            "reloads": 0,
+        }
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = asyncio.Lock()
+        self._data_version = 0
+        if enabled:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            with self._conn:
+                self._conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS sql_plans (
+                        db_key TEXT NOT NULL,
+                        template TEXT NOT NULL,
+                        sql TEXT NOT NULL,
+                        kinds TEXT NOT NULL,
+                        schema_hash TEXT NOT NULL,
+                        updated REAL NOT NULL,
+                        PRIMARY KEY (db_key, template)
+                    )
+                    """
+                )
+            self._apply(*self._read())
+
+    def _version(self) -> int:
+        # 其他连接 (其他 worker) 提交修改后该值变化, 本连接自己的写入不改变它
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _read(self) -> Tuple[int, "OrderedDict[Tuple[str, str], SqlPlan]", int]:
+        """读取 SQLite 中的全部计划并删除 schema 已变化的计划, 返回 (data_version, 计划, 删除条数)"""
+        version = self._version()
+        rows = self._conn.execute(
+            "SELECT db_key, template, sql, kinds, schema_hash FROM sql_plans ORDER BY updated"
+        ).fetchall()
+        plans: "OrderedDict[Tuple[str, str], SqlPlan]" = OrderedDict()
+        stale = []
+        for db_key, template, sql, kinds, digest in rows:
+            if self.schema_hashes.get(db_key) != digest or _UNESCAPED_LIKE.search(sql):
+                stale.append((db_key, template))
+                continue
+            kinds = json.loads(kinds)
+            plans[(db_key, template)] = SqlPlan(db_key, template, sql, kinds, compile_template(template, kinds))
+        if stale:
+            with self._conn:
+                self._conn.executemany("DELETE FROM sql_plans WHERE db_key = ? AND template = ?", stale)
+            logger.info("schema 已变化或计划格式过期, 删除 %d 条 SQL 计划", len(stale))
+        return version, plans, len(stale)
+
+    def _apply(self, version: int, plans: "OrderedDict[Tuple[str, str], SqlPlan]", stale: int) -> None:
+        for key, plan in plans.items():
+            if key in self._plans:
+                plan.hits = self._plans[key].hits
+        self._plans = plans
+        self._data_version = version
+        self.stats["invalidated"] += stale
+        self._evict()
+
+    async def _sync(self) -> None:
+        """其他 worker 修改过计划表时重新加载"""
+        async with self._lock:
+            if self._version() != self._data_version:
+                self._apply(*await asyncio.to_thread(self._read))
+                self.stats["reloads"] += 1
+
+    def _evict(self) -> List[Tuple[str, str]]:
+        evicted = []
+        while len(self._plans) > self.max_plans:
+            key, _ = self._plans.popitem(last=False)
+            evicted.append(key)
+            self.stats["evicted"] += 1
+        return evicted
+
+    async def lookup(self, db_key: str, question: str) -> Optional[Tuple[SqlPlan, str]]:
+        """命中时返回 (计划, 代入参数后的 SQL)"""
+        if not self.enabled:
+            return None
+        await self._sync()
+        question = normalize_question(question)
+        for plan in reversed(self._plans.values()):
+            if plan.db_key != db_key:
+                continue
+            match = plan.pattern.fullmatch(question)
+            if not match:
+                continue
+            sql = fill_sql(plan.sql, plan.kinds, match.groupdict())
+            if sql is None:
+                continue
+            plan.hits += 1
+            self._plans.move_to_end((plan.db_key, plan.template))
+            self.stats["hits"] += 1
+            return plan, sql
+        self.stats["misses"] += 1
+        return None
+
+    async def store(self, db_key: str, question: str, sql: str) -> None:
+        if not self.enabled or db_key not in self.schema_hashes:
+            return
+        template, sql_template, kinds = parameterize(question, sql)
+        if len(re.sub(r"<<p\d+>>", "", template).strip()) < _MIN_TEMPLATE_CHARS:
+            # 问题几乎全是参数, 模板会匹配任意问题, 只按原问题精确保存
+            template, sql_template, kinds = normalize_question(question), sql, []
+        key = (db_key, template)
+
+        def write(evicted: List[Tuple[str, str]]):
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO sql_plans VALUES (?, ?, ?, ?, ?, ?)",
+                    (db_key, template, sql_template, json.dumps(kinds), self.schema_hashes[db_key], time.time()),
+                )
+                self._conn.executemany("DELETE FROM sql_plans WHERE db_key = ? AND template = ?", evicted)
+
+        # 与重新加载串行: 否则加载到写入前的计划表会覆盖刚保存的计划
+        async with self._lock:
+            self._plans[key] = SqlPlan(db_key, template, sql_template, kinds, compile_template(template, kinds))
+            self._plans.move_to_end(key)
+            evicted = self._evict()
+            self.stats["stored"] += 1
+            logger.debug("store sql plan: %s -> %s", template, sql_template)
+            await asyncio.to_thread(write, evicted)
+
+    async def invalidate(self, plan: SqlPlan) -> None:
+        def delete():
+            with self._conn:
+                self._conn.execute(
+                    "DELETE FROM sql_plans WHERE db_key = ? AND template = ?", (plan.db_key, plan.template)
+                )
+
+        async with self._lock:
+            self._plans.pop((plan.db_key, plan.template), None)
+            self.stats["invalidated"] += 1
+            await asyncio.to_thread(delete)
+
+    def plan_stats(self) -> Dict[str, object]:
+        return {
+            **self.stats,
+            "plans": len(self._plans),
+            "top": [
+                {"db": p.db_key, "template": p.template, "hits": p.hits}
+                for p in sorted(self._plans.values(), key=lambda p: -p.hits)[:10]
+            ],
+        }
+
+
+SQL_PLAN_CACHE: Optional[SqlPlanCache] = None
+
+
+def get_sql_plan_cache() -> SqlPlanCache:
+    global SQL_PLAN_CACHE
+    if not SQL_PLAN_CACHE:
+        SQL_PLAN_CACHE = SqlPlanCache(
+            {key: schema_hash(value) for key, value in global_config.mcp_db_dict.items()},
+            **global_config.sql_plan_cache,
+        )
+    return SQL_PLAN_CACHE
@@ -1,21 +1,107 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
 from .memory import WindowedSummaryMemory
+from .memory_store import MemoryBackend
+
+# 每个会话对象的固定开销估算 (字节), 计入内存预算
+_SESSION_OVERHEAD = 2048
+
+
+class _Session:
+    __slots__ = ("memory", "last_access", "size")
+
+    def __init__(self, memory: WindowedSummaryMemory):
+        self.memory = memory
+        self.last_access = time.monotonic()
+        self.size = _SESSION_OVERHEAD
+
 
 class UserMemoryManager:
-    def __init__(self):
-        self.user_memories = {}  # {chatID: {model_name: memory_instance}}
+    """
+    按 (chat_id, 模型) 保存会话记忆
 
-    def get_memory(self, chat_id: str, llm: str) -> WindowedSummaryMemory:
-        if chat_id not in self.user_memories:
-            self.user_memories[chat_id] = {}
+    OrderedDict 实现 LRU, 查找为 O(1). 以下任一条件满足时从最久未访问的会话开始淘汰:
+    - 空闲超过 idle_ttl 秒
+    - 会话数超过 max_sessions
+    - 所有会话的估算内存超过 max_bytes
 
-        if str not in self.user_memories[chat_id]:
-            self.user_memories[chat_id][llm] = WindowedSummaryMemory(max_window=10)
+    配置了持久化后端 (如 SQLite) 时这里只是进程内的读缓存, 每次访问按版本号与后端同步,
+    淘汰不会丢失对话.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[MemoryBackend] = None,
+        max_sessions: int = 10000,
+        idle_ttl: float = 86400,
+        max_bytes: int = 64 * 1024 * 1024,
+        max_window: int = 10,
+    ):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_bytes = max_bytes
+        self.max_window = max_window
+        self.backend = backend or MemoryBackend()
+        self._sessions: "OrderedDict[Tuple[str, str], _Session]" = OrderedDict()
+        self._bytes = 0
+        self.evicted: Dict[str, int] = {"idle": 0, "count": 0, "bytes": 0}
+
+    async def get_memory(self, chat_id: str, llm: str) -> WindowedSummaryMemory:
+        key = (chat_id, llm)
+        session = self._sessions.get(key)
+        if session is None:
+            session = _Session(WindowedSummaryMemory(max_window=self.max_window))
+            session.memory._on_change = lambda: self._resize(key)
+            self._sessions[key] = session
+            self._bytes += session.size
+            await session.memory.bind(self.backend, chat_id, llm)
+        else:
+            self._sessions.move_to_end(key)
+            await session.memory.refresh()
+        session.last_access = time.monotonic()
+        self._evict()
+        return session.memory
 
-        return self.user_memories[chat_id][llm]
-    
     def clean_memory(self, chat_id: str, llm: str) -> None:
-        if chat_id not in self.user_memories:
-            self.user_memories[chat_id] = {}
-        if str not in self.user_memories[chat_id]:
-            self.user_memories[chat_id][llm] = WindowedSummaryMemory(max_window=10)
-        self.user_memories[chat_id][llm].clear()
+        session = self._sessions.get((chat_id, llm))
+        if session is not None:
+            session.memory.clear()
+        else:
+            self.backend.clear(chat_id, llm)
+
+    def _resize(self, key: Tuple[str, str]) -> None:
+        session = self._sessions.get(key)
+        if session is None:
+            # 已被淘汰, 仍在使用它的请求写入后即丢弃
+            return
+        size = _SESSION_OVERHEAD + session.memory.size_bytes()
+        self._bytes += size - session.size
+        session.size = size
+        self._evict()
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        while self._sessions:
+            key, oldest = next(iter(self._sessions.items()))
+            if now - oldest.last_access > self.idle_ttl:
+                reason = "idle"
+            elif len(self._sessions) > self.max_sessions:
+                reason = "count"
+            elif self._bytes > self.max_bytes and len(self._sessions) > 1:
+                reason = "bytes"
+            else:
+                return
+            del self._sessions[key]
+            self._bytes -= oldest.size
+            self.evicted[reason] += 1
+
+    def session_stats(self) -> Dict[str, object]:
+        return {
+            "live": len(self._sessions),
+            "bytes": self._bytes,
+            "max_sessions": self.max_sessions,
+            "max_bytes": self.max_bytes,
+            "evicted": self.evicted,
+        }
@@ -1,7 +1,23 @@
+import asyncio
 import json
+import logging
 import re
+import time
+from typing import AsyncIterator, List, Optional, TypeVar, Union
+
+from .keyword_router import get_keyword_router
 from .load_config import global_config
 
+try:
+    # 更快的 JSON 编码器, 未安装时回退到标准库
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
 def clean_message(message):
     # 移除 <think> 和 </think> 标签及其间的内容
     cleaned_message = re.sub(r"<think>.*?</think>", "", message, flags=re.DOTALL)
@@ -24,10 +40,16 @@ def extract_json(message):
         else:
             return json.loads(message)
     except json.JSONDecodeError as e:
-        print(f"Invalid JSON: {e}")
+        logger.warning("Invalid JSON: %s", e)
         return {}
 
 
+def dumps_json(data) -> str:
+    if orjson is not None:
+        return orjson.dumps(data).decode("utf-8")
+    return json.dumps(data, ensure_ascii=False)
+
+
 def generate_sse_data(str, type="delta"):
     data = {}
     """格式化SSE消息"""
@@ -35,7 +57,86 @@ def generate_sse_data(str, type="delta"):
         data = {"type": type, "token": str}
     else:
         data = {"type": type, "message": str}
-    return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"  # SSE格式要求每行以\n结束，消息以\n\n分隔
+    return f"data: {dumps_json(data)}\n\n"  # SSE格式要求每行以\n结束，消息以\n\n分隔
+
+
+class SSEFrame(str):
+    """SSEFrameCoalescer.timed 定时发送的 delta 帧, 调用方原样转发"""
+
+
+class SSEFrameCoalescer:
+    """
+    将连续的 token 合并为一个 delta 帧, 减少逐 token 序列化和发送的开销.
+    距上次发送超过 flush_interval 秒或缓冲超过 max_bytes 字节时发送; 用 timed 包装 token 来源时,
+    模型停顿、没有新 token 到达也会在 flush_interval 秒后发送缓冲.
+    "loading: xxx" 状态文本总是单独成帧 (前端据此显示加载状态并跳过语音播报).
+    """
+
+    def __init__(self, coalesce: bool = True, flush_interval: float = 0.1, max_bytes: int = 1024):
+        self.coalesce = coalesce
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self._buffer: List[str] = []
+        self._bytes = 0
+        self._last_flush = time.monotonic()
+
+    def add(self, token: str) -> List[str]:
+        """加入一个 token, 返回此时需要发送的帧"""
+        if not self.coalesce:
+            return [generate_sse_data(token)]
+        if token.startswith("loading:"):
+            frames = [frame for frame in [self.flush()] if frame]
+            frames.append(generate_sse_data(token))
+            return frames
+
+        self._buffer.append(token)
+        self._bytes += len(token)
+        if (
+            self._bytes >= self.max_bytes
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            return [self.flush()]
+        return []
+
+    def flush(self) -> Optional[str]:
+        """发送缓冲中剩余的 token"""
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return None
+        frame = generate_sse_data("".join(self._buffer))
+        self._buffer = []
+        self._bytes = 0
+        return frame
+
+    async def timed(self, source: AsyncIterator[T]) -> AsyncIterator[Union[T, SSEFrame]]:
+        """
+        逐个返回 source 的元素; 缓冲中有 token 而 flush_interval 到期前没有新元素时,
+        插入一个 SSEFrame (缓冲的内容), 不必等到下一个 token 才发送.
+        """
+        iterator = source.__aiter__()
+        pending: Optional[asyncio.Future] = None
+        try:
+            while True:
+                pending = asyncio.ensure_future(iterator.__anext__())
+                while self._buffer and not pending.done():
+                    timeout = self._last_flush + self.flush_interval - time.monotonic()
+                    await asyncio.wait([pending], timeout=max(timeout, 0))
+                    if not pending.done():
+                        yield SSEFrame(self.flush())
+                try:
+                    item = await pending
+                except StopAsyncIteration:
+                    return
+                yield item
+        finally:
+            # 调用方提前退出或被取消时, 中止仍在等待的 source
+            if pending is not None and not pending.done():
+                pending.cancel()
+                await asyncio.wait([pending])
+
+
+def create_sse_coalescer() -> SSEFrameCoalescer:
+    return SSEFrameCoalescer(**global_config.sse)
 
 def should_use_mcp_plugin(user_input: str) -> bool:
     """
@@ -47,32 +148,14 @@ def should_use_mcp_plugin(user_input: str) -> bool:
     返回:
         bool - 是否触发 MCP 工具
     """
-    lower_input = user_input.lower()
-    return any(value.get("keyword").lower() in lower_input for value in global_config.mcp_db_dict.values())
+    return get_keyword_router().route(user_input).use_mcp
 
 def get_mcp_config_by_keyword(input: str):
-    lower_keyword = input.lower()
-    
-    return {key:value for key, value in global_config.mcp_db_dict.items()
-            if value.get("keyword").lower() in lower_keyword}
-
-def get_tables_by_keys(user_input: str, data_list, schema_list):
-    lower_input = user_input.lower()
-    for item in data_list:
-        if item["key"] in lower_input:
-            tables = []
-            for table in item["tables"]:
-                table_name = table.get("name")
-                schema = json.loads(json.dumps(schema_list.get(table_name)))  # Get a copy to avoid modifying original
-                schema["name"] = table_name  # Add the name to the schema
-                tables.append(schema)
-            return tables
-    return None
+    return {key: global_config.mcp_db_dict[key] for key in get_keyword_router().route(input).databases}
 
 
 def should_apply_enhanced_prompt(user_input: str) -> bool:
     """
     判断用户输入是否需要使用增强的 prompt
     """
-    lower_input = user_input.lower()
-    return any(keyword.lower() in lower_input for keyword in global_config.PROMPT_TRIGGER_KEYWORDS)
+    return get_keyword_router().route(user_input).enhanced
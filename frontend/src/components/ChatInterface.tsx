@@ -1,8 +1,9 @@
 import React, { useState, useRef, useEffect, useMemo } from "react";
-import type { Message } from "@/types/types";
+import type { Message, SqlTable } from "@/types/types";
 import { generateResponse } from "@/lib/ollamaService";
 import { ImageUploader } from "./ImageUploader";
 import { MarkdownRenderer } from "./MarkdownRenderer";
+import { SqlResultTable } from "./SqlResultTable";
 import { useTranslation } from "react-i18next";
 import chatBg from "../assets/chat-bg.png";
 import botAvatar from "../assets/bot-avatar.png";
@@ -121,6 +122,24 @@ export const ChatInterface = ({
               return updated;
             });
             addToAudioQueue(data.token)
+          } else if (data.type == 'table') {
+            // 同一 id 的块依次拼接到当前 AI 消息的表格中
+            const chunk: SqlTable = {
+              id: data.id, sql: data.sql, columns: data.columns, rows: data.rows, total: data.total, done: data.done
+            };
+            setMessages(prev => {
+              const updated = [...prev];
+              const lastIdx = updated.length - 1;
+              const tables: SqlTable[] = [...(updated[lastIdx].tables || [])];
+              const idx = tables.findIndex(t => t.id === chunk.id);
+              if (idx === -1) {
+                tables.push(chunk);
+              } else {
+                tables[idx] = { ...chunk, rows: [...tables[idx].rows, ...chunk.rows] };
+              }
+              updated[lastIdx] = { ...updated[lastIdx], tables };
+              return updated;
+            });
           } else if (data.type == "done" && userMessage.images) {
             setShouldResetImages(true);
             setTargetDB("");
@@ -239,12 +258,14 @@ export const ChatInterface = ({
         }}
       >
         <MarkdownRenderer content={msg.text} />
+        {msg.tables?.map(table => <SqlResultTable key={table.id} table={table} />)}
       </div>
     </div>
   ), (prev, next) => {
     // 深度比较（假设msg是immutable）
     return prev.msg.text === next.msg.text
-      && prev.msg.sender === next.msg.sender;
+      && prev.msg.sender === next.msg.sender
+      && prev.msg.tables === next.msg.tables;
   });
 
   const cleanContext = React.useCallback(() => {
@@ -16,6 +16,51 @@ export const extractLoadingInfo = (str: string, regex = /loading:\s*(.*?)\s*\n\n
   return { lastLoading, afterLast };
 }
 
+const getLoadingText = (key: string | null): string => {
+  switch (key) {
+    case "mcp_begining":
+      return "小羲正在尝试使用MCP插件, 解决该问题..."
+    case "mcp_list_schemas":
+      return "小羲正在分析数据库的架构, 请稍后..."
+    case "mcp_list_objects":
+      return "小羲正在查询数据库的所有表, 请稍后..."
+    case "mcp_get_object_details":
+      return "小羲正在查询数据表的表结构, 请稍后..."
+    case "mcp_execute_sql":
+      return "小羲正在生成 SQL, 请稍后..."
+    case "mcp_another_try":
+      return "小羲正在结合上次结果, 再次使用 MCP 插件, 请稍后..."
+    case "mcp_ending_not_match":
+      return "尝试结束, 该问题不适合使用 MCP 工具解答"
+    case "mcp_ending_summarize":
+      return "尝试结束, 小羲正在汇总全部信息为您解答, 请稍后..."
+    case "mcp_db_done":
+      return "查询完成, 正在等待其他数据库..."
+    case "mcp_db_not_match":
+      return "该数据库中没有相关数据"
+    case "mcp_db_error":
+      return "查询出错, 将使用其他数据库的结果"
+    case "mcp_db_timeout":
+      return "查询超时, 将使用已得到的结果"
+    case "rag_analyzing":
+      return "请稍后, 小羲正在分析用户输入..."
+    case "rag_no_relation":
+      return "用户输入分析完毕, 正在努力为您解答中..."
+    case "rag_searching":
+      return "正在为您搜索相关资料中, 请稍后..."
+    default:
+      if (key?.startsWith("queued_")) {
+        return `当前提问人数较多, 小羲正在排队中 (第 ${key.slice("queued_".length)} 位), 请稍后...`
+      }
+      // 多个数据库并发查询时的进度: mcp_db:库名:阶段
+      if (key?.startsWith("mcp_db:")) {
+        const [, name, stage] = key.split(":")
+        return `【${name}】${getLoadingText(stage)}`
+      }
+      return ""
+  }
+}
+
 export const LoadingCmp: FC<{ content: string }> = (prop) => {
   const [loadingText, setLoadingText] = useState('')
 
@@ -25,50 +70,12 @@ export const LoadingCmp: FC<{ content: string }> = (prop) => {
       setLoadingText("小羲正在努力思考中, 请稍后...")
       return
     }
-    let text = ""
     const { lastLoading, afterLast } = extractLoadingInfo(content)
     if (afterLast) {
       setLoadingText("")
       return
     }
-    switch (lastLoading) {
-      case "mcp_begining":
-        text = "小羲正在尝试使用MCP插件, 解决该问题..."
-        break
-      case "mcp_list_schemas":
-        text = "小羲正在分析数据库的架构, 请稍后..."
-        break
-      case "mcp_list_objects":
-        text = "小羲正在查询数据库的所有表, 请稍后..."
-        break
-      case "mcp_get_object_details":
-        text = "小羲正在查询数据表的表结构, 请稍后..."
-        break
-      case "mcp_execute_sql":
-        text = "小羲正在生成 SQL, 请稍后..."
-        break
-      case "mcp_another_try":
-        text = "小羲正在结合上次结果, 再次使用 MCP 插件, 请稍后..."
-        break
-      case "mcp_ending_not_match":
-        text = "尝试结束, 该问题不适合使用 MCP 工具解答"
-        break
-      case "mcp_ending_summarize":
-        text = "尝试结束, 小羲正在汇总全部信息为您解答, 请稍后..."
-        break
-      case "rag_analyzing":
-        text = "请稍后, 小羲正在分析用户输入..."
-        break
-      case "rag_no_relation":
-        text = "用户输入分析完毕, 正在努力为您解答中..."
-        break
-      case "rag_searching":
-        text = "正在为您搜索相关资料中, 请稍后..."
-        break
-      default:
-        break
-    }
-    setLoadingText(text)
+    setLoadingText(getLoadingText(lastLoading))
   }, [prop])
 
   return <div>{loadingText}</div>
@@ -0,0 +1,44 @@
+import React from 'react';
+import type { SqlTable } from '@/types/types';
+
+const formatCell = (value: unknown) =>
+  value === null || value === undefined ? '' : typeof value === 'object' ? JSON.stringify(value) : String(value);
+
+// MCP 数据库查询的完整结果, 不经过 LLM; 默认折叠, 行数多时在框内滚动
+export const SqlResultTable: React.FC<{ table: SqlTable }> = ({ table }) => (
+  <details className="border border-gray-700 rounded p-2 my-4 bg-surface0">
+    <summary className="cursor-pointer font-semibold text-blue-400">
+      📊 查询结果: 共 {table.total} 行
+      {table.done
+        ? table.rows.length < table.total ? ` (显示前 ${table.rows.length} 行)` : ''
+        : ` (已接收 ${table.rows.length} 行)`}
+    </summary>
+    <pre className="bg-gray-800 text-gray-100 p-2 my-2 rounded overflow-x-auto text-xs">
+      <code className="hljs language-sql">{table.sql}</code>
+    </pre>
+    <div className="overflow-auto max-h-80">
+      <table className="min-w-full border-collapse text-xs">
+        <thead>
+          <tr>
+            {table.columns.map((column) => (
+              <th key={column} className="border px-2 py-1 text-left bg-gray-400 sticky top-0">
+                {column}
+              </th>
+            ))}
+          </tr>
+        </thead>
+        <tbody>
+          {table.rows.map((row, i) => (
+            <tr key={i}>
+              {row.map((value, j) => (
+                <td key={j} className="border px-2 py-1 whitespace-nowrap">
+                  {formatCell(value)}
+                </td>
+              ))}
+            </tr>
+          ))}
+        </tbody>
+      </table>
+    </div>
+  </details>
+);
@@ -64,9 +64,16 @@ export const generateResponse = async (
             case 'audio':
               onData({ type: 'audio', data: parsed.data });
               break;
+            case 'table':
+              onData(parsed);
+              break;
             case 'done':
               onData({ type: 'done', model: parsed.model });
               break;
+            case 'queued':
+              // 排队位置复用 loading 提示, 由 LoadingCmp 展示
+              onData({ type: 'delta', token: `loading: queued_${parsed.position} \n\n`, model: parsed.model });
+              break;
             case 'error':
               onError(new Error(parsed.message));
               break;
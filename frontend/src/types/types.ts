@@ -3,6 +3,17 @@ export type Message = {
   sender: 'user' | 'ai';
   isComplete?: boolean;
   images?: string[];
+  tables?: SqlTable[];  // MCP 数据库查询的完整结果
+};
+
+// 后端 table 事件按块发送的查询结果, 同一 id 的块依次拼接
+export type SqlTable = {
+  id: number;
+  sql: string;
+  columns: string[];
+  rows: unknown[][];
+  total: number;
+  done: boolean;
 };
 
 // 在types文件中更新OllamaRequest类型
@@ -16,6 +27,7 @@ export interface OllamaRequest {
 export type OllamaResponse =
   | { type: 'delta'; token: string; model: string }
   | { type: 'audio'; data: string; }
+  | ({ type: 'table' } & SqlTable)
   | { type: 'done'; model?: string }
   | { type: 'error'; message: string; model?: string };
 